@@ -1,12 +1,47 @@
 __version__ = "1.15.0"
 
+# Standard Python modules
+import importlib
+
 from .pyNetwork import pyNetwork
 from .pyGeo import pyGeo
 from .pyBlock import pyBlock
-from .constraints import DVConstraints
-from .parameterization import DVGeometry
-from .parameterization import DVGeometryAxi
-from .parameterization import DVGeometryCST
-from .parameterization import DVGeometryVSP
-from .parameterization import DVGeometryESP
-from .parameterization import DVGeometryMulti
+
+# The parameterizations and the constraints are only imported when they are first
+# accessed, so that the optional geometry engines are not loaded unless they are used
+_lazyImports = {
+    "DVConstraints": ".constraints",
+    "DVGeometry": ".parameterization",
+    "DVGeometryAxi": ".parameterization",
+    "DVGeometryCST": ".parameterization",
+    "DVGeometryVSP": ".parameterization",
+    "DVGeometryESP": ".parameterization",
+    "DVGeometryMulti": ".parameterization",
+    "DVGeoHistory": ".parameterization",
+}
+
+__all__ = [
+    "pyNetwork",
+    "pyGeo",
+    "pyBlock",
+    "DVConstraints",
+    "DVGeometry",
+    "DVGeometryAxi",
+    "DVGeometryCST",
+    "DVGeometryVSP",
+    "DVGeometryESP",
+    "DVGeometryMulti",
+    "DVGeoHistory",
+]
+
+
+def __getattr__(name):
+    if name in _lazyImports:
+        value = getattr(importlib.import_module(_lazyImports[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazyImports))
@@ -3,6 +3,7 @@ from collections import OrderedDict
 
 # External modules
 from baseclasses.utils import Error
+from mpi4py import MPI
 import numpy as np
 from pyspline import Curve
 
@@ -10,6 +11,7 @@ from pyspline import Curve
 from .. import geo_utils, pyGeo
 from ..geo_utils.file_io import readPlot3DSurfFile
 from ..geo_utils.misc import convertTo2D
+from ..parameterization.history import DVGeoHistory
 from .areaConstraint import ProjectedAreaConstraint, SurfaceAreaConstraint, TriangulatedSurfaceConstraint
 from .baseConstraint import GlobalLinearConstraint, LinearConstraint
 from .circularityConstraint import CircularityConstraint
@@ -86,9 +88,19 @@ class DVConstraints:
         # Data for the discrete surface
 
         self.surfaces = {}
+        self.surfaceConn = {}
+        self.surfaceBVH = {}
         self.DVGeometries = {}
 
-    def setSurface(self, surf, name="default", addToDVGeo=False, DVGeoName="default", surfFormat="point-vector"):
+        # Projected grids of the intersections, keyed by their inputs
+        self.intersections = {}
+
+        # Recorder of the design history
+        self.history = None
+
+    def setSurface(
+        self, surf, name="default", addToDVGeo=False, DVGeoName="default", surfFormat="point-vector", mergeTol=None
+    ):
         """
         Set the surface DVConstraints will use to perform projections.
 
@@ -107,6 +119,12 @@ class DVConstraints:
         addToDVGeo : bool
             Flag to embed the surface point set in a DVGeo object.
             If True, `DVGeoName` must be set appropriately.
+            The vertices shared by several triangles are merged, and only
+            the unique vertices are embedded, as the point set `<name>_pts`.
+            The connectivity of the triangles is stored in `surfaceConn[name]`.
+            This point set replaces the `<name>_p0`, `<name>_p1` and `<name>_p2`
+            point sets of earlier versions, so scripts that access those names
+            in the DVGeo object must be updated.
 
         name : str
             Name associated with the surface. Must be unique. For backward compatibility,
@@ -121,6 +139,11 @@ class DVConstraints:
             The surface format. Either "point-vector" or "point-point".
             See `surf` for details.
 
+        mergeTol : float
+            Distance below which the vertices of the triangles are merged
+            when the surface is embedded in a DVGeo object. Defaults to
+            1e-10 times the diagonal of the bounding box of the surface.
+
         Examples
         --------
         >>> CFDsolver = ADFLOW(comm=comm, options=aeroOptions)
@@ -175,9 +198,20 @@ class DVConstraints:
 
         if addToDVGeo:
             self._checkDVGeo(name=DVGeoName)
-            self.DVGeometries[DVGeoName].addPointSet(self.surfaces[name][0], name + "_p0")
-            self.DVGeometries[DVGeoName].addPointSet(self.surfaces[name][1], name + "_p1")
-            self.DVGeometries[DVGeoName].addPointSet(self.surfaces[name][2], name + "_p2")
+
+            # Merge the vertices shared by the triangles so that each one is only embedded once
+            allPts = np.vstack((p0, p1, p2))
+            if allPts.size == 0:
+                # A proc may not own any part of the surface, but the point set is still
+                # added so that the DVGeo calls stay collective
+                pts = np.zeros((0, 3))
+                self.surfaceConn[name] = np.zeros((0, 3), "intc")
+            else:
+                if mergeTol is None:
+                    mergeTol = 1e-10 * np.linalg.norm(np.max(allPts.real, axis=0) - np.min(allPts.real, axis=0))
+                pts, link = geo_utils.pointReduceKDTree(allPts, nodeTol=mergeTol)
+                self.surfaceConn[name] = link.reshape((3, -1)).T.copy()
+            self.DVGeometries[DVGeoName].addPointSet(pts, name + "_pts")
 
     def setDVGeo(self, DVGeo, name="default"):
         """
@@ -310,6 +344,47 @@ class DVConstraints:
             for key in self.linearCon:
                 self.linearCon[key].evalFunctions(funcs)
 
+        if self.history is not None:
+            conFuncs = {}
+            for constraint in self.constraints.values():
+                for key in constraint:
+                    conFuncs[key] = funcs[key]
+            if includeLinear:
+                for key in self.linearCon:
+                    conFuncs[key] = funcs[key]
+            self.history.record(conFuncs)
+
+    def addHistory(self, fileName, storeCoef=False, chunkSize=10, comm=MPI.COMM_WORLD):
+        """
+        Record the design history of the DVGeometry objects of this
+        DVConstraints object. The design variables and the constraint
+        values are recorded every time :func:`evalFunctions` is
+        called, and written in chunks to a single compressed file.
+        See :class:`DVGeoHistory <.DVGeoHistory>` for reading the history back.
+
+        Parameters
+        ----------
+        fileName : str
+            Name of the history file. Should have a .npz extension.
+        storeCoef : bool
+            Flag to also store the deltas of the FFD coefficients.
+        chunkSize : int
+            Number of records buffered before they are written to the file.
+        comm : MPI Intra Comm
+            Communicator of the DVGeometry objects. Only the root proc writes the file.
+
+        Returns
+        -------
+        history : DVGeoHistory
+            The history recorder
+        """
+        if len(self.DVGeometries) == 0:
+            raise Error("A DVGeometry object must be set with setDVGeo before adding a history.")
+
+        self.history = DVGeoHistory(fileName, self.DVGeometries, storeCoef=storeCoef, chunkSize=chunkSize, comm=comm)
+
+        return self.history
+
     def evalFunctionsSens(self, funcsSens, includeLinear=False, config=None):
         """
         Evaluate the derivative of all the 'functions' that this
@@ -751,7 +826,7 @@ class DVConstraints:
         """
         self._checkDVGeo(DVGeoName)
 
-        p0, p1, p2 = self._getSurfaceVertices(surfaceName=surfaceName)
+        bvh = self._getSurfaceBVH(surfaceName)
 
         # Create mesh of intersections
         constr_line = Curve(X=ptList, k=2)
@@ -759,16 +834,16 @@ class DVConstraints:
         X = constr_line(s)
         coords = np.zeros((nCon, 2, 3))
         # Project all the points
-        for i in range(nCon):
-            # Project actual node:
-            up, down, fail = geo_utils.projectNode(X[i], axis, p0, p1 - p0, p2 - p0)
-            if fail > 0:
-                raise Error(
-                    "There was an error projecting a node "
-                    "at (%f, %f, %f) with normal (%f, %f, %f)." % (X[i, 0], X[i, 1], X[i, 2], axis[0], axis[1], axis[2])
-                )
-            coords[i, 0] = up
-            coords[i, 1] = down
+        up, down, fail = bvh.projectRays(X, axis)
+        failed = np.flatnonzero(fail > 0)
+        if len(failed) > 0:
+            i = failed[0]
+            raise Error(
+                "There was an error projecting a node "
+                "at (%f, %f, %f) with normal (%f, %f, %f)." % (X[i, 0], X[i, 1], X[i, 2], axis[0], axis[1], axis[2])
+            )
+        coords[:, 0] = up
+        coords[:, 1] = down
 
         # Create the thickness constraint object:
         coords = coords.reshape((nCon * 2, 3))
@@ -920,42 +995,31 @@ class DVConstraints:
             raise Error(
                 "The vecList argument of addProximityConstraints needs to have the same number of vectors as the number of points."
             )
-        coordsA = np.zeros((nCon, 3))
-        coordsB = np.zeros((nCon, 3))
-
         # get the intersections with both components A and B
-        p0A, p1A, p2A = self._getSurfaceVertices(surfaceName=surfA)
-        v1A = p1A - p0A
-        v2A = p2A - p0A
-        p0B, p1B, p2B = self._getSurfaceVertices(surfaceName=surfB)
-        v1B = p1B - p0B
-        v2B = p2B - p0B
+        bvhA = self._getSurfaceBVH(surfA)
+        bvhB = self._getSurfaceBVH(surfB)
 
-        # Project all the points
+        # Project all the points. Surf A first.
+        coordsA, failA = bvhA.projectRaysPosOnly(ptList, vecList)
+        coordsB, failB = bvhB.projectRaysPosOnly(ptList, -vecList)
         for ii in range(nCon):
             # get the point and vector
             pt = ptList[ii]
             vec = vecList[ii]
 
-            # Projections. Surf A first.
-            projA, fail = geo_utils.projectNodePosOnly(pt, vec, p0A, v1A, v2A)
-            if fail > 0:
+            if failA[ii] > 0:
                 raise Error(
                     "There was an error projecting a node to surf A "
                     "at (%f, %f, %f) with normal (%f, %f, %f)." % (pt[0], pt[1], pt[2], vec[0], vec[1], vec[2])
                 )
 
             # Surf B.
-            projB, fail = geo_utils.projectNodePosOnly(pt, -vec, p0B, v1B, v2B)
-            if fail > 0:
+            if failB[ii] > 0:
                 raise Error(
                     "There was an error projecting a node to surf B"
                     "at (%f, %f, %f) with normal (%f, %f, %f)." % (pt[0], pt[1], pt[2], -vec[0], -vec[1], -vec[2])
                 )
 
-            coordsA[ii] = projA
-            coordsB[ii] = projB
-
         # Create the thickness constraint object:
         typeName = "thickCon"
         if typeName not in self.constraints:
@@ -1122,35 +1186,34 @@ class DVConstraints:
         coords = np.zeros((nSpan, 3, 3))
 
         # Create surface intersections
-        p0, p1, p2 = self._getSurfaceVertices(surfaceName=surfaceName)
+        bvh = self._getSurfaceBVH(surfaceName)
         # Project all the points
-        for i in range(nSpan):
-            # Project actual node:
-            up, down, fail = geo_utils.projectNode(X[i], axis, p0, p1 - p0, p2 - p0)
-            if fail > 0:
-                raise Error(
-                    "There was an error projecting a node "
-                    "at (%f, %f, %f) with normal (%f, %f, %f)." % (X[i, 0], X[i, 1], X[i, 2], axis[0], axis[1], axis[2])
-                )
-            coords[i, 0] = up
-            coords[i, 1] = down
+        up, down, fail = bvh.projectRays(X, axis)
+        failed = np.flatnonzero(fail > 0)
+        if len(failed) > 0:
+            i = failed[0]
+            raise Error(
+                "There was an error projecting a node "
+                "at (%f, %f, %f) with normal (%f, %f, %f)." % (X[i, 0], X[i, 1], X[i, 2], axis[0], axis[1], axis[2])
+            )
+        coords[:, 0] = up
+        coords[:, 1] = down
 
         # Calculate mid-points
         midPts = (coords[:, 0, :] + coords[:, 1, :]) / 2.0
 
         # Project to get leading edge point
-        lePts = np.zeros((nSpan, 3))
         chordDir = np.array(chordDir, dtype="d").flatten()
         chordDir /= np.linalg.norm(chordDir)
-        for i in range(nSpan):
-            # Project actual node:
-            lePts[i], fail = geo_utils.projectNodePosOnly(X[i], chordDir, p0, p1 - p0, p2 - p0)
-            if fail > 0:
-                raise Error(
-                    "There was an error projecting a node "
-                    "at (%f, %f, %f) in direction (%f, %f, %f)."
-                    % (X[i, 0], X[i, 1], X[i, 2], chordDir[0], chordDir[1], chordDir[2])
-                )
+        lePts, fail = bvh.projectRaysPosOnly(X, chordDir)
+        failed = np.flatnonzero(fail > 0)
+        if len(failed) > 0:
+            i = failed[0]
+            raise Error(
+                "There was an error projecting a node "
+                "at (%f, %f, %f) in direction (%f, %f, %f)."
+                % (X[i, 0], X[i, 1], X[i, 2], chordDir[0], chordDir[1], chordDir[2])
+            )
 
         # Check that points can form radius
         d = np.linalg.norm(coords[:, 0, :] - coords[:, 1, :], axis=1)
@@ -1394,7 +1457,7 @@ class DVConstraints:
         self._checkDVGeo(DVGeoName)
         # Create the points to constrain
 
-        p0, p1, p2 = self._getSurfaceVertices(surfaceName=surfaceName)
+        bvh = self._getSurfaceBVH(surfaceName)
 
         constr_line = Curve(X=ptList, k=2)
         s = np.linspace(0, 1, nCon)
@@ -1402,16 +1465,16 @@ class DVConstraints:
 
         coords = np.zeros((nCon, 2, 3))
         # Project all the points
-        for i in range(nCon):
-            # Project actual node:
-            up, down, fail = geo_utils.projectNode(X[i], axis, p0, p1 - p0, p2 - p0)
-            if fail > 0:
-                raise Error(
-                    "There was an error projecting a node "
-                    "at (%f, %f, %f) with normal (%f, %f, %f)." % (X[i, 0], X[i, 1], X[i, 2], axis[0], axis[1], axis[2])
-                )
-            coords[i, 0] = up
-            coords[i, 1] = down
+        up, down, fail = bvh.projectRays(X, axis)
+        failed = np.flatnonzero(fail > 0)
+        if len(failed) > 0:
+            i = failed[0]
+            raise Error(
+                "There was an error projecting a node "
+                "at (%f, %f, %f) with normal (%f, %f, %f)." % (X[i, 0], X[i, 1], X[i, 2], axis[0], axis[1], axis[2])
+            )
+        coords[:, 0] = up
+        coords[:, 1] = down
 
         X = (1 - bias) * coords[:, 1] + bias * coords[:, 0]
 
@@ -1540,7 +1603,7 @@ class DVConstraints:
         """
         self._checkDVGeo(DVGeoName)
 
-        p0, p1, p2 = self._getSurfaceVertices(surfaceName=surfaceName)
+        bvh = self._getSurfaceBVH(surfaceName)
 
         constr_line = Curve(X=ptList, k=2)
         s = np.linspace(0, 1, nCon)
@@ -1548,23 +1611,23 @@ class DVConstraints:
         coords = np.zeros((nCon, 4, 3))
         chordDir /= np.linalg.norm(np.array(chordDir, "d"))
         # Project all the points
-        for i in range(nCon):
-            # Project actual node:
-            up, down, fail = geo_utils.projectNode(X[i], axis, p0, p1 - p0, p2 - p0)
-            if fail:
-                raise Error(
-                    "There was an error projecting a node "
-                    "at (%f, %f, %f) with normal (%f, %f, %f)." % (X[i, 0], X[i, 1], X[i, 2], axis[0], axis[1], axis[2])
-                )
+        up, down, fail = bvh.projectRays(X, axis)
+        failed = np.flatnonzero(fail)
+        if len(failed) > 0:
+            i = failed[0]
+            raise Error(
+                "There was an error projecting a node "
+                "at (%f, %f, %f) with normal (%f, %f, %f)." % (X[i, 0], X[i, 1], X[i, 2], axis[0], axis[1], axis[2])
+            )
 
-            coords[i, 0] = up
-            coords[i, 1] = down
-            height = np.linalg.norm(coords[i, 0] - coords[i, 1])
-            # Third point is the mid-point of those
-            coords[i, 2] = 0.5 * (up + down)
+        coords[:, 0] = up
+        coords[:, 1] = down
+        height = np.linalg.norm(coords[:, 0] - coords[:, 1], axis=1)
+        # Third point is the mid-point of those
+        coords[:, 2] = 0.5 * (up + down)
 
-            # Fourth point is along the chordDir
-            coords[i, 3] = coords[i, 2] + 0.1 * height * chordDir
+        # Fourth point is along the chordDir
+        coords[:, 3] = coords[:, 2] + 0.1 * height[:, None] * chordDir
 
         # Create the thickness constraint object:
         coords = coords.reshape((nCon * 4, 3))
@@ -1693,9 +1756,11 @@ class DVConstraints:
             conName,
             surface_1,
             surface_1_name,
+            self.surfaceConn.get(surface_1_name),
             DVGeo1,
             surface_2,
             surface_2_name,
+            self.surfaceConn.get(surface_2_name),
             DVGeo2,
             scale,
             addToPyOpt,
@@ -1798,7 +1863,16 @@ class DVConstraints:
 
         # Finally add constraint object
         self.constraints[typeName][conName] = TriangulatedVolumeConstraint(
-            conName, surface, surfaceName, lower, upper, scaled, scale, DVGeo, addToPyOpt
+            conName,
+            surface,
+            surfaceName,
+            self.surfaceConn.get(surfaceName),
+            lower,
+            upper,
+            scaled,
+            scale,
+            DVGeo,
+            addToPyOpt,
         )
 
     def addVolumeConstraint(
@@ -2471,7 +2545,7 @@ class DVConstraints:
         """
 
         self._checkDVGeo(DVGeoName)
-        p0, p1, p2 = self._getSurfaceVertices(surfaceName=surfaceName)
+        bvh = self._getSurfaceBVH(surfaceName)
 
         typeName = "gearCon"
         if typeName not in self.constraints:
@@ -2483,7 +2557,8 @@ class DVConstraints:
             conName = name
 
         # Project the actual location we were give:
-        up, down, fail = geo_utils.projectNode(position, axis, p0, p1 - p0, p2 - p0)
+        up, down, fail = bvh.projectRays(position, axis)
+        up, down, fail = up[0], down[0], fail[0]
         if fail > 0:
             raise Error(
                 "There was an error projecting a node " "at (%f, %f, %f) with normal (%f, %f, %f)." % (position)
@@ -3319,7 +3394,7 @@ class DVConstraints:
 
         self._checkDVGeo(DVGeoName)
 
-        p0, p1, p2 = self._getSurfaceVertices(surfaceName=surfaceName)
+        bvh = self._getSurfaceBVH(surfaceName)
 
         if nPts < 5:
             raise Error("nPts should be at least 5 \n " "while nPts = %d is given." % nPts)
@@ -3335,16 +3410,16 @@ class DVConstraints:
         eps = np.linalg.norm(X[1] - X[0])
 
         # Project all the points
-        for i in range(nPts):
-            # Project actual node:
-            up, _, fail = geo_utils.projectNode(X[i], axis, p0, p1 - p0, p2 - p0)
-            if fail > 0:
-                raise Error(
-                    "There was an error projecting a node "
-                    "at (%f, %f, %f) with normal (%f, %f, %f)." % (X[i, 0], X[i, 1], X[i, 2], axis[0], axis[1], axis[2])
-                )
-            coords[i] = up
-            # NOTE: we do not use the down projection
+        up, _, fail = bvh.projectRays(X, axis)
+        failed = np.flatnonzero(fail > 0)
+        if len(failed) > 0:
+            i = failed[0]
+            raise Error(
+                "There was an error projecting a node "
+                "at (%f, %f, %f) with normal (%f, %f, %f)." % (X[i, 0], X[i, 1], X[i, 2], axis[0], axis[1], axis[2])
+            )
+        coords[:] = up
+        # NOTE: we do not use the down projection
 
         typeName = "curvCon1D"
         if typeName not in self.constraints:
@@ -3469,11 +3544,28 @@ class DVConstraints:
             p1 = self.surfaces[surfaceName][1]
             p2 = self.surfaces[surfaceName][2]
         else:
-            p0 = self.DVGeometries[fromDVGeo].update(surfaceName + "_p0")
-            p1 = self.DVGeometries[fromDVGeo].update(surfaceName + "_p1")
-            p2 = self.DVGeometries[fromDVGeo].update(surfaceName + "_p2")
+            pts = self.DVGeometries[fromDVGeo].update(surfaceName + "_pts")
+            p0, p1, p2 = geo_utils.getTriangleVertices(pts, self.surfaceConn[surfaceName])
         return p0, p1, p2
 
+    def _getSurfaceBVH(self, surfaceName="default"):
+        """Get the bounding volume hierarchy used for the projections onto a surface.
+        It is built the first time it is needed and cached, since the surfaces cannot be changed.
+
+        Parameters
+        ----------
+        surfaceName : str
+            Which DVConstraints surface to get the hierarchy for (default is 'default')
+
+        Returns
+        -------
+        TriangleBVH
+            The bounding volume hierarchy of the original surface
+        """
+        if surfaceName not in self.surfaceBVH:
+            self.surfaceBVH[surfaceName] = geo_utils.TriangleBVH(*self._getSurfaceVertices(surfaceName))
+        return self.surfaceBVH[surfaceName]
+
     def _generateIntersections(self, leList, teList, nSpan, nChord, surfaceName):
         """
         Internal function to generate the grid points (nSpan x nChord)
@@ -3481,8 +3573,30 @@ class DVConstraints:
         functions since addThicknessConstraints2D, and volume based
         constraints use the same code. The list of projected
         coordinates are returned.
+
+        The surfaces cannot be changed, so the coordinates are cached and
+        the same grid is only projected once.
+        """
+        leList = np.array(leList, dtype=float)
+        teList = np.array(teList, dtype=float)
+        key = (
+            surfaceName,
+            leList.shape,
+            leList.tobytes(),
+            teList.shape,
+            teList.tobytes(),
+            tuple(nSpan) if isinstance(nSpan, list) else nSpan,
+            nChord,
+        )
+        if key not in self.intersections:
+            self.intersections[key] = self._projectIntersections(leList, teList, nSpan, nChord, surfaceName)
+        return self.intersections[key].copy()
+
+    def _projectIntersections(self, leList, teList, nSpan, nChord, surfaceName):
         """
-        p0, p1, p2 = self._getSurfaceVertices(surfaceName=surfaceName)
+        Generate and project the grid of _generateIntersections without caching.
+        """
+        bvh = self._getSurfaceBVH(surfaceName)
 
         # Create mesh of intersections
         le_s = Curve(X=leList, k=2)
@@ -3540,40 +3654,31 @@ class DVConstraints:
         # Generate a 2D region of intersections
         X = geo_utils.tfi_2d(le_s(le_span_s), te_s(te_span_s), root_s(chord_s), tip_s(chord_s))
         coords = np.zeros((nSpanTotal, nChord, 2, 3))
-        for i in range(nSpanTotal):
-            for j in range(nChord):
-                # Generate the 'up_vec' from taking the cross product
-                # across a quad
-                if i == 0:
-                    uVec = X[i + 1, j] - X[i, j]
-                elif i == nSpanTotal - 1:
-                    uVec = X[i, j] - X[i - 1, j]
-                else:
-                    uVec = X[i + 1, j] - X[i - 1, j]
 
-                if j == 0:
-                    vVec = X[i, j + 1] - X[i, j]
-                elif j == nChord - 1:
-                    vVec = X[i, j] - X[i, j - 1]
-                else:
-                    vVec = X[i, j + 1] - X[i, j - 1]
-
-                upVec = np.cross(uVec, vVec)
-                # Project actual node:
-                up, down, fail = geo_utils.projectNode(X[i, j], upVec, p0, p1 - p0, p2 - p0)
-
-                if fail == 0:
-                    coords[i, j, 0] = up
-                    coords[i, j, 1] = down
-                elif fail == -1:
-                    # More than 2 solutions. Returned in sorted distance.
-                    coords[i, j, 0] = down
-                    coords[i, j, 1] = up
-                else:
-                    raise Error(
-                        "There was an error projecting a node at (%f, %f, %f) with normal (%f, %f, %f)."
-                        % (X[i, j, 0], X[i, j, 1], X[i, j, 2], upVec[0], upVec[1], upVec[2])
-                    )
+        # Generate the 'up_vec' from taking the cross product across a quad,
+        # with central differences inside the grid and one-sided ones on its edges
+        uVec = np.gradient(X, axis=0)
+        vVec = np.gradient(X, axis=1)
+        upVec = np.cross(uVec, vVec)
+
+        # Project all the nodes at once
+        up, down, fail = bvh.projectRays(X.reshape((-1, 3)), upVec.reshape((-1, 3)))
+        up = up.reshape((nSpanTotal, nChord, 3))
+        down = down.reshape((nSpanTotal, nChord, 3))
+        fail = fail.reshape((nSpanTotal, nChord))
+
+        failed = np.argwhere(fail > 0)
+        if len(failed) > 0:
+            i, j = failed[0]
+            raise Error(
+                "There was an error projecting a node at (%f, %f, %f) with normal (%f, %f, %f)."
+                % (X[i, j, 0], X[i, j, 1], X[i, j, 2], upVec[i, j, 0], upVec[i, j, 1], upVec[i, j, 2])
+            )
+
+        # With more than 2 solutions, they are returned in sorted distance
+        manySol = (fail == -1)[:, :, None]
+        coords[:, :, 0] = np.where(manySol, down, up)
+        coords[:, :, 1] = np.where(manySol, up, down)
 
         return coords
 
@@ -3,7 +3,8 @@ import numpy as np
 
 # Local modules
 from .. import geo_utils
-from ..geo_utils.polygon import areaTri
+from ..geo_utils.bvh import TriangleBVH
+from ..geo_utils.polygon import areaTri, getTriangleVertices, scatterTriangleSens
 from .baseConstraint import GeometricConstraint
 
 try:
@@ -12,6 +13,11 @@ try:
 except ImportError:
     geograd_parallel = None
 
+# Largest change of the exponent of the KS function, rho times the change of the minimum
+# distance, for which the warm-started KS is well-conditioned. It is well below the
+# overflow limit of the exponentials, log(DBL_MAX) ~ 709.
+MAX_KS_EXPONENT_CHANGE = 100.0
+
 
 class TriangulatedSurfaceConstraint(GeometricConstraint):
     """
@@ -24,9 +30,11 @@ class TriangulatedSurfaceConstraint(GeometricConstraint):
         name,
         surface_1,
         surface_1_name,
+        surface_1_conn,
         DVGeo1,
         surface_2,
         surface_2_name,
+        surface_2_conn,
         DVGeo2,
         scale,
         addToPyOpt,
@@ -45,6 +53,8 @@ class TriangulatedSurfaceConstraint(GeometricConstraint):
         # get the point sets
         self.surface_1_name = surface_1_name
         self.surface_2_name = surface_2_name
+        self.surface_1_conn = surface_1_conn
+        self.surface_2_conn = surface_2_conn
         if DVGeo1 is None and DVGeo2 is None:
             raise ValueError(f"Must include at least one geometric parametrization in constraint {name}")
         self.DVGeo1 = DVGeo1
@@ -81,6 +91,10 @@ class TriangulatedSurfaceConstraint(GeometricConstraint):
         self.perim_length = None
         self.minimum_distance = None
 
+        # triangles of each surface that are within maxdim of the other surface, None for all of them
+        self.near_tri1 = None
+        self.near_tri2 = None
+
     def getVarNames(self):
         """
         return the var names relevant to this constraint. By default, this is the DVGeo
@@ -112,15 +126,17 @@ class TriangulatedSurfaceConstraint(GeometricConstraint):
 
         # check if the first mesh has a DVGeo, and if it does, update the points
         if self.DVGeo1 is not None:
-            self.surf1_p0 = self.DVGeo1.update(self.surface_1_name + "_p0", config=config).transpose()
-            self.surf1_p1 = self.DVGeo1.update(self.surface_1_name + "_p1", config=config).transpose()
-            self.surf1_p2 = self.DVGeo1.update(self.surface_1_name + "_p2", config=config).transpose()
+            pts = self.DVGeo1.update(self.surface_1_name + "_pts", config=config)
+            self.surf1_npts = len(pts)
+            p0, p1, p2 = getTriangleVertices(pts, self.surface_1_conn)
+            self.surf1_p0, self.surf1_p1, self.surf1_p2 = p0.transpose(), p1.transpose(), p2.transpose()
 
         # check if the second mesh has a DVGeo, and if it does, update the points
         if self.DVGeo2 is not None:
-            self.surf2_p0 = self.DVGeo2.update(self.surface_2_name + "_p0", config=config).transpose()
-            self.surf2_p1 = self.DVGeo2.update(self.surface_2_name + "_p1", config=config).transpose()
-            self.surf2_p2 = self.DVGeo2.update(self.surface_2_name + "_p2", config=config).transpose()
+            pts = self.DVGeo2.update(self.surface_2_name + "_pts", config=config)
+            self.surf2_npts = len(pts)
+            p0, p1, p2 = getTriangleVertices(pts, self.surface_2_conn)
+            self.surf2_p0, self.surf2_p1, self.surf2_p2 = p0.transpose(), p1.transpose(), p2.transpose()
 
         KS, perim, failflag = self.evalTriangulatedSurfConstraint()
         funcs[self.name + "_KS"] = KS
@@ -159,27 +175,10 @@ class TriangulatedSurfaceConstraint(GeometricConstraint):
         if nDV1 > 0:
             # compute sensitivity with respect to the first mesh
             # grad indices 0-2 are for mesh 1 p0, 1, 2 / 3-5 are for mesh 2 p0, 1, 2
-            tmp_KS_p0 = self.DVGeo1.totalSensitivity(
-                np.transpose(deriv_outputs[5]), self.surface_1_name + "_p0", config=config
-            )
-            tmp_KS_p1 = self.DVGeo1.totalSensitivity(
-                np.transpose(deriv_outputs[6]), self.surface_1_name + "_p1", config=config
-            )
-            tmp_KS_p2 = self.DVGeo1.totalSensitivity(
-                np.transpose(deriv_outputs[7]), self.surface_1_name + "_p2", config=config
-            )
-            tmp_perim_p0 = self.DVGeo1.totalSensitivity(
-                np.transpose(deriv_outputs[11]), self.surface_1_name + "_p0", config=config
-            )
-            tmp_perim_p1 = self.DVGeo1.totalSensitivity(
-                np.transpose(deriv_outputs[12]), self.surface_1_name + "_p1", config=config
-            )
-            tmp_perim_p2 = self.DVGeo1.totalSensitivity(
-                np.transpose(deriv_outputs[13]), self.surface_1_name + "_p2", config=config
-            )
-            for key in tmp_KS_p0:
-                tmpTotalKS[key] = tmp_KS_p0[key] + tmp_KS_p1[key] + tmp_KS_p2[key]
-                tmpTotalPerim[key] = tmp_perim_p0[key] + tmp_perim_p1[key] + tmp_perim_p2[key]
+            tmpTotal = self._getSurfaceSens(deriv_outputs, 0, self.DVGeo1, self.surface_1_name, config)
+            for key in tmpTotal:
+                tmpTotalKS[key] = tmpTotal[key][0:1]
+                tmpTotalPerim[key] = tmpTotal[key][1:2]
 
         if self.DVGeo2 is not None:
             nDV2 = self.DVGeo2.getNDV()
@@ -187,66 +186,59 @@ class TriangulatedSurfaceConstraint(GeometricConstraint):
             nDV2 = 0
 
         if nDV2 > 0:
-            # compute sensitivity with respect to the first mesh
-            # grad indices 0-2 are for mesh 1 p0, 1, 2 / 3-5 are for mesh 2 p0, 1, 2
-            tmp_KS_p0 = self.DVGeo2.totalSensitivity(
-                np.transpose(deriv_outputs[8]), self.surface_2_name + "_p0", config=config
-            )
-            tmp_KS_p1 = self.DVGeo2.totalSensitivity(
-                np.transpose(deriv_outputs[9]), self.surface_2_name + "_p1", config=config
-            )
-            tmp_KS_p2 = self.DVGeo2.totalSensitivity(
-                np.transpose(deriv_outputs[10]), self.surface_2_name + "_p2", config=config
-            )
-            tmp_perim_p0 = self.DVGeo2.totalSensitivity(
-                np.transpose(deriv_outputs[14]), self.surface_2_name + "_p0", config=config
-            )
-            tmp_perim_p1 = self.DVGeo2.totalSensitivity(
-                np.transpose(deriv_outputs[15]), self.surface_2_name + "_p1", config=config
-            )
-            tmp_perim_p2 = self.DVGeo2.totalSensitivity(
-                np.transpose(deriv_outputs[16]), self.surface_2_name + "_p2", config=config
-            )
-            for key in tmp_KS_p0:
-                tmpTotalKS[key] = tmp_KS_p0[key] + tmp_KS_p1[key] + tmp_KS_p2[key]
-                tmpTotalPerim[key] = tmp_perim_p0[key] + tmp_perim_p1[key] + tmp_perim_p2[key]
+            # compute sensitivity with respect to the second mesh
+            tmpTotal = self._getSurfaceSens(deriv_outputs, 1, self.DVGeo2, self.surface_2_name, config)
+            for key in tmpTotal:
+                tmpTotalKS[key] = tmpTotal[key][0:1]
+                tmpTotalPerim[key] = tmpTotal[key][1:2]
         funcsSens[self.name + "_KS"] = tmpTotalKS
         funcsSens[self.name + "_perim"] = tmpTotalPerim
 
+    def _getSurfaceSens(self, deriv_outputs, iSurf, DVGeo, surface_name, config):
+        """
+        Accumulate the KS and perimeter derivatives of the vertices of the
+        triangles of one surface onto its unique vertices and compute the
+        sensitivities of both functions with a single call to DVGeo.
+        """
+        # the derivatives of the KS and the perimeter with respect to p0, p1 and p2
+        iKS = 5 + 3 * iSurf
+        iPerim = 11 + 3 * iSurf
+        dp = [np.stack((deriv_outputs[iKS + i].transpose(), deriv_outputs[iPerim + i].transpose())) for i in range(3)]
+
+        if iSurf == 0:
+            conn, nPts = self.surface_1_conn, self.surf1_npts
+        else:
+            conn, nPts = self.surface_2_conn, self.surf2_npts
+        dpts = scatterTriangleSens(*dp, conn, nPts)
+
+        return DVGeo.totalSensitivity(dpts, surface_name + "_pts", config=config)
+
     def evalTriangulatedSurfConstraint(self):
         """
         Call geograd to compute the KS function and intersection length
         """
-        # first compute the length of the intersection surface between the object and surf mesh
-        mindist_tmp = 0.0
-
-        # first run to get the minimum distance
-        _, perim_length, mindist, _, _ = geograd_parallel.compute(
-            self.surf1_p0,
-            self.surf1_p1,
-            self.surf1_p2,
-            self.surf2_p0,
-            self.surf2_p1,
-            self.surf2_p2,
-            mindist_tmp,
-            self.rho,
-            self.maxdim,
-            self.comm.py2f(),
-        )
-        # second run gets the well-conditioned KS
+        # find the triangles that can contribute for this design
+        self.near_tri1, self.near_tri2 = self._getNearTriangles()
+        surfaces = self._getNearSurfaces()
+
+        if self.minimum_distance is None:
+            # first run to get the minimum distance
+            _, _, mindist_ref, _, _ = geograd_parallel.compute(*surfaces, 0.0, self.rho, self.maxdim, self.comm.py2f())
+        else:
+            # the minimum distance of the previous design is used as a warm start
+            mindist_ref = self.minimum_distance
+
+        # this run gets the well-conditioned KS
         KS, perim_length, mindist, _, _ = geograd_parallel.compute(
-            self.surf1_p0,
-            self.surf1_p1,
-            self.surf1_p2,
-            self.surf2_p0,
-            self.surf2_p1,
-            self.surf2_p2,
-            mindist,
-            self.rho,
-            self.maxdim,
-            self.comm.py2f(),
+            *surfaces, mindist_ref, self.rho, self.maxdim, self.comm.py2f()
         )
 
+        # the KS is ill-conditioned if the design moved too much since the warm start
+        if self.rho * abs(mindist - mindist_ref) > MAX_KS_EXPONENT_CHANGE:
+            KS, perim_length, mindist, _, _ = geograd_parallel.compute(
+                *surfaces, mindist, self.rho, self.maxdim, self.comm.py2f()
+            )
+
         self.perim_length = perim_length
         self.minimum_distance = mindist
 
@@ -280,21 +272,61 @@ class TriangulatedSurfaceConstraint(GeometricConstraint):
         Call geograd to compute the derivatives of the KS function and intersection length
         """
         # first compute the length of the intersection surface between the object and surf mesh
-        deriv_output = geograd_parallel.compute_derivs(
-            self.surf1_p0,
-            self.surf1_p1,
-            self.surf1_p2,
-            self.surf2_p0,
-            self.surf2_p1,
-            self.surf2_p2,
-            self.minimum_distance,
-            self.rho,
-            self.maxdim,
-            self.comm.py2f(),
+        deriv_output = list(
+            geograd_parallel.compute_derivs(
+                *self._getNearSurfaces(), self.minimum_distance, self.rho, self.maxdim, self.comm.py2f()
+            )
         )
 
+        # scatter the derivatives of the near triangles back to the full surfaces
+        for i, near_tri, size in [(5, self.near_tri1, self.surf1_size), (8, self.near_tri2, self.surf2_size)]:
+            if near_tri is not None:
+                for j in [i, i + 1, i + 2, i + 6, i + 7, i + 8]:
+                    full = np.zeros((3, size), dtype=deriv_output[j].dtype)
+                    full[:, near_tri] = deriv_output[j]
+                    deriv_output[j] = full
+
         return deriv_output
 
+    def _getNearTriangles(self):
+        """
+        Broad phase of the constraint. Geograd skips the pairs of triangles
+        that are farther apart than maxdim, so the triangles of each surface
+        that are farther than maxdim from the whole other surface can be
+        removed without changing the KS, the intersection length or their
+        derivatives. The distances are bounded with the distance from the
+        centroid of each triangle to a BVH of the other surface.
+        """
+        surf1 = [p.real.T for p in (self.surf1_p0, self.surf1_p1, self.surf1_p2)]
+        surf2 = [p.real.T for p in (self.surf2_p0, self.surf2_p1, self.surf2_p2)]
+
+        # nothing can be removed if maxdim covers both surfaces
+        allPts = np.vstack(surf1 + surf2)
+        if self.maxdim >= np.linalg.norm(np.max(allPts, axis=0) - np.min(allPts, axis=0)):
+            return None, None
+
+        near_tri1 = _getTrianglesNearSurface(surf1, surf2, self.maxdim)
+        near_tri2 = _getTrianglesNearSurface(surf2, surf1, self.maxdim)
+
+        # geograd needs at least one triangle on each surface
+        if len(near_tri1) == 0 or len(near_tri2) == 0:
+            return None, None
+
+        return near_tri1, near_tri2
+
+    def _getNearSurfaces(self):
+        """Get the vertices of the triangles of both surfaces that are used by geograd"""
+        surfaces = []
+        for near_tri, surf in [
+            (self.near_tri1, (self.surf1_p0, self.surf1_p1, self.surf1_p2)),
+            (self.near_tri2, (self.surf2_p0, self.surf2_p1, self.surf2_p2)),
+        ]:
+            if near_tri is None:
+                surfaces.extend(surf)
+            else:
+                surfaces.extend(np.asfortranarray(p[:, near_tri]) for p in surf)
+        return surfaces
+
     def addConstraintsPyOpt(self, optProb, exclude_wrt=None):
         """
         Add the constraints to pyOpt, if the flag is set
@@ -316,6 +348,18 @@ class TriangulatedSurfaceConstraint(GeometricConstraint):
         raise NotImplementedError()
 
 
+def _getTrianglesNearSurface(surfA, surfB, dist):
+    """
+    Get the indices of the triangles of surface A that may be closer than
+    dist to surface B. The surfaces are given as lists of the three vertex
+    arrays of size (nTri, 3).
+    """
+    centroid = (surfA[0] + surfA[1] + surfA[2]) / 3.0
+    radius = np.max([np.linalg.norm(p - centroid, axis=1) for p in surfA], axis=0)
+    _, _, centroidDist = TriangleBVH(*surfB).closestPoints(centroid)
+    return np.flatnonzero(centroidDist <= dist + radius)
+
+
 class SurfaceAreaConstraint(GeometricConstraint):
     """
     DVConstraints representation of a surface area
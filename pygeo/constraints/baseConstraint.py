@@ -1,10 +1,10 @@
 # Standard Python modules
 from abc import ABC, abstractmethod
-from collections import OrderedDict
 
 # External modules
 from baseclasses.utils import Error
 import numpy as np
+from scipy import sparse
 
 
 class GeometricConstraint(ABC):
@@ -153,7 +153,9 @@ class LinearConstraint:
         funcsSens : dict
             Dictionary to place function values
         """
-        funcsSens[self.name] = self.jac
+        # The jacobians are stored as sparse matrices, but the
+        # sensitivities are returned as dense arrays
+        funcsSens[self.name] = {key: jac.toarray() for key, jac in self.jac.items()}
 
     def addConstraintsPyOpt(self, optProb):
         """
@@ -182,65 +184,20 @@ class LinearConstraint:
         DVGeo object.
         """
         self.vizConIndices = {}
-        # Local Shape Variables
-        for key in self.DVGeo.DV_listLocal:
-            if self.config is None or self.config in self.DVGeo.DV_listLocal[key].config:
-                # end for (indSet loop)
-                cons = self.DVGeo.DV_listLocal[key].mapIndexSets(self.indSetA, self.indSetB)
-                ncon = len(cons)
-                if ncon > 0:
-                    # Now form the jacobian:
-                    ndv = self.DVGeo.DV_listLocal[key].nVal
-                    jacobian = np.zeros((ncon, ndv))
-                    for i in range(ncon):
-                        jacobian[i, cons[i][0]] = self.factorA[i]
-                        jacobian[i, cons[i][1]] = self.factorB[i]
-                    self.jac[key] = jacobian
-
-                # Add to the number of constraints and store indices which
-                # we need for tecplot visualization
-                self.ncon += len(cons)
-                self.vizConIndices[key] = cons
-
-        # Section local shape variables
-        for key in self.DVGeo.DV_listSectionLocal:
-            if self.config is None or self.config in self.DVGeo.DV_listSectionLocal[key].config:
-                # end for (indSet loop)
-                cons = self.DVGeo.DV_listSectionLocal[key].mapIndexSets(self.indSetA, self.indSetB)
-                ncon = len(cons)
-                if ncon > 0:
-                    # Now form the jacobian:
-                    ndv = self.DVGeo.DV_listSectionLocal[key].nVal
-                    jacobian = np.zeros((ncon, ndv))
-                    for i in range(ncon):
-                        jacobian[i, cons[i][0]] = self.factorA[i]
-                        jacobian[i, cons[i][1]] = self.factorB[i]
-                    self.jac[key] = jacobian
-
-                # Add to the number of constraints and store indices which
-                # we need for tecplot visualization
-                self.ncon += len(cons)
-                self.vizConIndices[key] = cons
-
-        # Section local shape variables
-        for key in self.DVGeo.DV_listSpanwiseLocal:
-            if self.config is None or self.config in self.DVGeo.DV_listSpanwiseLocal[key].config:
-                # end for (indSet loop)
-                cons = self.DVGeo.DV_listSpanwiseLocal[key].mapIndexSets(self.indSetA, self.indSetB)
-                ncon = len(cons)
-                if ncon > 0:
-                    # Now form the jacobian:
-                    ndv = self.DVGeo.DV_listSpanwiseLocal[key].nVal
-                    jacobian = np.zeros((ncon, ndv))
-                    for i in range(ncon):
-                        jacobian[i, cons[i][0]] = self.factorA[i]
-                        jacobian[i, cons[i][1]] = self.factorB[i]
-                    self.jac[key] = jacobian
-
-                # Add to the number of constraints and store indices which
-                # we need for tecplot visualization
-                self.ncon += len(cons)
-                self.vizConIndices[key] = cons
+        # Local, section local and spanwise local shape variables
+        for DVList in [self.DVGeo.DV_listLocal, self.DVGeo.DV_listSectionLocal, self.DVGeo.DV_listSpanwiseLocal]:
+            for key in DVList:
+                if self.config is None or self.config in DVList[key].config:
+                    cons = DVList[key].mapIndexSets(self.indSetA, self.indSetB)
+                    ncon = len(cons)
+                    if ncon > 0:
+                        # Now form the jacobian
+                        self.jac[key] = self._getJacobian(cons, DVList[key].nVal)
+
+                    # Add to the number of constraints and store indices which
+                    # we need for tecplot visualization
+                    self.ncon += ncon
+                    self.vizConIndices[key] = cons
 
         # with-respect-to are just the keys of the jacobian
         self.wrt = list(self.jac.keys())
@@ -248,29 +205,48 @@ class LinearConstraint:
         # now map the jac to composite domain:
         # we assume jac is always only wrt "local" DVs
         if self.DVGeo.useComposite:
-            nDV = self.DVGeo.getNDV()
-            # for the jac, we need to "pad" the rest of the matrix with zero, then perform mat-mat product
-            newJac = np.zeros((self.ncon, nDV))
-            for i in range(self.ncon):
-                temp_dict = {}
-                # all_DVs just contains all the DVs so we can loop over them easily
-                all_DVs = OrderedDict({})
-                all_DVs.update(self.DVGeo.DV_listGlobal)
-                all_DVs.update(self.DVGeo.DV_listLocal)
-                all_DVs.update(self.DVGeo.DV_listSectionLocal)
-                all_DVs.update(self.DVGeo.DV_listSpanwiseLocal)
-
-                for dv in all_DVs.keys():
-                    if dv in self.wrt:
-                        temp_dict[dv] = self.jac[dv][i, :].flatten()
-                    else:
-                        temp_dict[dv] = np.zeros(all_DVs[dv].nVal)
-                newJac[i, :] = self.DVGeo.convertDictToSensitivity(temp_dict)
-            # now multiply by the mapping
-            newJac = newJac @ self.DVGeo.DVComposite.u
-            self.jac = {self.DVGeo.DVComposite.name: newJac}
+            # all_DVs just contains all the DVs so we can find the columns of each one
+            all_DVs = {}
+            all_DVs.update(self.DVGeo.DV_listGlobal)
+            all_DVs.update(self.DVGeo.DV_listLocal)
+            all_DVs.update(self.DVGeo.DV_listSectionLocal)
+            all_DVs.update(self.DVGeo.DV_listSpanwiseLocal)
+
+            u = self.DVGeo.DVComposite.u
+            newJac = np.zeros((self.ncon, u.shape[1]))
+            iCon = 0
+            for key in self.wrt:
+                # Find the rows of the mapping that belong to this DV
+                temp_dict = {dv: np.zeros(all_DVs[dv].nVal) for dv in all_DVs}
+                temp_dict[key] = np.ones(all_DVs[key].nVal)
+                ind = np.flatnonzero(self.DVGeo.convertDictToSensitivity(temp_dict))
+
+                ncon = self.jac[key].shape[0]
+                newJac[iCon : iCon + ncon] = self.jac[key] @ u[ind]
+                iCon += ncon
+
+            self.jac = {self.DVGeo.DVComposite.name: sparse.csr_matrix(newJac)}
             self.wrt = [self.DVGeo.DVComposite.name]
 
+    def _getJacobian(self, cons, ndv):
+        """
+        Assemble the sparse jacobian of the constraints given by the pairs
+        of design variable indices in cons
+        """
+        cons = np.array(cons)
+        ncon = len(cons)
+        factorA = np.asarray(self.factorA, dtype="d")[:ncon]
+        factorB = np.asarray(self.factorB, dtype="d")[:ncon]
+
+        # If both coefficients are moved by the same design variable,
+        # only factorB is applied
+        maskA = cons[:, 0] != cons[:, 1]
+        rows = np.concatenate([np.arange(ncon)[maskA], np.arange(ncon)])
+        cols = np.concatenate([cons[maskA, 0], cons[:, 1]])
+        data = np.concatenate([factorA[maskA], factorB])
+
+        return sparse.csr_matrix((data, (rows, cols)), shape=(ncon, ndv))
+
     def writeTecplot(self, handle):
         """
         Write the visualization of this set of lete constraints
@@ -344,7 +320,9 @@ class GlobalLinearConstraint:
         funcsSens : dict
             Dictionary to place function values
         """
-        funcsSens[self.name] = self.jac
+        # The jacobians are stored as sparse matrices, but the
+        # sensitivities are returned as dense arrays
+        funcsSens[self.name] = {key: jac.toarray() for key, jac in self.jac.items()}
 
     def addConstraintsPyOpt(self, optProb):
         """
@@ -382,10 +360,9 @@ class GlobalLinearConstraint:
             stop += 1
             ncon = len(np.zeros(ndv)[start:stop]) - 1
 
-            jacobian = np.zeros((ncon, ndv))
             slope = options["slope"]
-            for i in range(ncon):
-                jacobian[i, start + i] = 1.0 * slope
-                jacobian[i, start + i + 1] = -1.0 * slope
-            self.jac[self.key] = jacobian
+            rows = np.repeat(np.arange(ncon), 2)
+            cols = (start + np.arange(ncon)[:, None] + np.arange(2)).ravel()
+            data = np.tile([1.0 * slope, -1.0 * slope], ncon)
+            self.jac[self.key] = sparse.csr_matrix((data, (rows, cols)), shape=(ncon, ndv))
             self.ncon += ncon
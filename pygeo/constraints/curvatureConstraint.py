@@ -270,6 +270,39 @@ class CurvatureConstraint(GeometricConstraint):
             # A list of the coordinates arrays for each surface, in the shape that DVGeo expects (N_nodes,3)
             self.coords += [np.reshape(self.X[iSurf], (surfs[iSurf].X.shape[0] * surfs[iSurf].X.shape[1], 3))]
 
+        # The finite difference operators and integration weights only
+        # depend on the structured grid of each surface, so they are
+        # assembled once here and reused for every evaluation
+        self.Du = []
+        self.Dv = []
+        self.Duu = []
+        self.Dvv = []
+        self.Duv = []
+        self.DT = []
+        self.wt = []
+        for iSurf in range(self.nSurfs):
+            Du = self.evalDiffSens(iSurf, "u")
+            Dv = self.evalDiffSens(iSurf, "v")
+            self.Du += [Du]
+            self.Dv += [Dv]
+            self.Duu += [(Du @ Du).tocsr()]
+            self.Dvv += [(Dv @ Dv).tocsr()]
+            self.Duv += [(Du @ Dv).tocsr()]
+            # Transposed operators for the reverse products, in the order
+            # t_u, t_v, t_uu, t_vv, t_uv
+            self.DT += [[D.T.tocsr() for D in [Du, Dv, self.Duu[iSurf], self.Dvv[iSurf], self.Duv[iSurf]]]]
+
+            # Assign integration weights for each point
+            # 1   for center nodes
+            # 1/2 for edge nodes
+            # 1/4 for corner nodes
+            wt = np.ones(self.node_map[iSurf].size)
+            wt[self.node_map[iSurf][0, :]] *= 0.5
+            wt[self.node_map[iSurf][-1, :]] *= 0.5
+            wt[self.node_map[iSurf][:, 0]] *= 0.5
+            wt[self.node_map[iSurf][:, -1]] *= 0.5
+            self.wt += [wt]
+
         self.curvatureType = curvatureType
         self.scaled = scaled
         self.KSCoeff = KSCoeff
@@ -345,66 +378,28 @@ class CurvatureConstraint(GeometricConstraint):
         Evaluate the integral K**2 over the surface area of the wing.
         Where K is the Gaussian curvature.
         """
-        # Evaluate the derivative of the position vector of every point on the
-        # surface wrt to the parameteric corrdinate u and v
-        t_u = self.evalDiff(iSurf, self.X[iSurf], "u")
-        t_v = self.evalDiff(iSurf, self.X[iSurf], "v")
-        # Compute the normal vector by taking the cross product of t_u and t_v
-        n = self.evalCross(iSurf, t_u, t_v)
-        # Compute the norm of tu_ x tv
-        n_norm = self.evalNorm(iSurf, n)
-        # Normalize the normal vector
-        n_hat = np.zeros_like(n)
-        n_hat[self.X_map[iSurf][:, :, 0]] = n[self.X_map[iSurf][:, :, 0]] / n_norm[self.node_map[iSurf][:, :]]
-        n_hat[self.X_map[iSurf][:, :, 1]] = n[self.X_map[iSurf][:, :, 1]] / n_norm[self.node_map[iSurf][:, :]]
-        n_hat[self.X_map[iSurf][:, :, 2]] = n[self.X_map[iSurf][:, :, 2]] / n_norm[self.node_map[iSurf][:, :]]
-        # Evaluate the second derivatives of the position vector wrt u and v
-        t_uu = self.evalDiff(iSurf, t_u, "u")
-        t_vv = self.evalDiff(iSurf, t_v, "v")
-        t_uv = self.evalDiff(iSurf, t_v, "u")
-        # Compute the components of the first fundamental form of a parameteric
-        # surface
-        E = self.evalInProd(iSurf, t_u, t_u)
-        F = self.evalInProd(iSurf, t_v, t_u)
-        G = self.evalInProd(iSurf, t_v, t_v)
-        # Compute the components of the second fundamental form of a parameteric
-        # surface
-        L = self.evalInProd(iSurf, t_uu, n_hat)
-        M = self.evalInProd(iSurf, t_uv, n_hat)
-        N = self.evalInProd(iSurf, t_vv, n_hat)
-        # Compute Gaussian and mean curvature (K and H)
-        K = (L * N - M * M) / (E * G - F * F)
-        H = (E * N - 2 * F * M + G * L) / (2 * (E * G - F * F))
+        v = self._evalCurvatureFields(iSurf)
+        K = v["K"]
+        H = v["H"]
+        dS = v["dS"]
         # Compute the combined curvature (C)
         C = 4.0 * H * H - 2.0 * K
-        # Assign integration weights for each point
-        # 1   for center nodes
-        # 1/2 for edge nodes
-        # 1/4 for corner nodes
-        wt = np.zeros_like(n_norm) + 1
-        wt[self.node_map[iSurf][0, :]] *= 0.5
-        wt[self.node_map[iSurf][-1, :]] *= 0.5
-        wt[self.node_map[iSurf][:, 0]] *= 0.5
-        wt[self.node_map[iSurf][:, -1]] *= 0.5
-        # Compute discrete area associated with each node
-        dS = wt * n_norm
-        one = np.ones(self.node_map[iSurf].size)
 
         if self.curvatureType == "Gaussian":
             # Now compute integral (K**2) over S, equivalent to sum(K**2*dS)
-            kS = np.dot(one, K * K * dS)
+            kS = np.sum(K * K * dS)
             return [kS, K, H, C]
         elif self.curvatureType == "mean":
             # Now compute integral (H**2) over S, equivalent to sum(H**2*dS)
-            hS = np.dot(one, H * H * dS)
+            hS = np.sum(H * H * dS)
             return [hS, K, H, C]
         elif self.curvatureType == "combined":
             # Now compute integral C over S, equivalent to sum(C*dS)
-            cS = np.dot(one, C * dS)
+            cS = np.sum(C * dS)
             return [cS, K, H, C]
         elif self.curvatureType == "KSmean":
             # Now compute the KS function for mean curvature, equivalent to KS(H*H*dS)
-            sigmaH = np.dot(one, np.exp(self.KSCoeff * H * H * dS))
+            sigmaH = np.sum(np.exp(self.KSCoeff * H * H * dS))
             KSmean = np.log(sigmaH) / self.KSCoeff
             if MPI.COMM_WORLD.rank == 0:
                 print("Max curvature: ", max(H * H * dS))
@@ -418,359 +413,147 @@ class CurvatureConstraint(GeometricConstraint):
     def evalCurvAreaSens(self, iSurf):
         """
         Compute sensitivity of the integral K**2 wrt the coordinate
-        locations X
-        """
-        # Evaluate the derivative of the position vector of every point on the
-        # surface wrt to the parameteric corrdinate u and v
-        t_u = self.evalDiff(iSurf, self.X[iSurf], "u")
-        Dt_uDX = self.evalDiffSens(iSurf, "u")
-        t_v = self.evalDiff(iSurf, self.X[iSurf], "v")
-        Dt_vDX = self.evalDiffSens(iSurf, "v")
-        # Compute the normal vector by taking the cross product of t_u and t_v
-        n = self.evalCross(iSurf, t_u, t_v)
-        [DnDt_u, DnDt_v] = self.evalCrossSens(iSurf, t_u, t_v)
-        DnDX = DnDt_u.dot(Dt_uDX) + DnDt_v.dot(Dt_vDX)
-        # Compute the norm of tu_ x tv
-        n_norm = self.evalNorm(iSurf, n)
-        Dn_normDn = self.evalNormSens(iSurf, n)
-        Dn_normDX = Dn_normDn.dot(DnDX)
-        # Normalize the normal vector
-        n_hat = np.zeros_like(n)
-        n_hat[self.X_map[iSurf][:, :, 0]] = n[self.X_map[iSurf][:, :, 0]] / n_norm[self.node_map[iSurf][:, :]]
-        n_hat[self.X_map[iSurf][:, :, 1]] = n[self.X_map[iSurf][:, :, 1]] / n_norm[self.node_map[iSurf][:, :]]
-        n_hat[self.X_map[iSurf][:, :, 2]] = n[self.X_map[iSurf][:, :, 2]] / n_norm[self.node_map[iSurf][:, :]]
+        locations X.
 
-        ii = []
-        data = []
-        for i in range(3):
-            # Dn_hat[self.X_map[iSurf][:,:,i]]/Dn[self.X_map[iSurf][:,:,i]]
-            ii += list(np.reshape(self.X_map[iSurf][:, :, i], -1))
-            data += list(np.reshape(n_norm[self.node_map[iSurf][:, :]] ** -1, -1))
-        Dn_hatDn = csr_matrix((data, [ii, ii]), shape=(self.X[iSurf].size, self.X[iSurf].size))
-
-        ii = []
-        jj = []
-        data = []
-        for i in range(3):
-            # Dn_hat[self.X_map[iSurf][:,:,i]]/Dn_norm[self.node_map[iSurf][:,:]]
-            ii += list(np.reshape(self.X_map[iSurf][:, :, i], -1))
-            jj += list(np.reshape(self.node_map[iSurf][:, :], -1))
-            data += list(np.reshape(-n[self.X_map[iSurf][:, :, i]] / (n_norm[self.node_map[iSurf][:, :]] ** 2), -1))
-        Dn_hatDn_norm = csr_matrix((data, [ii, jj]), shape=(n_hat.size, n_norm.size))
-
-        Dn_hatDX = Dn_hatDn.dot(DnDX) + Dn_hatDn_norm.dot(Dn_normDX)
-        # Evaluate the second derivatives of the position vector wrt u and v
-        t_uu = self.evalDiff(iSurf, t_u, "u")
-        Dt_uuDt_u = self.evalDiffSens(iSurf, "u")
-        Dt_uuDX = Dt_uuDt_u.dot(Dt_uDX)
-
-        t_vv = self.evalDiff(iSurf, t_v, "v")
-        Dt_vvDt_v = self.evalDiffSens(iSurf, "v")
-        Dt_vvDX = Dt_vvDt_v.dot(Dt_vDX)
-
-        t_uv = self.evalDiff(iSurf, t_v, "u")
-        Dt_uvDt_v = self.evalDiffSens(iSurf, "u")
-        Dt_uvDX = Dt_uvDt_v.dot(Dt_vDX)
-        # Compute the components of the first fundamental form of a parameteric
-        # surface
-        E = self.evalInProd(iSurf, t_u, t_u)
-        [DEDt_u, _] = self.evalInProdSens(iSurf, t_u, t_u)
-        DEDt_u *= 2
-        DEDX = DEDt_u.dot(Dt_uDX)
-
-        F = self.evalInProd(iSurf, t_v, t_u)
-        [DFDt_v, DFDt_u] = self.evalInProdSens(iSurf, t_v, t_u)
-        DFDX = DFDt_v.dot(Dt_vDX) + DFDt_u.dot(Dt_uDX)
-
-        G = self.evalInProd(iSurf, t_v, t_v)
-        [DGDt_v, _] = self.evalInProdSens(iSurf, t_v, t_v)
-        DGDt_v *= 2
-        DGDX = DGDt_v.dot(Dt_vDX)
-
-        # Compute the components of the second fundamental form of a parameteric
-        # surface
-        L = self.evalInProd(iSurf, t_uu, n_hat)
-        [DLDt_uu, DLDn_hat] = self.evalInProdSens(iSurf, t_uu, n_hat)
-        DLDX = DLDt_uu.dot(Dt_uuDX) + DLDn_hat.dot(Dn_hatDX)
-
-        M = self.evalInProd(iSurf, t_uv, n_hat)
-        [DMDt_uv, DMDn_hat] = self.evalInProdSens(iSurf, t_uv, n_hat)
-        DMDX = DMDt_uv.dot(Dt_uvDX) + DMDn_hat.dot(Dn_hatDX)
-
-        N = self.evalInProd(iSurf, t_vv, n_hat)
-        [DNDt_vv, DNDn_hat] = self.evalInProdSens(iSurf, t_vv, n_hat)
-        DNDX = DNDt_vv.dot(Dt_vvDX) + DNDn_hat.dot(Dn_hatDX)
-
-        # Compute Gaussian and mean curvature (K and H)
-        K = (L * N - M * M) / (E * G - F * F)
-        DKDE = self.diags(-(L * N - M * M) / (E * G - F * F) ** 2 * G)
-        DKDF = self.diags((L * N - M * M) / (E * G - F * F) ** 2 * 2 * F)
-        DKDG = self.diags(-(L * N - M * M) / (E * G - F * F) ** 2 * E)
-        DKDL = self.diags(N / (E * G - F * F))
-        DKDM = self.diags(2 * M / (E * G - F * F))
-        DKDN = self.diags(L / (E * G - F * F))
-        DKDX = DKDE.dot(DEDX) + DKDF.dot(DFDX) + DKDG.dot(DGDX) + DKDL.dot(DLDX) + DKDM.dot(DMDX) + DKDN.dot(DNDX)
-
-        H = (E * N - 2 * F * M + G * L) / (2 * (E * G - F * F))
-        DHDE = self.diags(N / (2 * (E * G - F * F)) - (E * N - 2 * F * M + G * L) / (2 * (E * G - F * F)) ** 2 * 2 * G)
-        DHDF = self.diags(
-            -2 * M / (2 * (E * G - F * F)) + (E * N - 2 * F * M + G * L) / (2 * (E * G - F * F)) ** 2 * 4 * F
-        )
-        DHDG = self.diags(L / (2 * (E * G - F * F)) - (E * N - 2 * F * M + G * L) / (2 * (E * G - F * F)) ** 2 * 2 * E)
-        DHDL = self.diags(G / (2 * (E * G - F * F)))
-        DHDM = self.diags(-2 * F / (2 * (E * G - F * F)))
-        DHDN = self.diags(E / (2 * (E * G - F * F)))
-        DHDX = DHDE.dot(DEDX) + DHDF.dot(DFDX) + DHDG.dot(DGDX) + DHDL.dot(DLDX) + DHDM.dot(DMDX) + DHDN.dot(DNDX)
-
-        # Assign integration weights for each point
-        # 1   for center nodes
-        # 1/2 for edge nodes
-        # 1/4 for corner nodes
-        wt = np.zeros_like(n_norm) + 1
-        wt[self.node_map[iSurf][0, :]] *= 0.5
-        wt[self.node_map[iSurf][-1, :]] *= 0.5
-        wt[self.node_map[iSurf][:, 0]] *= 0.5
-        wt[self.node_map[iSurf][:, -1]] *= 0.5
-        # Compute discrete area associated with each node
-        dS = wt * n_norm
-        DdSDX = self.diags(wt).dot(Dn_normDX)
-
-        one = np.ones(self.node_map[iSurf].size)
+        The sensitivity is computed in reverse mode: the seeds on the
+        nodal curvatures are propagated back through the fundamental
+        forms with vectorized operations, and then to the coordinates
+        with the transposed finite difference operators.
+        """
+        v = self._evalCurvatureFields(iSurf)
+        K = v["K"]
+        H = v["H"]
+        dS = v["dS"]
 
+        # Seeds on the nodal Gaussian curvature, mean curvature, and area
         if self.curvatureType == "Gaussian":
-            # Now compute integral (K**2) over S, equivalent to sum(K**2*dS)
-            # kS = np.dot(one, K * K * dS)
-            DkSDX = (self.diags(2 * K * dS).dot(DKDX) + self.diags(K * K).dot(DdSDX)).T.dot(one)
-            return DkSDX
+            # kS = sum(K**2*dS)
+            Kb = 2 * K * dS
+            Hb = np.zeros_like(H)
+            dSb = K * K
         elif self.curvatureType == "mean":
-            # Now compute integral (H**2) over S, equivalent to sum(H**2*dS)
-            # hS = np.dot(one, H * H * dS)
-            DhSDX = (self.diags(2 * H * dS).dot(DHDX) + self.diags(H * H).dot(DdSDX)).T.dot(one)
-            return DhSDX
+            # hS = sum(H**2*dS)
+            Kb = np.zeros_like(K)
+            Hb = 2 * H * dS
+            dSb = H * H
         elif self.curvatureType == "combined":
-            # Now compute dcSDX. Note: cS= sum( (4*H*H-2*K)*dS ), DcSDX = term1 - term2
-            # where term1 = sum( 8*H*DHDX*dS + 4*H*H*DdSdX ), term2 = sum( 2*DKDX*dS + 2*K*DdSdX )
-            term1 = (self.diags(8 * H * dS).dot(DHDX) + self.diags(4 * H * H).dot(DdSDX)).T.dot(one)
-            term2 = (self.diags(2 * dS).dot(DKDX) + self.diags(2 * K).dot(DdSDX)).T.dot(one)
-            DcSDX = term1 - term2
-            return DcSDX
+            # cS = sum((4*H*H-2*K)*dS)
+            Kb = -2 * dS
+            Hb = 8 * H * dS
+            dSb = 4 * H * H - 2 * K
         elif self.curvatureType == "KSmean":
-            sigmaH = np.dot(one, np.exp(self.KSCoeff * H * H * dS))
-            DhSDX = (
-                self.diags(2 * H * dS / sigmaH * np.exp(self.KSCoeff * H * H * dS)).dot(DHDX)
-                + self.diags(H * H / sigmaH * np.exp(self.KSCoeff * H * H * dS)).dot(DdSDX)
-            ).T.dot(one)
-            return DhSDX
+            # KSmean = log(sum(exp(KSCoeff*H*H*dS)))/KSCoeff
+            expH = np.exp(self.KSCoeff * H * H * dS)
+            sigmaH = np.sum(expH)
+            Kb = np.zeros_like(K)
+            Hb = 2 * H * dS * expH / sigmaH
+            dSb = H * H * expH / sigmaH
         else:
             raise Error(
                 "The curvatureType parameter should be Gaussian, mean, or combined, "
                 "%s is not supported!" % self.curvatureType
             )
 
-    def evalCross(self, iSurf, u, v):
-        """
-        Evaluate the cross product of two vector fields on the surface
-        (n = u x v)
-        """
-        n = np.zeros_like(self.X[iSurf])
-        n[self.X_map[iSurf][:, :, 0]] = (
-            u[self.X_map[iSurf][:, :, 1]] * v[self.X_map[iSurf][:, :, 2]]
-            - u[self.X_map[iSurf][:, :, 2]] * v[self.X_map[iSurf][:, :, 1]]
-        )
-        n[self.X_map[iSurf][:, :, 1]] = (
-            -u[self.X_map[iSurf][:, :, 0]] * v[self.X_map[iSurf][:, :, 2]]
-            + u[self.X_map[iSurf][:, :, 2]] * v[self.X_map[iSurf][:, :, 0]]
-        )
-        n[self.X_map[iSurf][:, :, 2]] = (
-            u[self.X_map[iSurf][:, :, 0]] * v[self.X_map[iSurf][:, :, 1]]
-            - u[self.X_map[iSurf][:, :, 1]] * v[self.X_map[iSurf][:, :, 0]]
+        E, F, G = v["E"], v["F"], v["G"]
+        L, M, N = v["L"], v["M"], v["N"]
+        det = E * G - F * F
+        P = L * N - M * M
+        Q = E * N - 2 * F * M + G * L
+
+        # K = P / det and H = Q / (2 * det)
+        Pb = Kb / det
+        Qb = Hb / (2 * det)
+        detb = -Kb * P / det**2 - Hb * Q / (2 * det**2)
+
+        # First and second fundamental forms
+        Eb = detb * G + Qb * N
+        Fb = -2 * detb * F - 2 * Qb * M
+        Gb = detb * E + Qb * L
+        Lb = Pb * N + Qb * G
+        Mb = -2 * Pb * M - 2 * Qb * F
+        Nb = Pb * L + Qb * E
+
+        t_u, t_v = v["t_u"], v["t_v"]
+        n, n_norm, n_hat = v["n"], v["n_norm"], v["n_hat"]
+        t_ub = 2 * Eb[:, None] * t_u + Fb[:, None] * t_v
+        t_vb = 2 * Gb[:, None] * t_v + Fb[:, None] * t_u
+        t_uub = Lb[:, None] * n_hat
+        t_vvb = Nb[:, None] * n_hat
+        t_uvb = Mb[:, None] * n_hat
+        n_hatb = Lb[:, None] * v["t_uu"] + Mb[:, None] * v["t_uv"] + Nb[:, None] * v["t_vv"]
+
+        # Normalization and area of the normal vector
+        n_normb = self.wt[iSurf] * dSb
+        nb = n_hatb / n_norm[:, None] + n * ((n_normb - np.sum(n_hatb * n_hat, axis=1) / n_norm) / n_norm)[:, None]
+
+        # n = t_u x t_v
+        t_ub += np.cross(t_v, nb)
+        t_vb += np.cross(nb, t_u)
+
+        DuT, DvT, DuuT, DvvT, DuvT = self.DT[iSurf]
+        DkSDX = (
+            DuT.dot(t_ub.flatten())
+            + DvT.dot(t_vb.flatten())
+            + DuuT.dot(t_uub.flatten())
+            + DvvT.dot(t_vvb.flatten())
+            + DuvT.dot(t_uvb.flatten())
         )
-        return n
-
-    def evalCrossSens(self, iSurf, u, v):
-        """
-        Evaluate sensitivity of cross product wrt to the input vectors u and v
-        (DnDu, DnDv)
-        """
-        # Compute sensitivity wrt v
-        ii = []
-        jj = []
-        data = []
-        # Dn[self.X_map[iSurf][:,:,0]]/Dv[self.X_map[iSurf][:,:,2]]
-        ii += list(np.reshape(self.X_map[iSurf][:, :, 0], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 2], -1))
-        data += list(np.reshape(u[self.X_map[iSurf][:, :, 1]], -1))
-        # Dn[self.X_map[iSurf][:,:,0]]/Dv[self.X_map[iSurf][:,:,1]]
-        ii += list(np.reshape(self.X_map[iSurf][:, :, 0], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 1], -1))
-        data += list(np.reshape(-u[self.X_map[iSurf][:, :, 2]], -1))
-        # Dn[self.X_map[iSurf][:,:,1]]/Dv[self.X_map[iSurf][:,:,2]]
-        ii += list(np.reshape(self.X_map[iSurf][:, :, 1], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 2], -1))
-        data += list(np.reshape(-u[self.X_map[iSurf][:, :, 0]], -1))
-        # Dn[self.X_map[iSurf][:,:,1]]/Dv[self.X_map[iSurf][:,:,0]]
-        ii += list(np.reshape(self.X_map[iSurf][:, :, 1], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 0], -1))
-        data += list(np.reshape(u[self.X_map[iSurf][:, :, 2]], -1))
-        # Dn[self.X_map[iSurf][:,:,2]]/Dv[self.X_map[iSurf][:,:,1]]
-        ii += list(np.reshape(self.X_map[iSurf][:, :, 2], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 1], -1))
-        data += list(np.reshape(u[self.X_map[iSurf][:, :, 0]], -1))
-        # Dn[self.X_map[iSurf][:,:,2]]/Dv[self.X_map[iSurf][:,:,0]]
-        ii += list(np.reshape(self.X_map[iSurf][:, :, 2], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 0], -1))
-        data += list(np.reshape(-u[self.X_map[iSurf][:, :, 1]], -1))
-
-        DnDv = csr_matrix((data, [ii, jj]), shape=(self.X[iSurf].size, self.X[iSurf].size))
-        # Now wrt v
-        ii = []
-        jj = []
-        data = []
-        # Dn[self.X_map[iSurf][:,:,0]]/Du[self.X_map[iSurf][:,:,1]]
-        ii += list(np.reshape(self.X_map[iSurf][:, :, 0], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 1], -1))
-        data += list(np.reshape(v[self.X_map[iSurf][:, :, 2]], -1))
-        # Dn[self.X_map[iSurf][:,:,0]]/Du[self.X_map[iSurf][:,:,2]]
-        ii += list(np.reshape(self.X_map[iSurf][:, :, 0], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 2], -1))
-        data += list(np.reshape(-v[self.X_map[iSurf][:, :, 1]], -1))
-        # Dn[self.X_map[iSurf][:,:,1]]/Du[self.X_map[iSurf][:,:,0]]
-        ii += list(np.reshape(self.X_map[iSurf][:, :, 1], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 0], -1))
-        data += list(np.reshape(-v[self.X_map[iSurf][:, :, 2]], -1))
-        # Dn[self.X_map[iSurf][:,:,1]]/Du[self.X_map[iSurf][:,:,2]]
-        ii += list(np.reshape(self.X_map[iSurf][:, :, 1], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 2], -1))
-        data += list(np.reshape(v[self.X_map[iSurf][:, :, 0]], -1))
-        # Dn[self.X_map[iSurf][:,:,2]]/Du[self.X_map[iSurf][:,:,0]]
-        ii += list(np.reshape(self.X_map[iSurf][:, :, 2], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 0], -1))
-        data += list(np.reshape(v[self.X_map[iSurf][:, :, 1]], -1))
-        # Dn[self.X_map[iSurf][:,:,2]]/Du[self.X_map[iSurf][:,:,1]]
-        ii += list(np.reshape(self.X_map[iSurf][:, :, 2], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 1], -1))
-        data += list(np.reshape(-v[self.X_map[iSurf][:, :, 0]], -1))
-
-        DnDu = csr_matrix((data, [ii, jj]), shape=(self.X[iSurf].size, self.X[iSurf].size))
-        return [DnDu, DnDv]
-
-    def evalNorm(self, iSurf, u):
-        """
-        Evaluate the norm of vector field on the surface
-         (u o u)**1/2
-        """
-        u_norm = np.zeros(self.X[iSurf].size // 3)
-        u_norm[self.node_map[iSurf][:, :]] = np.sqrt(
-            u[self.X_map[iSurf][:, :, 0]] ** 2 + u[self.X_map[iSurf][:, :, 1]] ** 2 + u[self.X_map[iSurf][:, :, 2]] ** 2
-        )
-        return u_norm
-
-    def evalNormSens(self, iSurf, u):
-        """
-        Evaluate the sensitivity of the norm wrt input vector u
-        """
-        u_norm = np.zeros(self.X[iSurf].size // 3)
-        u_norm[self.node_map[iSurf][:, :]] = np.sqrt(
-            u[self.X_map[iSurf][:, :, 0]] ** 2 + u[self.X_map[iSurf][:, :, 1]] ** 2 + u[self.X_map[iSurf][:, :, 2]] ** 2
-        )
-        ii = []
-        jj = []
-        data = []
-        # Du_norm[self.node_map[iSurf][:,:]]Du[self.X_map[iSurf][:,:,0]]
-        ii += list(np.reshape(self.node_map[iSurf][:, :], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 0], -1))
-        data += list(np.reshape(u[self.X_map[iSurf][:, :, 0]] / u_norm[self.node_map[iSurf][:, :]], -1))
-
-        # Du_norm[self.node_map[iSurf][:,:]]Du[self.X_map[iSurf][:,:,1]]
-        ii += list(np.reshape(self.node_map[iSurf][:, :], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 1], -1))
-        data += list(np.reshape(u[self.X_map[iSurf][:, :, 1]] / u_norm[self.node_map[iSurf][:, :]], -1))
-
-        # Du_norm[self.node_map[iSurf][:,:]]Du[self.X_map[iSurf][:,:,2]]
-        ii += list(np.reshape(self.node_map[iSurf][:, :], -1))
-        jj += list(np.reshape(self.X_map[iSurf][:, :, 2], -1))
-        data += list(np.reshape(u[self.X_map[iSurf][:, :, 2]] / u_norm[self.node_map[iSurf][:, :]], -1))
-
-        Du_normDu = csr_matrix((data, [ii, jj]), shape=(u_norm.size, self.X[iSurf].size))
-        return Du_normDu
-
-    def evalInProd(self, iSurf, u, v):
-        """
-        Evaluate the inner product of two vector fields on the surface
-        (ip = u o v)
-        """
-        ip = np.zeros(self.node_map[iSurf].size)
-        for i in range(3):
-            ip[self.node_map[iSurf][:, :]] += u[self.X_map[iSurf][:, :, i]] * v[self.X_map[iSurf][:, :, i]]
-        return ip
-
-    def evalInProdSens(self, iSurf, u, v):
-        """
-        Evaluate sensitivity of inner product wrt to the input vectors u and v
-        (DipDu, DipDv)
-        """
-        ii = []
-        jj = []
-        data = []
-        for i in range(3):
-            # Dip[node_map[:,:]]/Du[self.X_map[iSurf][:,:,i]]
-            ii += list(np.reshape(self.node_map[iSurf][:, :], -1))
-            jj += list(np.reshape(self.X_map[iSurf][:, :, i], -1))
-            data += list(np.reshape(v[self.X_map[iSurf][:, :, i]], -1))
-        DipDu = csr_matrix((data, [ii, jj]), shape=(self.node_map[iSurf].size, self.X_map[iSurf].size))
-        ii = []
-        jj = []
-        data = []
-        for i in range(3):
-            # Dip[node_map[:,:]]/Dv[self.X_map[iSurf][:,:,i]]
-            ii += list(np.reshape(self.node_map[iSurf][:, :], -1))
-            jj += list(np.reshape(self.X_map[iSurf][:, :, i], -1))
-            data += list(np.reshape(u[self.X_map[iSurf][:, :, i]], -1))
-        DipDv = csr_matrix((data, [ii, jj]), shape=(self.node_map[iSurf].size, self.X_map[iSurf].size))
-        return [DipDu, DipDv]
-
-    def evalDiff(self, iSurf, v, wrt):
-        """
-        Differentiate vector field v wrt the parameteric coordinate u or v.
-        Second order accurate. Central difference for nodes in the center
-        forward/backward difference for nodes on the edge
-        """
-        v_wrt = np.zeros_like(v)
-        if wrt == "u":
-            v_wrt[self.X_map[iSurf][1:-1, :, :]] = (
-                v[self.X_map[iSurf][2:, :, :]] - v[self.X_map[iSurf][0:-2, :, :]]
-            ) / 2.0
-            v_wrt[self.X_map[iSurf][0, :, :]] = (
-                -1 * v[self.X_map[iSurf][2, :, :]]
-                + 4 * v[self.X_map[iSurf][1, :, :]]
-                - 3 * v[self.X_map[iSurf][0, :, :]]
-            ) / 2.0
-            v_wrt[self.X_map[iSurf][-1, :, :]] = (
-                -(
-                    -1 * v[self.X_map[iSurf][-3, :, :]]
-                    + 4 * v[self.X_map[iSurf][-2, :, :]]
-                    - 3 * v[self.X_map[iSurf][-1, :, :]]
-                )
-                / 2.0
-            )
-        elif wrt == "v":
-            v_wrt[self.X_map[iSurf][:, 1:-1, :]] = (
-                v[self.X_map[iSurf][:, 2:, :]] - v[self.X_map[iSurf][:, 0:-2, :]]
-            ) / 2.0
-            v_wrt[self.X_map[iSurf][:, 0, :]] = (
-                -1 * v[self.X_map[iSurf][:, 2, :]]
-                + 4 * v[self.X_map[iSurf][:, 1, :]]
-                - 3 * v[self.X_map[iSurf][:, 0, :]]
-            ) / 2.0
-            v_wrt[self.X_map[iSurf][:, -1, :]] = (
-                -(
-                    -1 * v[self.X_map[iSurf][:, -3, :]]
-                    + 4 * v[self.X_map[iSurf][:, -2, :]]
-                    - 3 * v[self.X_map[iSurf][:, -1, :]]
-                )
-                / 2.0
-            )
-        return v_wrt
+        return DkSDX
+
+    def _evalCurvatureFields(self, iSurf):
+        """
+        Evaluate the nodal fields needed for the curvature: the
+        derivatives of the position vector, the normal vector, the
+        components of the first and second fundamental forms, the
+        Gaussian and mean curvature, and the discrete area of each node.
+        """
+        X = self.X[iSurf]
+        # Evaluate the first and second derivatives of the position vector
+        # of every point on the surface wrt to the parameteric coordinate u and v
+        t_u = self.Du[iSurf].dot(X).reshape((-1, 3))
+        t_v = self.Dv[iSurf].dot(X).reshape((-1, 3))
+        t_uu = self.Duu[iSurf].dot(X).reshape((-1, 3))
+        t_vv = self.Dvv[iSurf].dot(X).reshape((-1, 3))
+        t_uv = self.Duv[iSurf].dot(X).reshape((-1, 3))
+        # Compute the normal vector by taking the cross product of t_u and t_v
+        n = np.cross(t_u, t_v)
+        n_norm = np.sqrt(np.sum(n * n, axis=1))
+        n_hat = n / n_norm[:, None]
+        # Compute the components of the first fundamental form of a parameteric
+        # surface
+        E = np.sum(t_u * t_u, axis=1)
+        F = np.sum(t_v * t_u, axis=1)
+        G = np.sum(t_v * t_v, axis=1)
+        # Compute the components of the second fundamental form of a parameteric
+        # surface
+        L = np.sum(t_uu * n_hat, axis=1)
+        M = np.sum(t_uv * n_hat, axis=1)
+        N = np.sum(t_vv * n_hat, axis=1)
+        # Compute Gaussian and mean curvature (K and H)
+        K = (L * N - M * M) / (E * G - F * F)
+        H = (E * N - 2 * F * M + G * L) / (2 * (E * G - F * F))
+        # Compute discrete area associated with each node
+        dS = self.wt[iSurf] * n_norm
+
+        return {
+            "t_u": t_u,
+            "t_v": t_v,
+            "t_uu": t_uu,
+            "t_vv": t_vv,
+            "t_uv": t_uv,
+            "n": n,
+            "n_norm": n_norm,
+            "n_hat": n_hat,
+            "E": E,
+            "F": F,
+            "G": G,
+            "L": L,
+            "M": M,
+            "N": N,
+            "K": K,
+            "H": H,
+            "dS": dS,
+        }
 
     def evalDiffSens(self, iSurf, wrt):
         """
@@ -878,15 +661,6 @@ class CurvatureConstraint(GeometricConstraint):
 
         return Dv_uDX
 
-    def diags(self, a):
-        """
-        A standard vectorized sparse diagonal matrix function. Similar to the above function
-        some versions of scipy don't have this function, so this is here to prevent
-        potential import problems.
-        """
-        ii = range(len(a))
-        return csr_matrix((a, [ii, ii]), (len(a), len(a)))
-
     def writeTecplot(self, handle):
         """
         Write Curvature data on the surface to a tecplot file. Data includes
@@ -1,8 +1,19 @@
+# Standard Python modules
+import warnings
+
 # External modules
 import numpy as np
 
 # Local modules
-from ..geo_utils.polygon import volumeHex, volumeHex_b, volumeTriangulatedMesh, volumeTriangulatedMesh_b
+from ..geo_utils.polygon import (
+    getTriangleVertices,
+    isClosedTriangulatedMesh,
+    scatterTriangleSens,
+    volumeHex,
+    volumeHex_b,
+    volumeTriangulatedMesh,
+    volumeTriangulatedMesh_b,
+)
 from .baseConstraint import GeometricConstraint
 
 
@@ -145,13 +156,23 @@ class VolumeConstraint(GeometricConstraint):
 class TriangulatedVolumeConstraint(GeometricConstraint):
     """
     This class is used to compute a volume constraint based on triangulated surface mesh geometry
+
+    The volume is the sum of the signed volumes of the tetrahedra formed by
+    each triangle and a reference point. For a closed surface, the volume does
+    not depend on this point, so the centroid of the original surface is used.
+    This keeps the products of coordinates small and avoids the loss of
+    precision of the origin-based formula for geometries far from the origin,
+    like full aircraft in airport coordinates. Open surfaces, for example half
+    models cut at a symmetry plane through the origin, keep the origin as the
+    reference point.
     """
 
-    def __init__(self, name, surface, surface_name, lower, upper, scaled, scale, DVGeo, addToPyOpt):
+    def __init__(self, name, surface, surface_name, surface_conn, lower, upper, scaled, scale, DVGeo, addToPyOpt):
         super().__init__(name, 1, lower, upper, scale, DVGeo, addToPyOpt)
 
         self.surface = surface
         self.surface_name = surface_name
+        self.surface_conn = surface_conn
         self.surf_size = surface[0].shape[0]
         self.surf_p0 = surface[0].reshape(self.surf_size, 3)
         self.surf_p1 = surface[1].reshape(self.surf_size, 3)
@@ -159,6 +180,18 @@ class TriangulatedVolumeConstraint(GeometricConstraint):
         self.scaled = scaled
         self.vol_0 = None
 
+        # reference point of the tetrahedra
+        self.closed = surface_conn is not None and isClosedTriangulatedMesh(surface_conn)
+        if self.closed:
+            self.center = np.mean(np.vstack((self.surf_p0, self.surf_p1, self.surf_p2)).real, axis=0)
+        else:
+            self.center = np.zeros(3)
+            warnings.warn(
+                f"The surface {surface_name} of the triangulated volume constraint {name} is not closed. "
+                "The volume is only correct if the missing faces lie on planes through the origin.",
+                stacklevel=2,
+            )
+
     def evalFunctions(self, funcs, config):
         """
         Evaluate the function this object has and place in the funcs dictionary
@@ -175,12 +208,14 @@ class TriangulatedVolumeConstraint(GeometricConstraint):
         # get the CFD triangulated mesh updates. need addToDVGeo = True when
         # running setSurface()
 
-        # check if the first mesh has a DVGeo, and if it does, update the points
-        self.surf_p0 = self.DVGeo.update(self.surface_name + "_p0", config=config).reshape(self.surf_size, 3)
-        self.surf_p1 = self.DVGeo.update(self.surface_name + "_p1", config=config).reshape(self.surf_size, 3)
-        self.surf_p2 = self.DVGeo.update(self.surface_name + "_p2", config=config).reshape(self.surf_size, 3)
+        # update the unique vertices and gather the vertices of the triangles
+        pts = self.DVGeo.update(self.surface_name + "_pts", config=config)
+        self.surf_npts = len(pts)
+        self.surf_p0, self.surf_p1, self.surf_p2 = getTriangleVertices(pts, self.surface_conn)
 
-        volume = volumeTriangulatedMesh(self.surf_p0, self.surf_p1, self.surf_p2)
+        volume = volumeTriangulatedMesh(
+            self.surf_p0 - self.center, self.surf_p1 - self.center, self.surf_p2 - self.center
+        )
         if self.vol_0 is None:
             self.vol_0 = volume
 
@@ -206,23 +241,17 @@ class TriangulatedVolumeConstraint(GeometricConstraint):
             which will apply to *ALL* the local DV groups or a single string specifying
             a particular configuration.
         """
-        tmpTotal = {}
-
         # assume evalFunctions was called just prior and grad was stashed on rank=0
-        grad_vol = volumeTriangulatedMesh_b(self.surf_p0, self.surf_p1, self.surf_p2)
-        if self.scaled:
-            tmp_p0 = self.DVGeo.totalSensitivity(grad_vol[0] / self.vol_0, self.surface_name + "_p0", config=config)
-            tmp_p1 = self.DVGeo.totalSensitivity(grad_vol[1] / self.vol_0, self.surface_name + "_p1", config=config)
-            tmp_p2 = self.DVGeo.totalSensitivity(grad_vol[2] / self.vol_0, self.surface_name + "_p2", config=config)
-        else:
-            tmp_p0 = self.DVGeo.totalSensitivity(grad_vol[0], self.surface_name + "_p0", config=config)
-            tmp_p1 = self.DVGeo.totalSensitivity(grad_vol[1], self.surface_name + "_p1", config=config)
-            tmp_p2 = self.DVGeo.totalSensitivity(grad_vol[2], self.surface_name + "_p2", config=config)
+        grad_vol = volumeTriangulatedMesh_b(
+            self.surf_p0 - self.center, self.surf_p1 - self.center, self.surf_p2 - self.center
+        )
 
-        for key in tmp_p0:
-            tmpTotal[key] = tmp_p0[key] + tmp_p1[key] + tmp_p2[key]
+        # accumulate the gradient on the unique vertices
+        grad_pts = scatterTriangleSens(*grad_vol, self.surface_conn, self.surf_npts)
+        if self.scaled:
+            grad_pts /= self.vol_0
 
-        funcsSens[self.name] = tmpTotal
+        funcsSens[self.name] = self.DVGeo.totalSensitivity(grad_pts, self.surface_name + "_pts", config=config)
 
     def writeTecplot(self, handle):
         raise NotImplementedError()
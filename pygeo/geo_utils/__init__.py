@@ -5,6 +5,7 @@
 
 # This __init__ file imports every methods in pygeo/geo_utils
 from .bilinear_map import *  # noqa: F401, F403
+from .bvh import *  # noqa: F401, F403
 from .dcel import *  # noqa: F401, F403
 from .file_io import *  # noqa: F401, F403
 from .ffd_generation import *  # noqa: F401, F403
@@ -20,6 +21,7 @@ from .projection import *  # noqa: F401, F403
 from .remove_duplicates import *  # noqa: F401, F403
 from .rotation import *  # noqa: F401, F403
 from .split_quad import *  # noqa: F401, F403
+from .vtk_io import *  # noqa: F401, F403
 
 
 # Set a (MUCH) larger recursion limit. For meshes with extremely large
@@ -0,0 +1,392 @@
+# External modules
+import numpy as np
+from scipy.spatial import cKDTree
+
+# --------------------------------------------------------------
+#            Bounding volume hierarchy of triangles
+# --------------------------------------------------------------
+
+
+class TriangleBVH:
+    """
+    Bounding volume hierarchy (BVH) of a triangulated surface for fast
+    batch ray casting and closest point queries.
+
+    The triangles are sorted along a Morton curve of their centroids
+    and grouped into leaves of ``leafSize`` consecutive triangles. The
+    bounding boxes of the leaves are then merged pairwise up to a single
+    root box. All the queries of a batch go down the tree together, one
+    level at a time, so every step of the search is a vectorized
+    operation over all the (query, box) pairs that are still active and
+    only the triangles of the leaves that are hit are tested exactly.
+
+    The rays are infinite lines like in :func:`projectNode`, so the
+    intersections on both sides of the origin of a ray are found.
+
+    Parameters
+    ----------
+    p0, p1, p2 : arrays of size (nTri, 3)
+        Coordinates of the vertices of the triangles
+    leafSize : int
+        Maximum number of triangles in a leaf of the tree
+    """
+
+    def __init__(self, p0, p1, p2, leafSize=8):
+        p0 = np.asarray(p0).real.reshape((-1, 3))
+        p1 = np.asarray(p1).real.reshape((-1, 3))
+        p2 = np.asarray(p2).real.reshape((-1, 3))
+        self.nTri = len(p0)
+        self.leafSize = leafSize
+        self.levels = []
+
+        if self.nTri == 0:
+            self.order = np.zeros(0, dtype=int)
+            self.p0 = self.v1 = self.v2 = np.zeros((0, 3))
+            return
+
+        # Sort the triangles so that consecutive triangles are close to each other
+        lo = np.minimum(np.minimum(p0, p1), p2)
+        hi = np.maximum(np.maximum(p0, p1), p2)
+        self.order = np.argsort(_mortonCodes((p0 + p1 + p2) / 3.0), kind="stable")
+        self.p0 = p0[self.order]
+        self.v1 = (p1 - p0)[self.order]
+        self.v2 = (p2 - p0)[self.order]
+
+        # Pad the boxes slightly so that the intersections on the edges of the triangles are not missed
+        tol = 1e-10 * max(np.linalg.norm(np.max(hi, axis=0) - np.min(lo, axis=0)), 1.0)
+        starts = np.arange(0, self.nTri, leafSize)
+        level = (
+            np.minimum.reduceat(lo[self.order], starts, axis=0) - tol,
+            np.maximum.reduceat(hi[self.order], starts, axis=0) + tol,
+        )
+        self.levels.append(level)
+
+        # Merge the boxes pairwise up to the root
+        while len(level[0]) > 1:
+            pairs = np.arange(0, len(level[0]), 2)
+            level = (np.minimum.reduceat(level[0], pairs, axis=0), np.maximum.reduceat(level[1], pairs, axis=0))
+            self.levels.insert(0, level)
+
+    def intersectRays(self, pts, vecs):
+        """
+        Find all the intersections of a batch of rays with the triangles.
+
+        Parameters
+        ----------
+        pts : array of size (nRay, 3)
+            The origins of the rays
+        vecs : array of size (nRay, 3) or (3,)
+            The directions of the rays
+
+        Returns
+        -------
+        ray : array of size (nHit,)
+            The index of the ray of each intersection
+        tri : array of size (nHit,)
+            The index of the triangle of each intersection
+        sol : array of size (nHit, 6)
+            The parameter s along the ray, the parametric coordinates u
+            and v in the triangle and the coordinates of each
+            intersection. The intersections are sorted by ray and by s.
+        """
+        pts, vecs = _getRays(pts, vecs)
+
+        def lineBoxTest(query, lo, hi):
+            origin = pts[query]
+            vec = vecs[query]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t1 = (lo - origin) / vec
+                t2 = (hi - origin) / vec
+            parallel = vec == 0.0
+            inside = (origin >= lo) & (origin <= hi)
+            tMin = np.where(parallel, np.where(inside, -np.inf, np.inf), np.minimum(t1, t2))
+            tMax = np.where(parallel, np.where(inside, np.inf, -np.inf), np.maximum(t1, t2))
+            return np.max(tMin, axis=1) <= np.min(tMax, axis=1)
+
+        ray, iTri = self._getCandidates(len(pts), lineBoxTest)
+
+        # Moller-Trumbore intersection of the lines with the candidate triangles
+        origin = pts[ray]
+        vec = vecs[ray]
+        v1 = self.v1[iTri]
+        v2 = self.v2[iTri]
+        pVec = np.cross(vec, v2)
+        det = np.einsum("ij,ij->i", v1, pVec)
+        valid = det != 0.0
+        det[~valid] = 1.0
+        tVec = origin - self.p0[iTri]
+        qVec = np.cross(tVec, v1)
+        u = np.einsum("ij,ij->i", tVec, pVec) / det
+        v = np.einsum("ij,ij->i", vec, qVec) / det
+        s = np.einsum("ij,ij->i", v2, qVec) / det
+        hit = valid & (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0)
+
+        ray, iTri, s, u, v = ray[hit], iTri[hit], s[hit], u[hit], v[hit]
+        sol = np.column_stack((s, u, v, pts[ray] + s[:, None] * vecs[ray]))
+        order = np.lexsort((s, ray))
+
+        return ray[order], self.order[iTri[order]], sol[order]
+
+    def projectRays(self, pts, vecs):
+        """
+        Project a batch of points onto the surface along the given
+        directions and return the two intersections of each point. This
+        is the batch version of :func:`projectNode`.
+
+        Parameters
+        ----------
+        pts : array of size (nRay, 3)
+            The points to project
+        vecs : array of size (nRay, 3) or (3,)
+            The search directions
+
+        Returns
+        -------
+        up : array of size (nRay, 3)
+            The intersection furthest in the search direction. If there
+            are more than two intersections, the one closest to the point.
+        down : array of size (nRay, 3)
+            The other intersection
+        fail : array of size (nRay,)
+            0 if there are exactly two intersections, 1 if there is only
+            one, 2 if there are none and -1 if there are more than two,
+            like the flag returned by :func:`projectNode`. The rows of up
+            and down are zero where they are not defined.
+        """
+        nRay = len(np.atleast_2d(pts))
+        ray, _, sol = self.intersectRays(pts, vecs)
+
+        # Remove the identical intersections, for example on the edges shared by two triangles
+        if len(ray) > 1:
+            dist = np.linalg.norm(sol[1:, 3:] - sol[:-1, 3:], axis=1)
+            unique = np.ones(len(ray), dtype=bool)
+            unique[1:] = (ray[1:] != ray[:-1]) | (dist >= 1e-12)
+            ray, sol = ray[unique], sol[unique]
+
+        nSol = np.bincount(ray, minlength=nRay)
+        first = np.cumsum(nSol) - nSol
+        up = np.zeros((nRay, 3))
+        down = np.zeros((nRay, 3))
+        fail = np.full(nRay, 2, dtype="intc")
+
+        # A single intersection
+        sel = np.flatnonzero(nSol == 1)
+        fail[sel] = 1
+        up[sel] = sol[first[sel], 3:]
+
+        # Two intersections, which are already sorted in the search direction
+        sel = np.flatnonzero(nSol == 2)
+        fail[sel] = 0
+        up[sel] = sol[first[sel] + 1, 3:]
+        down[sel] = sol[first[sel], 3:]
+
+        # More than two intersections, keep the two closest to the point
+        sel = np.flatnonzero(nSol > 2)
+        if len(sel) > 0:
+            fail[sel] = -1
+            many = np.flatnonzero(nSol[ray] > 2)
+            many = many[np.lexsort((np.abs(sol[many, 0]), ray[many]))]
+            start = np.cumsum(nSol[sel]) - nSol[sel]
+            up[sel] = sol[many[start], 3:]
+            down[sel] = sol[many[start + 1], 3:]
+
+        return up, down, fail
+
+    def projectRaysPosOnly(self, pts, vecs):
+        """
+        Project a batch of points onto the surface and return the
+        closest intersection in the positive search direction. This is
+        the batch version of :func:`projectNodePosOnly`.
+
+        Parameters
+        ----------
+        pts : array of size (nRay, 3)
+            The points to project
+        vecs : array of size (nRay, 3) or (3,)
+            The search directions
+
+        Returns
+        -------
+        proj : array of size (nRay, 3)
+            The projected points. The rows are zero where no
+            intersection was found.
+        fail : array of size (nRay,)
+            1 where no intersection was found in the positive
+            direction, 0 otherwise
+        """
+        nRay = len(np.atleast_2d(pts))
+        ray, _, sol = self.intersectRays(pts, vecs)
+
+        # The intersections are sorted by s, so the first positive one of each ray is the closest
+        positive = sol[:, 0] >= 0.0
+        ray, sol = ray[positive], sol[positive]
+        first = np.ones(len(ray), dtype=bool)
+        first[1:] = ray[1:] != ray[:-1]
+
+        proj = np.zeros((nRay, 3))
+        fail = np.ones(nRay, dtype="intc")
+        proj[ray[first]] = sol[first, 3:]
+        fail[ray[first]] = 0
+
+        return proj, fail
+
+    def closestPoints(self, pts):
+        """
+        Find the closest point of the surface to each point of a batch.
+
+        Parameters
+        ----------
+        pts : array of size (nPts, 3)
+            The query points
+
+        Returns
+        -------
+        closest : array of size (nPts, 3)
+            The closest points on the surface
+        tri : array of size (nPts,)
+            The index of the triangle of each closest point
+        dist : array of size (nPts,)
+            The distance from each point to the surface
+        """
+        pts = np.atleast_2d(np.asarray(pts).real)
+        nPts = len(pts)
+        if self.nTri == 0:
+            return np.zeros((nPts, 3)), np.full(nPts, -1), np.full(nPts, np.inf)
+
+        # The distance to the triangles of the leaf with the closest center gives a first upper bound
+        lo, hi = self.levels[-1]
+        _, nearest = cKDTree(0.5 * (lo + hi)).query(pts)
+        starts = nearest * self.leafSize
+        counts = np.minimum(self.leafSize, self.nTri - starts)
+        query, iTri = _expand(np.arange(nPts), starts, counts)
+        dist = _closestPointOnTriangle(pts[query], *self._getVertices(iTri)) - pts[query]
+        upper = np.full(nPts, np.inf)
+        np.minimum.at(upper, query, np.einsum("ij,ij->i", dist, dist))
+
+        # The farthest corner of a box is also an upper bound of the distance to the triangles in it, so the
+        # bound of each point is tightened at every level of the tree and the boxes beyond it are discarded
+
+        def boxDistTest(query, lo, hi):
+            delta = np.maximum(np.maximum(lo - pts[query], 0.0), pts[query] - hi)
+            far = np.maximum(np.abs(lo - pts[query]), np.abs(hi - pts[query]))
+            np.minimum.at(upper, query, np.einsum("ij,ij->i", far, far))
+            return np.einsum("ij,ij->i", delta, delta) <= upper[query]
+
+        query, iTri = self._getCandidates(nPts, boxDistTest)
+        closest = _closestPointOnTriangle(pts[query], *self._getVertices(iTri))
+        dist = np.linalg.norm(closest - pts[query], axis=1)
+
+        # Keep the closest candidate of each point
+        order = np.lexsort((dist, query))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = query[order][1:] != query[order][:-1]
+        best = order[first]
+
+        return closest[best], self.order[iTri[best]], dist[best]
+
+    def _getVertices(self, iTri):
+        """Get the vertices of the sorted triangles"""
+        p0 = self.p0[iTri]
+        return p0, p0 + self.v1[iTri], p0 + self.v2[iTri]
+
+    def _getCandidates(self, nQuery, boxTest):
+        """
+        Go down the tree with all the queries at once and return the
+        (query, sorted triangle) pairs of the leaves whose boxes pass
+        boxTest at every level.
+        """
+        if self.nTri == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+        query = np.arange(nQuery)
+        node = np.zeros(nQuery, dtype=int)
+        for iLevel, (lo, hi) in enumerate(self.levels):
+            keep = boxTest(query, lo[node], hi[node])
+            query, node = query[keep], node[keep]
+
+            # Go down to the children of the boxes that were hit
+            if iLevel < len(self.levels) - 1:
+                nChild = len(self.levels[iLevel + 1][0])
+                query = np.repeat(query, 2)
+                node = (2 * node[:, None] + np.arange(2)).ravel()
+                exists = node < nChild
+                query, node = query[exists], node[exists]
+
+        # Expand the leaves to their triangles
+        starts = node * self.leafSize
+        counts = np.minimum(self.leafSize, self.nTri - starts)
+        return _expand(query, starts, counts)
+
+
+def _getRays(pts, vecs):
+    """Get the origins and directions of a batch of rays as real arrays of the same size"""
+    pts = np.atleast_2d(np.asarray(pts).real).astype(float)
+    vecs = np.broadcast_to(np.asarray(vecs).real, pts.shape).astype(float)
+    return pts, vecs
+
+
+def _expand(query, starts, counts):
+    """Expand (query, range of items) pairs into (query, item) pairs"""
+    total = np.sum(counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(query, counts), np.repeat(starts, counts) + offsets
+
+
+def _mortonCodes(pts):
+    """Compute the 3D Morton codes of a set of points, with 21 bits per direction"""
+    lo = np.min(pts, axis=0)
+    extent = np.max(np.max(pts, axis=0) - lo)
+    if extent == 0.0:
+        extent = 1.0
+    cells = np.clip(((pts - lo) / extent * (2**21 - 1)).astype(np.uint64), 0, 2**21 - 1)
+
+    codes = np.zeros(len(pts), dtype=np.uint64)
+    for i in range(3):
+        x = cells[:, i]
+        x = (x | (x << np.uint64(32))) & np.uint64(0x1F00000000FFFF)
+        x = (x | (x << np.uint64(16))) & np.uint64(0x1F0000FF0000FF)
+        x = (x | (x << np.uint64(8))) & np.uint64(0x100F00F00F00F00F)
+        x = (x | (x << np.uint64(4))) & np.uint64(0x10C30C30C30C30C3)
+        x = (x | (x << np.uint64(2))) & np.uint64(0x1249249249249249)
+        codes |= x << np.uint64(i)
+    return codes
+
+
+def _closestPointOnTriangle(p, a, b, c):
+    """
+    Vectorized closest point on triangles (a, b, c) to the points p,
+    following the Voronoi region tests of Ericson, Real-Time Collision
+    Detection, section 5.1.5.
+    """
+
+    def dot(x, y):
+        return np.einsum("ij,ij->i", x, y)[:, None]
+
+    ab = b - a
+    ac = c - a
+    ap = p - a
+    bp = p - b
+    cp = p - c
+    d1, d2 = dot(ab, ap), dot(ac, ap)
+    d3, d4 = dot(ab, bp), dot(ac, bp)
+    d5, d6 = dot(ab, cp), dot(ac, cp)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Start from the interior of the face and let the regions checked first by Ericson take precedence
+        denom = va + vb + vc
+        closest = a + ab * (vb / denom) + ac * (vc / denom)
+        regions = [
+            ((va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0), b + (c - b) * ((d4 - d3) / ((d4 - d3) + (d5 - d6)))),
+            ((vb <= 0) & (d2 >= 0) & (d6 <= 0), a + ac * (d2 / (d2 - d6))),
+            ((d6 >= 0) & (d5 <= d6), c),
+            ((vc <= 0) & (d1 >= 0) & (d3 <= 0), a + ab * (d1 / (d1 - d3))),
+            ((d3 >= 0) & (d4 <= d3), b),
+            ((d1 <= 0) & (d2 <= 0), a),
+        ]
+        for inRegion, point in regions:
+            closest = np.where(inRegion, point, closest)
+
+    return closest
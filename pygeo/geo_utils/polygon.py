@@ -304,3 +304,80 @@ def volumeTriangulatedMesh_b(p0, p1, p2):
     grad_2[:, 2] = p0[:, 0] * p1[:, 1] - p0[:, 1] * p1[:, 0]
 
     return grad_0 / 6.0, grad_1 / 6.0, grad_2 / 6.0
+
+
+def getTriangleVertices(pts, conn):
+    """
+    Get the vertices of the triangles of an indexed triangulated mesh.
+
+    Parameters
+    ----------
+    pts : array of size (nPts, 3)
+        Coordinates of the unique vertices of the mesh
+    conn : array of size (nTri, 3)
+        Indices of the three vertices of each triangle
+
+    Returns
+    -------
+    p0, p1, p2 : arrays of size (nTri, 3)
+        Coordinates of the vertices of each triangle
+    """
+    pts = pts.reshape((-1, 3))
+    return pts[conn[:, 0]], pts[conn[:, 1]], pts[conn[:, 2]]
+
+
+def scatterTriangleSens(dp0, dp1, dp2, conn, nPts):
+    """
+    Accumulate the sensitivities with respect to the vertices of each
+    triangle onto the unique vertices of an indexed triangulated mesh.
+    This is the transpose of :func:`getTriangleVertices`.
+
+    Parameters
+    ----------
+    dp0, dp1, dp2 : arrays of size (..., nTri, 3)
+        Sensitivities with respect to the vertices of each triangle
+    conn : array of size (nTri, 3)
+        Indices of the three vertices of each triangle
+    nPts : int
+        Number of unique vertices of the mesh
+
+    Returns
+    -------
+    dpts : array of size (..., nPts, 3)
+        Sensitivities with respect to the unique vertices
+    """
+    dpts = np.zeros(dp0.shape[:-2] + (nPts, 3), dtype=dp0.dtype)
+    for i, dp in enumerate((dp0, dp1, dp2)):
+        np.add.at(np.moveaxis(dpts, -2, 0), conn[:, i], np.moveaxis(dp, -2, 0))
+    return dpts
+
+
+def isClosedTriangulatedMesh(conn):
+    """
+    Check if an indexed triangulated mesh is closed and consistently
+    oriented, i.e. if every edge is shared by exactly two triangles that
+    go through it in opposite directions.
+
+    Parameters
+    ----------
+    conn : array of size (nTri, 3)
+        Indices of the three vertices of each triangle
+
+    Returns
+    -------
+    closed : bool
+        True if the mesh is closed
+    """
+    conn = np.asarray(conn, dtype=np.int64)
+    if len(conn) == 0:
+        return False
+
+    # Encode the directed edges of all the triangles as integers
+    start = conn.ravel()
+    end = np.roll(conn, -1, axis=1).ravel()
+    nPts = np.max(conn) + 1
+    edges = np.sort(start * nPts + end)
+    reverse = np.sort(end * nPts + start)
+
+    # Every directed edge must be unique and have its reverse in the mesh
+    return bool(np.all(edges[1:] != edges[:-1]) and np.array_equal(edges, reverse))
@@ -1,5 +1,8 @@
 # External modules
 import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
 
 # Local modules
 from .norm import eDist
@@ -216,3 +219,34 @@ def pointReduceBruteForce(points, nodeTol=1e-4):
             link.append(j + 1)
 
     return np.array(uniquePoints), np.array(link)
+
+
+def pointReduceKDTree(points, nodeTol=1e-4):
+    """Given a list of N points in ndim space, with possible
+    duplicates, return a list of the unique points AND a pointer list
+    for the original points to the reduced set.
+
+    This is a vectorized version of :func:`pointReduce` for large
+    point clouds. All the pairs of points closer than nodeTol are found
+    with a KD-tree and the points are merged by finding the connected
+    components of the resulting graph. The unique points keep the
+    order of their first occurrence in the original list.
+    """
+    points = np.array(points)
+    N = len(points)
+    if N == 0:
+        return points, None
+
+    tree = cKDTree(points.real)
+    pairs = tree.query_pairs(nodeTol, output_type="ndarray")
+    graph = sparse.coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(N, N))
+    _, labels = connected_components(graph, directed=False)
+
+    # Number the unique points by their first occurrence
+    first = np.full(labels.max() + 1, N)
+    np.minimum.at(first, labels, np.arange(N))
+    order = np.argsort(first)
+    link = np.empty_like(order)
+    link[order] = np.arange(len(order))
+
+    return points[first[order]], link[labels].astype("intc")
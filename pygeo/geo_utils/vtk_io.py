@@ -0,0 +1,211 @@
+# Standard Python modules
+import os
+import xml.etree.ElementTree as ET
+
+# External modules
+import numpy as np
+
+# --------------------------------------------------------------
+#                Binary VTK Output Functions
+# --------------------------------------------------------------
+
+# VTK cell types indexed by the number of nodes per cell
+VTK_CELL_TYPES = {1: 1, 2: 3, 4: 9, 8: 12}
+
+VTK_DATA_TYPES = {
+    np.dtype("<f8"): "Float64",
+    np.dtype("<i8"): "Int64",
+    np.dtype("<i4"): "Int32",
+    np.dtype("u1"): "UInt8",
+}
+
+
+def getStructuredConnectivity(shape):
+    """Compute the cell connectivity of a structured block of nodes.
+
+    Dimensions with a single node are collapsed, so a structured block
+    gives line segments, quadrilaterals or hexahedra depending on the
+    number of non-trivial dimensions.
+
+    Parameters
+    ----------
+    shape : tuple
+        The number of nodes in each structured direction, for example
+        (ni,), (ni, nj) or (ni, nj, nk)
+
+    Returns
+    -------
+    conn : array of size (nCell, nNodesPerCell)
+        The zero-based node indices of each cell, where the nodes are
+        numbered in C order of the structured block
+    """
+    shape = tuple(shape)
+    nodes = np.arange(int(np.prod(shape))).reshape([n for n in shape if n > 1] or [1])
+
+    if nodes.ndim == 1:
+        if len(nodes) == 1:
+            return np.zeros((1, 1), "intc")
+        return np.column_stack([nodes[:-1], nodes[1:]])
+    elif nodes.ndim == 2:
+        return np.column_stack(
+            [nodes[:-1, :-1].ravel(), nodes[1:, :-1].ravel(), nodes[1:, 1:].ravel(), nodes[:-1, 1:].ravel()]
+        )
+    else:
+        ni, nj, nk = nodes.shape
+        cols = []
+        for dk in [0, 1]:
+            for di, dj in [(0, 0), (1, 0), (1, 1), (0, 1)]:
+                cols.append(nodes[di : ni - 1 + di, dj : nj - 1 + dj, dk : nk - 1 + dk].ravel())
+        return np.column_stack(cols)
+
+
+def writeVTK(fileName, zones, solutionTime=None):
+    """Write a set of zones to a binary VTK XML unstructured grid file.
+
+    All the data is written as raw appended binary data, so the cost
+    of writing is dominated by the size of the arrays rather than by
+    formatting. The zones are merged into a single grid and the cells
+    of each zone are tagged with a ``zone`` cell variable.
+
+    If a solution time is given, the file is treated as a time series:
+    the data is written to ``<root>_<nnnn>.vtu`` and the step is added
+    to the ``<root>.pvd`` collection file, which can be opened as a
+    single file in ParaView or VisIt. A step with the same solution
+    time as an existing step replaces it.
+
+    Parameters
+    ----------
+    fileName : str
+        Filename of the VTK file. Should have a .vtu extension.
+    zones : list
+        List of the zones to write. Each zone is either a coordinate
+        array, or a tuple ``(coords, conn)``. The coordinate array can
+        be of size (N, 3) for curves, (ni, nj, 3) for surfaces or
+        (ni, nj, nk, 3) for volumes. The optional ``conn`` array of
+        size (nCell, nNodesPerCell) gives the cells explicitly, with 1
+        (points), 2 (line segments), 4 (quadrilaterals) or 8
+        (hexahedra) nodes per cell.
+    solutionTime : float
+        Solution time of the data. If given, the file is appended to a
+        time series.
+
+    Returns
+    -------
+    fileName : str
+        The name of the data file that was actually written
+    """
+    if solutionTime is not None:
+        fileName = _addToCollection(fileName, solutionTime)
+
+    arrays = []
+    offset = 0
+
+    def dataArray(name, data, nComp=1):
+        nonlocal offset
+        data = np.ascontiguousarray(data)
+        arrays.append(data)
+        tag = '<DataArray type="%s" Name="%s" NumberOfComponents="%d" ' % (VTK_DATA_TYPES[data.dtype], name, nComp)
+        tag += 'NumberOfTuples="%d" format="appended" offset="%d"/>' % (data.size // nComp, offset)
+        offset += 8 + data.nbytes
+        return tag
+
+    lines = [
+        '<?xml version="1.0"?>',
+        '<VTKFile type="UnstructuredGrid" version="1.0" byte_order="LittleEndian" header_type="UInt64">',
+        "<UnstructuredGrid>",
+    ]
+    if solutionTime is not None:
+        lines += [
+            "<FieldData>",
+            dataArray("TimeValue", np.array([solutionTime], "<f8")),
+            "</FieldData>",
+        ]
+
+    # All the zones are merged into a single piece
+    allCoords = []
+    allConn = []
+    allOffsets = []
+    allTypes = []
+    allZones = []
+    nPts = 0
+    nNodes = 0
+    for iZone, zone in enumerate(zones):
+        if isinstance(zone, tuple):
+            coords, conn = zone
+        else:
+            coords, conn = zone, None
+
+        coords = np.asarray(coords)
+        if conn is None:
+            conn = getStructuredConnectivity(coords.shape[:-1])
+        conn = np.asarray(conn).reshape((len(conn), -1))
+        coords = coords.real.reshape((-1, 3))
+        nCell, nNodesPerCell = conn.shape
+
+        allCoords.append(coords)
+        allConn.append(conn.ravel() + nPts)
+        allOffsets.append(nNodes + np.arange(1, nCell + 1) * nNodesPerCell)
+        allTypes.append(np.full(nCell, VTK_CELL_TYPES[nNodesPerCell]))
+        allZones.append(np.full(nCell, iZone))
+        nPts += len(coords)
+        nNodes += conn.size
+
+    lines += [
+        '<Piece NumberOfPoints="%d" NumberOfCells="%d">' % (nPts, sum(len(zone) for zone in allZones)),
+        "<Points>",
+        dataArray("Points", np.vstack(allCoords).astype("<f8"), 3),
+        "</Points>",
+        "<Cells>",
+        dataArray("connectivity", np.hstack(allConn).astype("<i8")),
+        dataArray("offsets", np.hstack(allOffsets).astype("<i8")),
+        dataArray("types", np.hstack(allTypes).astype("u1")),
+        "</Cells>",
+        '<CellData Scalars="zone">',
+        dataArray("zone", np.hstack(allZones).astype("<i4")),
+        "</CellData>",
+        "</Piece>",
+    ]
+
+    lines += ["</UnstructuredGrid>", '<AppendedData encoding="raw">']
+
+    with open(fileName, "wb") as f:
+        f.write(("\n".join(lines) + "\n_").encode())
+        for data in arrays:
+            f.write(np.array([data.nbytes], "<u8").tobytes())
+            f.write(memoryview(data).cast("B"))
+        f.write(b"\n</AppendedData>\n</VTKFile>\n")
+
+    return fileName
+
+
+def _addToCollection(fileName, solutionTime):
+    """Add a time step to the .pvd collection file associated with
+    fileName and return the name of the data file for that step."""
+    root, _ = os.path.splitext(fileName)
+    collectionName = root + ".pvd"
+
+    if os.path.isfile(collectionName):
+        tree = ET.parse(collectionName)
+        collection = tree.getroot().find("Collection")
+    else:
+        vtkFile = ET.Element("VTKFile", type="Collection", version="1.0", byte_order="LittleEndian")
+        collection = ET.SubElement(vtkFile, "Collection")
+        tree = ET.ElementTree(vtkFile)
+
+    for dataSet in collection.findall("DataSet"):
+        if float(dataSet.get("timestep")) == solutionTime:
+            dataName = os.path.join(os.path.dirname(collectionName), dataSet.get("file"))
+            break
+    else:
+        dataName = "%s_%04d.vtu" % (root, len(collection.findall("DataSet")))
+        ET.SubElement(
+            collection,
+            "DataSet",
+            timestep=repr(float(solutionTime)),
+            part="0",
+            file=os.path.basename(dataName),
+        )
+
+    tree.write(collectionName, xml_declaration=True)
+
+    return dataName
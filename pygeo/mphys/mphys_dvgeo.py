@@ -3,6 +3,7 @@ from mpi4py import MPI
 import numpy as np
 import openmdao.api as om
 from openmdao.api import AnalysisError
+from scipy import sparse
 
 # Local modules
 from .. import DVConstraints, DVGeometry, DVGeometryESP, DVGeometryMulti, DVGeometryVSP
@@ -25,12 +26,23 @@ class OM_DVGEOCOMP(om.ExplicitComponent):
         >>> }
 
         The two setup methods cannot currently be used together.
+
+        By default, the derivatives are computed with matrix-vector products. If ``usePartials``
+        is True, the partials are declared and computed once per linearization instead.
         """
 
         self.options.declare("file", default=None)
         self.options.declare("type", default=None)
         self.options.declare("options", default=None)
         self.options.declare("DVGeoInfo", default=None)
+        self.options.declare(
+            "usePartials",
+            default=False,
+            types=bool,
+            desc="Provide the derivatives as partials computed from the cached jacobians instead of "
+            + "matrix-vector products. This is faster when many products are needed, e.g. with "
+            + "many linear solver iterations, but the jacobians of the point sets are stored as dense partials.",
+        )
 
     def setup(self):
         # create a constraints object to go with this DVGeo(s)
@@ -92,6 +104,39 @@ class OM_DVGEOCOMP(om.ExplicitComponent):
 
         self.omPtSetList = []
 
+        if self.options["usePartials"]:
+            # the derivatives are only provided through compute_partials
+            self.matrix_free = False
+
+    def setup_partials(self):
+        if not self.options["usePartials"]:
+            return
+
+        inputNames = set(self.get_io_metadata(iotypes="input").keys())
+        outputNames = self.get_io_metadata(iotypes="output").keys()
+
+        # design variables of each DVGeo that are inputs of this component
+        dvNames = {}
+        for name, DVGeo in self.DVGeos.items():
+            dvNames[name] = [dv for dv in DVGeo.getVarNames(pyOptSparse=True) if dv in inputNames]
+        allDVNames = [dv for dvs in dvNames.values() for dv in dvs]
+
+        for output in outputNames:
+            if self._isPointSetOutput(output, inputNames):
+                # point sets that are added in the first compute belong to the default DVGeo
+                wrt = [dv for name, DVGeo in self.DVGeos.items() if output in DVGeo.points for dv in dvNames[name]]
+                if not any(output in DVGeo.points for DVGeo in self.DVGeos.values()):
+                    wrt = allDVNames
+            else:
+                wrt = allDVNames
+
+            if len(wrt) > 0:
+                self.declare_partials(output, wrt)
+
+    def _isPointSetOutput(self, output, inputNames):
+        """Check if an output is a point set, including the ones that are only added in the first compute"""
+        return output in self.omPtSetList or (output.startswith("x_") and output[:-1] + "_in" in inputNames)
+
     def compute(self, inputs, outputs):
         # check for inputs that have been added but the points have not been added to dvgeo
         for var in inputs.keys():
@@ -994,23 +1039,98 @@ class OM_DVGEOCOMP(om.ExplicitComponent):
         # constraint needs a triangulated reference surface at initialization
         self.DVCon.setSurface(surface, name=name, addToDVGeo=addToDVGeo, DVGeoName=DVGeoName, surfFormat=surfFormat)
 
+    def compute_partials(self, inputs, partials):
+        if not self.options["usePartials"]:
+            return
+
+        self._updateConstraintSens()
+
+        # the derivatives of the constraints
+        for constraintname in self.constraintfuncsens:
+            for dvname in self.constraintfuncsens[constraintname]:
+                if (constraintname, dvname) in partials:
+                    partials[constraintname, dvname] = self.constraintfuncsens[constraintname][dvname]
+
+        # the derivatives of the point sets
+        for _, DVGeo in self.DVGeos.items():
+            for ptSetName in self._getPtSetNames(DVGeo):
+                if ptSetName in self.omPtSetList:
+                    jac = self._getPointSetJacobian(DVGeo, ptSetName)
+                    for dvname in jac:
+                        if (ptSetName, dvname) in partials:
+                            if sparse.issparse(jac[dvname]):
+                                partials[ptSetName, dvname] = jac[dvname].toarray()
+                            else:
+                                partials[ptSetName, dvname] = jac[dvname]
+
+    def _getPointSetJacobian(self, DVGeo, ptSetName):
+        """
+        Get the jacobian of a point set with respect to each design variable of a DVGeo.
+
+        For FFD-based DVGeos, this is taken from the sparse total jacobian. The
+        other parameterizations compute the columns with forward products.
+        """
+        if type(DVGeo) is DVGeometry and ptSetName not in DVGeo.coordXfer:
+            DVGeo.computeTotalJacobian(ptSetName)
+            if DVGeo.JT[ptSetName] is None:
+                return {}
+
+            jac = DVGeo.JT[ptSetName].T.tocsr()
+            if DVGeo.useComposite:
+                jac = DVGeo.mapSensToComp(jac)
+            return DVGeo.convertSensitivityToDict(jac, useCompositeNames=True)
+
+        jac = {}
+        values = DVGeo.getValues()
+        for dvname in DVGeo.getVarNames(pyOptSparse=True):
+            nVal = len(np.atleast_1d(values[dvname]))
+            columns = []
+            for i in range(nVal):
+                seed = np.zeros(nVal)
+                seed[i] = 1.0
+                columns.append(np.ravel(DVGeo.totalSensitivityProd({dvname: seed}, ptSetName)))
+            jac[dvname] = np.column_stack(columns)
+
+        return jac
+
+    def _getPtSetNames(self, DVGeo):
+        """Get the names of the point sets of a DVGeo"""
+        # Collet point sets from all DVGeos if DVGeometryMulti object
+        if isinstance(DVGeo, DVGeometryMulti):
+            ptSetNames = []
+            for comp in DVGeo.DVGeoDict.keys():
+                for ptSet in DVGeo.DVGeoDict[comp].ptSetNames:
+                    if ptSet not in ptSetNames:
+                        ptSetNames.append(ptSet)
+        else:
+            ptSetNames = DVGeo.ptSetNames
+
+        return ptSetNames
+
+    def _updateConstraintSens(self):
+        """Update the derivatives of the constraints if the design changed since the last update"""
+        # this flag will be set to True after every compute call.
+        # if it is true, we assume the design has changed so we re-run the sensitivity update
+        # there can be hundreds of calls to the jacvec product routine due to thickness constraints,
+        # as a result, we only run the actual sensitivity comp once and save the jacobians
+        if self.update_jac:
+            self.constraintfuncsens = dict()
+            self.DVCon.evalFunctionsSens(self.constraintfuncsens, includeLinear=True)
+            # set the flag to False so we dont run the update again if this is called w/o a compute in between
+            self.update_jac = False
+
     def compute_jacvec_product(self, inputs, d_inputs, d_outputs, mode):
+        # the derivatives are provided as partials instead
+        if self.options["usePartials"]:
+            return
+
         # only do the computations when we have more than zero entries in d_inputs
         # in the reverse mode or d_outputs in the forward mode
         doRev = mode == "rev" and len(list(d_inputs.keys())) > 0
         doFwd = mode == "fwd" and len(list(d_outputs.keys())) > 0
 
         if doFwd or doRev:
-            # this flag will be set to True after every compute call.
-            # if it is true, we assume the design has changed so we re-run the sensitivity update
-            # there can be hundreds of calls to this routine due to thickness constraints,
-            # as a result, we only run the actual sensitivity comp once and save the jacobians
-            # this might be better suited with the matrix-based API
-            if self.update_jac:
-                self.constraintfuncsens = dict()
-                self.DVCon.evalFunctionsSens(self.constraintfuncsens, includeLinear=True)
-                # set the flag to False so we dont run the update again if this is called w/o a compute in between
-                self.update_jac = False
+            self._updateConstraintSens()
 
             # Directly do Jacobian vector product with the derivatives from DVConstraints
             for constraintname in self.constraintfuncsens:
@@ -1026,53 +1146,64 @@ class OM_DVGEOCOMP(om.ExplicitComponent):
                             jvtmp = np.dot(np.transpose(dcdx), dout)
                             d_inputs[dvname] += jvtmp
 
+            # Process the seeds of all the point sets
+            ptSets = []
             for _, DVGeo in self.DVGeos.items():
                 dvs = DVGeo.getVarNames()
 
-                # Collet point sets from all DVGeos if DVGeometryMulti object
-                if isinstance(DVGeo, DVGeometryMulti):
-                    ptSetNames = []
-                    for comp in DVGeo.DVGeoDict.keys():
-                        for ptSet in DVGeo.DVGeoDict[comp].ptSetNames:
-                            if ptSet not in ptSetNames:
-                                ptSetNames.append(ptSet)
-                else:
-                    ptSetNames = DVGeo.ptSetNames
-
-                for ptSetName in ptSetNames:
+                for ptSetName in self._getPtSetNames(DVGeo):
                     if ptSetName in self.omPtSetList:
-                        # Process the seeds
                         if doFwd:
                             # Collect the d_inputs associated with the current DVGeo
                             seeds = {}
                             for k in d_inputs:
                                 if k in dvs:
                                     seeds[k] = d_inputs[k]
+                            zeroSeeds = all(np.all(seed == 0) for seed in seeds.values())
                         elif doRev:
                             seeds = d_outputs[ptSetName].reshape(len(d_outputs[ptSetName]) // 3, 3)
-
-                        # only do the calc. if seeds are not zero on ANY proc
-                        local_all_zeros = np.all(seeds == 0)
-                        global_all_zeros = np.zeros(1, dtype=bool)
-                        # we need to communicate for this check otherwise we may hang
-                        self.comm.Allreduce([local_all_zeros, MPI.BOOL], [global_all_zeros, MPI.BOOL], MPI.LAND)
-
-                        # Compute the Jacobian vector product
-                        if not global_all_zeros[0]:
-                            if doFwd:
-                                d_outputs[ptSetName] += DVGeo.totalSensitivityProd(seeds, ptSetName)
-                            elif doRev:
-                                # TODO totalSensitivityTransProd is broken. does not work with zero surface nodes on a proc
-                                # xdot = DVGeo.totalSensitivityTransProd(dout, ptSetName)
-                                xdot = DVGeo.totalSensitivity(seeds, ptSetName)
-
-                                # loop over dvs and accumulate
-                                xdotg = {}
-                                for k in xdot:
-                                    # check if this dv is present
-                                    if k in d_inputs:
-                                        # do the allreduce
-                                        xdotg[k] = self.comm.allreduce(xdot[k], op=MPI.SUM)
-
-                                        # accumulate in the dict
-                                        d_inputs[k] += xdotg[k][0]
+                            zeroSeeds = np.all(seeds == 0)
+
+                        ptSets.append((DVGeo, ptSetName, seeds, zeroSeeds))
+
+            # only do the calc. if seeds are not zero on ANY proc.
+            # The DV seeds are the same on all procs, but the point set seeds are distributed,
+            # so we need to communicate for this check otherwise we may hang
+            allZeros = np.array([zeroSeeds for _, _, _, zeroSeeds in ptSets], dtype=bool)
+            if doRev and len(ptSets) > 0:
+                localZeros = allZeros.copy()
+                self.comm.Allreduce([localZeros, MPI.BOOL], [allZeros, MPI.BOOL], MPI.LAND)
+
+            # local reverse derivatives accumulated over all point sets
+            xdotLocal = {}
+
+            # Compute the Jacobian vector products
+            for (DVGeo, ptSetName, seeds, _), zeroSeeds in zip(ptSets, allZeros):
+                if zeroSeeds:
+                    continue
+
+                if doFwd:
+                    d_outputs[ptSetName] += DVGeo.totalSensitivityProd(seeds, ptSetName)
+                elif doRev:
+                    # TODO totalSensitivityTransProd is broken. does not work with zero surface nodes on a proc
+                    # xdot = DVGeo.totalSensitivityTransProd(dout, ptSetName)
+                    xdot = DVGeo.totalSensitivity(seeds, ptSetName)
+
+                    # loop over dvs and accumulate if this dv is present
+                    for k in xdot:
+                        if k in d_inputs:
+                            if k in xdotLocal:
+                                xdotLocal[k] = xdotLocal[k] + xdot[k][0]
+                            else:
+                                xdotLocal[k] = np.array(xdot[k][0], dtype=float)
+
+            # sum the reverse derivatives of all the dvs with a single allreduce
+            if len(xdotLocal) > 0:
+                buffer = np.concatenate([np.ravel(xdotLocal[k]) for k in xdotLocal])
+                self.comm.Allreduce(MPI.IN_PLACE, buffer, op=MPI.SUM)
+
+                offset = 0
+                for k in xdotLocal:
+                    size = np.size(xdotLocal[k])
+                    d_inputs[k] += buffer[offset : offset + size].reshape(np.shape(xdotLocal[k]))
+                    offset += size
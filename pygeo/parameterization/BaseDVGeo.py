@@ -10,6 +10,10 @@ from abc import ABC, abstractmethod
 from collections import OrderedDict
 import copy
 
+# External modules
+import numpy as np
+from scipy import linalg
+
 
 class BaseDVGeometry(ABC):
     """
@@ -248,7 +252,7 @@ class BaseDVGeometry(ABC):
         ndarray
             The mapped DVs in a single 1D array
         """
-        inVec = inVec.reshape(self.getNDV(), -1)
+        inVec = inVec.reshape(self.DVComposite.u.shape[1], -1)
         outVec = self.DVComposite.u @ inVec
         return outVec.flatten()
 
@@ -286,3 +290,53 @@ class BaseDVGeometry(ABC):
         """
         outVec = inVec @ self.DVComposite.u  # this is the same as (self.DVComposite.u.T @ inVec.T).T
         return outVec
+
+    def _computeCompositeBasis(self, gram, nModes=None):
+        """
+        Compute the composite DV basis from the Gram matrix J^T J of the
+        point set Jacobian J. The eigenvectors of the Gram matrix are the
+        right singular vectors of J and the square roots of its
+        eigenvalues are the singular values, so only a matrix of size
+        (nDV, nDV) is decomposed regardless of the number of points.
+
+        Forming the Gram matrix squares the condition number of J. The
+        modes with singular values below about sqrt(eps) times the largest
+        one lose their accuracy, so the basis only matches the SVD of J
+        for well-conditioned modes. Use ``nModes`` to drop the poorly
+        conditioned ones.
+
+        Parameters
+        ----------
+        gram : ndarray, size (nDV, nDV)
+            The Gram matrix of the point set Jacobian, summed over all procs
+        nModes : int, optional
+            Number of modes to keep, starting from the one with the largest
+            singular value. By default all modes are kept.
+
+        Returns
+        -------
+        u : ndarray, size (nDV, nModes)
+            The composite DV basis
+        s : ndarray, size (nModes)
+            The singular values in descending order
+        scale : ndarray, size (nModes)
+            The scaling of the composite DVs
+        """
+        NDV = gram.shape[0]
+        if nModes is None or nModes > NDV:
+            nModes = NDV
+
+        # Only the largest nModes eigenpairs are computed
+        eigVals, u = linalg.eigh(gram, subset_by_index=[NDV - nModes, NDV - 1])
+        s = np.sqrt(np.maximum(eigVals[::-1], 0.0))
+        u = u[:, ::-1]
+
+        # Fix the sign of each mode so the basis does not depend on the eigensolver
+        iMax = np.argmax(np.abs(u), axis=0)
+        u = u * np.sign(u[iMax, np.arange(nModes)])
+
+        scale = np.sqrt(s)
+        # normalize the scaling
+        scale = scale * (nModes / np.sum(scale))
+
+        return u, s, scale
@@ -1,6 +1,8 @@
 # Standard Python modules
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import copy
+import multiprocessing
 import os
 import warnings
 
@@ -17,6 +19,62 @@ from scipy.spatial import cKDTree
 from .. import geo_utils, pyBlock, pyNetwork
 from .BaseDVGeo import BaseDVGeometry
 from .designVars import geoDVComposite, geoDVGlobal, geoDVLocal, geoDVSectionLocal, geoDVShapeFunc, geoDVSpanwiseLocal
+from .history import DVGeoHistory
+
+# State shared with the processes that compute the finite differences of checkDerivativesRandom
+_directionCheck = None
+
+
+def _finiteDifferenceDirection(i):
+    """Central finite difference of the points along the i-th direction of checkDerivativesRandom"""
+    DVGeo, ptSetName, x0, directions, h, config = _directionCheck
+    coords = []
+    for step in [h, -h]:
+        x = {key: value.copy() for key, value in x0.items()}
+        for key, d in directions[i].items():
+            x[key] = x[key] + step * d
+        DVGeo.setDesignVars(x)
+        coords.append(np.ravel(DVGeo.update(ptSetName, config=config)))
+
+    return (coords[0] - coords[1]) / (2 * h)
+
+
+# State shared with the processes that write the snapshots of demoDesignVars
+_demoState = None
+
+
+def _writeDemoSnapshot(snapshot):
+    """Write the output files of a snapshot of demoDesignVars"""
+    DVGeo, directory, dvDict, pointSet, CFDSolver, callBack, outputType = _demoState
+    outFile, key, j, count, val = snapshot
+
+    # Add perturbation to the design variable and update
+    x = dvDict[key].flatten()
+    x[j] = val
+    perturbed = dict(dvDict)
+    perturbed[key] = x
+    DVGeo.setDesignVars(perturbed)
+
+    # Write FFD
+    if outputType == "vtk":
+        DVGeo.writeVTK(f"{directory}/ffd/{outFile}.vtu")
+    else:
+        DVGeo.writeTecplot(f"{directory}/ffd/{outFile}.dat")
+
+    # Write point set
+    if pointSet is not None:
+        DVGeo.update(pointSet)
+        DVGeo.writePointSet(pointSet, f"{directory}/pointset/{outFile}", outputType=outputType)
+
+    # Write surface mesh
+    if CFDSolver is not None:
+        CFDSolver.DVGeo.setDesignVars(perturbed)
+        CFDSolver.setAeroProblem(CFDSolver.curAP)
+        CFDSolver.writeSurfaceSolutionFileTecplot(f"{directory}/surf/{outFile}")
+
+    # Call user function
+    if callBack is not None:
+        callBack(directory, count)
 
 
 class DVGeometry(BaseDVGeometry):
@@ -200,14 +258,21 @@ class DVGeometry(BaseDVGeometry):
         self.links_x = None
         self.links_n = None
 
-        # Jacobians:
+        # Jacobians, and the config that the jacobian of each point set was computed for:
         self.JT = {}
+        self.JTConfig = {}
         self.nPts = {}
-        self.dCoefdDVUpdated = False
+
+        # dCoefdDV of each config, and the derivatives passed to the children
+        # with it, valid until the design variables change
+        self.dCoefdDV = {}
 
         # dictionary to save any coordinate transformations we are given
         self.coordXfer = {}
 
+        # Recorder of the design history
+        self.history = None
+
         # Derivatives of Xref and Coef provided by the parent to the
         # children
         self.dXrefdXdvg = None
@@ -1478,10 +1543,13 @@ class DVGeometry(BaseDVGeometry):
 
         return self.DV_listSectionLocal[dvName].nVal
 
-    def addCompositeDV(self, dvName, ptSetName=None, u=None, scale=None, prependName=True):
+    def addCompositeDV(self, dvName, ptSetName=None, u=None, scale=None, prependName=True, comm=None, nModes=None):
         """
-        Add composite DVs. Note that this is essentially a preprocessing call which only works in serial
-        at the moment.
+        Add composite DVs. Note that this is essentially a preprocessing call.
+        If the composite DVs are computed from a point set, the singular
+        value decomposition of the point set Jacobian is obtained from its
+        (nDV, nDV) Gram matrix, so the point set can be distributed and the
+        full Jacobian is never formed as a dense matrix.
 
         Parameters
         ----------
@@ -1503,6 +1571,13 @@ class DVGeometry(BaseDVGeometry):
             DV names such that the DVGeo's name is prepended to the user provided
             name. For backwards compatability, this behavior is maintained, but
             can be disabled by setting the prependName argument to False.
+        comm : MPI communicator, optional
+            The communicator over which the point set is distributed. If
+            given, the Gram matrix is summed over all procs.
+        nModes : int, optional
+            Number of composite DVs to keep when they are computed from a
+            point set. Only the modes with the largest singular values are
+            kept. By default there is one composite DV per DV.
         """
         NDV = self.getNDV()
         if self.name is not None and prependName:
@@ -1518,17 +1593,20 @@ class DVGeometry(BaseDVGeometry):
             if ptSetName is None:
                 raise ValueError("If u and s need to be computed, you must specify the ptSetName")
             self.computeTotalJacobian(ptSetName)
-            J_full = self.JT[ptSetName].toarray()  # this is in CSR format but we convert it to a dense matrix
-            u, s, _ = np.linalg.svd(J_full, full_matrices=False)
-            scale = np.sqrt(s)
-            # normalize the scaling
-            scale = scale * (NDV / np.sum(scale))
+
+            # The Gram matrix is only of size (NDV, NDV), JT stays sparse
+            JT = self.JT[ptSetName]
+            gram = (JT @ JT.T).toarray()
+            if comm:
+                gram = comm.allreduce(gram, op=MPI.SUM)
+            u, s, scale = self._computeCompositeBasis(gram, nModes)
+
         # map the initial design variable values
         # we do this manually instead of calling self.mapVecToComp
         # because self.DVComposite.u isn't available yet
         values = u.T @ self.convertDictToSensitivity(self.getValues())
 
-        self.DVComposite = geoDVComposite(dvName, values, NDV, u, scale=scale, s=s)
+        self.DVComposite = geoDVComposite(dvName, values, u.shape[1], u, scale=scale, s=s)
         self.useComposite = True
 
     def addShapeFunctionDV(
@@ -1638,6 +1716,40 @@ class DVGeometry(BaseDVGeometry):
 
         return self.DV_listLocal[dvName].nVal
 
+    def addHistory(self, fileName, storeCoef=False, chunkSize=10, comm=MPI.COMM_WORLD):
+        """
+        Record the design history of this DVGeometry. The design
+        variables are recorded every time :func:`setDesignVars` is
+        called, and written in chunks to a single compressed file. See
+        :class:`DVGeoHistory <.DVGeoHistory>` for reading the history
+        back and reconstructing the FFD or point sets of any record.
+
+        Parameters
+        ----------
+        fileName : str
+            Name of the history file. Should have a .npz extension.
+        storeCoef : bool
+            Flag to also store the deltas of the FFD coefficients.
+            This requires an evaluation of the design variables, without
+            any point set, for each record.
+        chunkSize : int
+            Number of records buffered before they are written to the file.
+        comm : MPI Intra Comm
+            Communicator of this DVGeometry. Only the root proc writes the file.
+
+        Returns
+        -------
+        history : DVGeoHistory
+            The history recorder
+        """
+        if self.isChild:
+            raise Error("The history must be recorded from the parent DVGeo.")
+
+        name = self.name if self.name is not None else "default"
+        self.history = DVGeoHistory(fileName, {name: self}, storeCoef=storeCoef, chunkSize=chunkSize, comm=comm)
+
+        return self.history
+
     def getSymmetricCoefList(self, volList=None, pointSelect=None, tol=1e-8, getSymmPlane=False):
         """
         Determine the pairs of coefs that need to be constrained for symmetry.
@@ -1806,14 +1918,17 @@ class DVGeometry(BaseDVGeometry):
         for pointSet in self.updated:
             self.updated[pointSet] = False
 
-        # also flag the dCoefdDV as out of date
-        self.dCoefdDVUpdated = False
+        # also flag the dCoefdDV of all the configs as out of date
+        self.dCoefdDV = {}
 
         # Now call setValues on the children. This way the
         # variables will be set on the children
         for child in self.children.values():
             child.setDesignVars(dvDict)
 
+        if self.history is not None:
+            self.history.record()
+
     def zeroJacobians(self, ptSetNames):
         """
         set stored jacobians to None for ptSetNames
@@ -2202,6 +2317,158 @@ class DVGeometry(BaseDVGeometry):
                 Xfinal = self.coordXfer[ptSetName](Xfinal, mode="fwd", applyDisplacement=True)
             return Xfinal
 
+    def _computeFFDCoef(self, config=None):
+        """
+        Compute the FFD coefficients of this DVGeo for the current design
+        variables. Unlike :func:`update`, no point set or child is
+        evaluated, and the control points and the reference axis of this
+        object are restored afterwards, so the state left by the last
+        update is unchanged.
+        """
+        self._finalize()
+        FFDCoef = self.FFD.coef.copy()
+        coef = self.coef.copy() if len(self.axis) > 0 else None
+        coefRotM = copy.deepcopy(self.coefRotM)
+        curves = [
+            getattr(self, name)[key]
+            for name in ["scale", "scale_x", "scale_y", "scale_z", "rot_x", "rot_y", "rot_z", "rot_theta"]
+            for key in self.axis
+        ]
+        curveCoefs = [curve.coef.copy() for curve in curves]
+
+        self.FFD.coef = self.origFFDCoef.copy()
+        self._setInitialValues()
+        try:
+            if len(self.axis) > 0:
+                new_pts = np.zeros((self.nPtAttach, 3), "d")
+                self.updateCalculations(new_pts, isComplex=False, config=config)
+                np.put(self.FFD.coef[:, 0], self.ptAttachInd, new_pts[:, 0])
+                np.put(self.FFD.coef[:, 1], self.ptAttachInd, new_pts[:, 1])
+                np.put(self.FFD.coef[:, 2], self.ptAttachInd, new_pts[:, 2])
+
+            for dv in self.DV_listSpanwiseLocal.values():
+                dv(self.FFD.coef, config)
+            for dv in self.DV_listSectionLocal.values():
+                dv(self.FFD.coef, self.coefRotM, config)
+            for dv in self.DV_listLocal.values():
+                dv(self.FFD.coef, config)
+
+            newCoef = self.FFD.coef.real.copy()
+        finally:
+            self.FFD.coef = FFDCoef
+            self.coefRotM = coefRotM
+            for curve, curveCoef in zip(curves, curveCoefs):
+                curve.coef[:] = curveCoef
+            if coef is not None:
+                self.coef[:, :] = coef
+                self.refAxis.coef = coef.copy()
+                self.refAxis._updateCurveCoef()
+
+        return newCoef
+
+    def updateConfigs(self, ptSetName, configs):
+        """
+        Return the coordinates of a point-set updated for several
+        configurations at once.
+
+        The global design variables of the configurations that share the
+        same active global design variables are only applied once. The
+        local design variables only add a change to the control points,
+        so they are applied to the shared control points as a delta for
+        each configuration, which is propagated to the points linearly.
+        If the object has children or is complex, this falls back to
+        calling :func:`update` for each configuration.
+
+        Parameters
+        ----------
+        ptSetName : str
+            Name of point-set to return. This must match ones of the
+            given in an :func:`addPointSet()` call.
+
+        configs : list
+            The configurations to update the point-set for
+
+        Returns
+        -------
+        coords : dict
+            The updated coordinates of the point-set for each configuration
+        """
+        if self.isChild or self.complex or len(self.children) > 0 or len(configs) == 0:
+            return {config: self.update(ptSetName, config=config) for config in configs}
+
+        self.curPtSet = ptSetName
+        self._finalize()
+        self._complexifyCoef()
+
+        # Group the configs by their active global DVs
+        groups = OrderedDict()
+        for config in configs:
+            active = tuple(
+                key
+                for key, dv in self.DV_listGlobal.items()
+                if dv.config is None or config is None or any(c0 == config for c0 in dv.config)
+            )
+            groups.setdefault(active, []).append(config)
+
+        # Process the group of the last config last, so the control points are left as update would leave them
+        groups.move_to_end(next(active for active, group in groups.items() if configs[-1] in group))
+
+        localDVs = list(self.DV_listSpanwiseLocal.values()) + list(self.DV_listLocal.values())
+        dPtdCoef = self.FFD.embeddedVolumes[ptSetName].dPtdCoef
+
+        coords = {}
+        for groupConfigs in groups.values():
+            # Set all coef Values back to initial values and apply the global DVs of this group
+            self.FFD.coef = self.origFFDCoef.copy()
+            self._setInitialValues()
+
+            if len(self.axis) > 0:
+                new_pts = np.zeros((self.nPtAttach, 3), "d")
+                self.updateCalculations(new_pts, isComplex=False, config=groupConfigs[0])
+                np.put(self.FFD.coef[:, 0], self.ptAttachInd, new_pts[:, 0])
+                np.put(self.FFD.coef[:, 1], self.ptAttachInd, new_pts[:, 1])
+                np.put(self.FFD.coef[:, 2], self.ptAttachInd, new_pts[:, 2])
+
+            # The local DVs that apply to all configs are part of the shared control points
+            for dv in localDVs:
+                if dv.config is None:
+                    dv(self.FFD.coef, None)
+            for dv in self.DV_listSectionLocal.values():
+                if dv.config is None:
+                    dv(self.FFD.coef, self.coefRotM, None)
+
+            baseCoef = self.FFD.coef.copy()
+            self.FFD._updateVolumeCoef()
+            Xbase = self.FFD.getAttachedPoints(ptSetName)
+
+            for config in groupConfigs:
+                # Change of the control points due to the local DVs of this config
+                delta = np.zeros_like(baseCoef)
+                for dv in localDVs:
+                    if dv.config is not None:
+                        dv(delta, config)
+                for dv in self.DV_listSectionLocal.values():
+                    if dv.config is not None:
+                        dv(delta, self.coefRotM, config)
+
+                Xfinal = Xbase.copy()
+                if dPtdCoef is not None:
+                    for ii in range(3):
+                        Xfinal[:, ii] += dPtdCoef.dot(delta[:, ii])
+
+                if ptSetName in self.coordXfer:
+                    Xfinal = self.coordXfer[ptSetName](Xfinal, mode="fwd", applyDisplacement=True)
+                coords[config] = Xfinal
+
+        # Leave the control points of the last config
+        self.FFD.coef = baseCoef + delta
+        self.FFD._updateVolumeCoef()
+
+        self._unComplexifyCoef()
+        self.updated[ptSetName] = True
+
+        return coords
+
     def applyToChild(self, childName):
         """
         This function is used to apply the changes in the parent FFD to the
@@ -2631,10 +2898,17 @@ class DVGeometry(BaseDVGeometry):
         """
         return dCoefdDV for a given config
         """
+        key = tuple(config) if isinstance(config, list) else config
 
-        # if dCoefdDV is not out of date, return immediately
-        if self.dCoefdDVUpdated:
-            return self.dCoefdDV
+        # if dCoefdDV is not out of date for this config, return immediately
+        if key in self.dCoefdDV:
+            dCoefdDV, childDerivs = self.dCoefdDV[key]
+
+            # the children need the derivatives of this config
+            for childName, child in self.children.items():
+                for name, value in childDerivs[childName].items():
+                    setattr(child, name, value)
+            return dCoefdDV
 
         # These routines are not recursive. They compute the derivatives at this level and
         # pass information down one level for the next pass call from the routine above
@@ -2685,8 +2959,13 @@ class DVGeometry(BaseDVGeometry):
             else:
                 dCoefdDV += J_casc
 
-        self.dCoefdDV = dCoefdDV
-        self.dCoefdDVUpdated = True
+        # the derivatives passed to the children are stored with dCoefdDV
+        childDerivs = {}
+        for childName, child in self.children.items():
+            childDerivs[childName] = {
+                name: getattr(child, name, None) for name in ["dXrefdXdvg", "dCcdXdvg", "dXrefdXdvl", "dCcdXdvl"]
+            }
+        self.dCoefdDV[key] = (dCoefdDV, childDerivs)
 
         return dCoefdDV
 
@@ -2698,8 +2977,9 @@ class DVGeometry(BaseDVGeometry):
         self._finalize()
         self.curPtSet = ptSetName
 
-        if self.JT[ptSetName] is not None:
+        if self._isJacobianCurrent(ptSetName, config):
             return
+        self.JTConfig[ptSetName] = config
 
         # compute the derivatives of the coefficients of this level wrt all of the design
         # variables at this level and all levels above
@@ -2755,6 +3035,13 @@ class DVGeometry(BaseDVGeometry):
         else:
             self.JT[ptSetName] = None
 
+    def _isJacobianCurrent(self, ptSetName, config):
+        """
+        Check if the jacobian of a point set is up to date and was
+        computed for the given config
+        """
+        return self.JT[ptSetName] is not None and self.JTConfig.get(ptSetName) == config
+
     def computeTotalJacobianCS(self, ptSetName, config=None):
         """Return the total point jacobian in CSR format since we
         need this for TACS"""
@@ -2762,8 +3049,9 @@ class DVGeometry(BaseDVGeometry):
         self._finalize()
         self.curPtSet = ptSetName
 
-        if self.JT[ptSetName] is not None:
+        if self._isJacobianCurrent(ptSetName, config):
             return
+        self.JTConfig[ptSetName] = config
 
         if self.isChild:
             refFFDCoef = copy.copy(self.FFD.coef)
@@ -3027,6 +3315,32 @@ class DVGeometry(BaseDVGeometry):
         if len(self.points) > 0:
             self.update(keyToUpdate, childDelta=True)
 
+    def writeVTK(self, fileName, solutionTime=None):
+        """Write the (deformed) current state of the FFD's to a binary VTK
+        file, including the children. This is much faster than
+        :meth:`writeTecplot <.DVGeometry.writeTecplot>` for large FFDs.
+
+        Parameters
+        ----------
+        fileName : str
+           Filename for VTK file. Should have a .vtu extension
+        solutionTime : float
+            Solution time to write to the file. If given, the file is
+            written as a step of a time series and added to a .pvd
+            collection file with the same root name. This can be used to
+            store an optimization history as a single time series.
+        """
+
+        # Name here doesn't matter, just take the first one
+        if len(self.points) > 0:
+            keyToUpdate = list(self.points.keys())[0]
+            self.update(keyToUpdate, childDelta=False)
+
+        geo_utils.writeVTK(fileName, self._getVolZones(), solutionTime)
+
+        if len(self.points) > 0:
+            self.update(keyToUpdate, childDelta=True)
+
     def writeRefAxes(self, fileName):
         """Write the (deformed) current state of the RefAxes to a tecplot file,
         including the children
@@ -3048,32 +3362,46 @@ class DVGeometry(BaseDVGeometry):
             cFileName = fileName + f"_{childName}.dat"
             child.refAxis.writeTecplot(cFileName, orig=True, curves=True, coef=True)
 
-    def writeLinks(self, fileName):
+    def writeLinks(self, fileName, outputType="tecplot"):
         """Write the links attaching the control points to the reference axes
 
         Parameters
         ----------
         fileName : str
-            Filename for tecplot file. Should have .dat extension
+            Filename for output file. Should have .dat extension for
+            tecplot and .vtu extension for VTK output.
+        outputType : str
+            Type of output file to be written. Can be `tecplot` or `vtk`
         """
         self._finalize()
-        f = openTecplot(fileName, 3)
-        f.write("ZONE NODES=%d ELEMENTS=%d ZONETYPE=FELINESEG\n" % (self.nPtAttach * 2, self.nPtAttach))
-        f.write("DATAPACKING=POINT\n")
+        pts = np.zeros((self.nPtAttach, 2, 3))
         for ipt in range(self.nPtAttach):
-            pt1 = self.refAxis.curves[self.curveIDs[ipt]](self.links_s[ipt])
-            pt2 = self.links_x[ipt] + pt1
+            pts[ipt, 0] = self.refAxis.curves[self.curveIDs[ipt]](self.links_s[ipt])
+            pts[ipt, 1] = self.links_x[ipt] + pts[ipt, 0]
 
-            f.write(f"{pt1[0]:.12g} {pt1[1]:.12g} {pt1[2]:.12g}\n")
-            f.write(f"{pt2[0]:.12g} {pt2[1]:.12g} {pt2[2]:.12g}\n")
-        for i in range(self.nPtAttach):
-            f.write("%d %d\n" % (2 * i + 1, 2 * i + 2))
+        if outputType == "vtk":
+            conn = np.arange(2 * self.nPtAttach).reshape((self.nPtAttach, 2))
+            geo_utils.writeVTK(fileName, [(pts.reshape((-1, 3)), conn)])
+        elif outputType == "tecplot":
+            f = openTecplot(fileName, 3)
+            f.write("ZONE NODES=%d ELEMENTS=%d ZONETYPE=FELINESEG\n" % (self.nPtAttach * 2, self.nPtAttach))
+            f.write("DATAPACKING=POINT\n")
+            for ipt in range(self.nPtAttach):
+                pt1 = pts[ipt, 0]
+                pt2 = pts[ipt, 1]
 
-        closeTecplot(f)
+                f.write(f"{pt1[0]:.12g} {pt1[1]:.12g} {pt1[2]:.12g}\n")
+                f.write(f"{pt2[0]:.12g} {pt2[1]:.12g} {pt2[2]:.12g}\n")
+            for i in range(self.nPtAttach):
+                f.write("%d %d\n" % (2 * i + 1, 2 * i + 2))
 
-    def writePointSet(self, name, fileName, solutionTime=None):
+            closeTecplot(f)
+        else:
+            raise ValueError(f"Type {outputType} not recognized. Must be either 'tecplot' or 'vtk'")
+
+    def writePointSet(self, name, fileName, solutionTime=None, outputType="tecplot"):
         """
-        Write a given point set to a tecplot file
+        Write a given point set to a tecplot or VTK file
 
         Parameters
         ----------
@@ -3081,20 +3409,29 @@ class DVGeometry(BaseDVGeometry):
              The name of the point set to write to a file
 
         fileName : str
-           Filename for tecplot file. Should have no extension, an
+           Filename for output file. Should have no extension, an
            extension will be added
         SolutionTime : float
             Solution time to write to the file. This could be a fictitious time to
-            make visualization easier in tecplot.
+            make visualization easier in tecplot. For VTK output, the
+            point set is added as a step of a time series.
+        outputType : str
+            Type of output file to be written. Can be `tecplot` or `vtk`
         """
         if self.isChild:
             raise Error('Must call "writePointSet" from parent DVGeo.')
         else:
             coords = self.update(name, childDelta=True)
-            fileName = fileName + "_%s.dat" % name
-            f = openTecplot(fileName, 3)
-            writeTecplot1D(f, name, coords, solutionTime)
-            closeTecplot(f)
+            if outputType == "vtk":
+                conn = np.arange(len(coords)).reshape((-1, 1))
+                geo_utils.writeVTK(fileName + "_%s.vtu" % name, [(coords, conn)], solutionTime)
+            elif outputType == "tecplot":
+                fileName = fileName + "_%s.dat" % name
+                f = openTecplot(fileName, 3)
+                writeTecplot1D(f, name, coords, solutionTime)
+                closeTecplot(f)
+            else:
+                raise ValueError(f"Type {outputType} not recognized. Must be either 'tecplot' or 'vtk'")
 
     def writePlot3d(self, fileName):
         """Write the (deformed) current state of the FFD object into a
@@ -3120,7 +3457,7 @@ class DVGeometry(BaseDVGeometry):
         geo : pyGeo object
             A pyGeo object containing an initialized object
         outputType: str
-            Type of output file to be written. Can be `iges` or `tecplot`
+            Type of output file to be written. Can be `iges`, `tecplot` or `vtk`
         fileName: str
             Filename for the output file. Should have no extension, an
             extension will be added
@@ -3196,8 +3533,10 @@ class DVGeometry(BaseDVGeometry):
             geo.writeIGES(fileName + ".igs")
         elif outputType == "tecplot":
             geo.writeTecplot(fileName + ".plt")
+        elif outputType == "vtk":
+            geo.writeVTK(fileName + ".vtu")
         else:
-            raise ValueError(f"Type {outputType} not recognized. Must be either 'iges' or 'tecplot'")
+            raise ValueError(f"Type {outputType} not recognized. Must be either 'iges', 'tecplot' or 'vtk'")
 
     def getLocalIndex(self, iVol, comp=None):
         """Return the local index mapping that points to the global
@@ -3214,8 +3553,85 @@ class DVGeometry(BaseDVGeometry):
 
         return flatChildren
 
+    def clone(self):
+        """
+        Return an independent copy of this DVGeometry object, including its
+        children, point sets and design variables, without embedding the
+        point sets again.
+
+        The data that does not change after the point sets are embedded,
+        such as the parametric coordinates of the points, the dPtdCoef
+        matrices, the knots of the FFD volumes and the topology, is shared
+        with this object. Only the design variables, the coefficients and
+        the other mutable state are copied. The history recorder is not
+        copied.
+
+        Returns
+        -------
+        DVGeometry
+            The copy of this object
+        """
+        if self.isChild:
+            raise Error('Must call "clone" from parent DVGeo.')
+
+        # deepcopy returns the objects that are already in the memo as they are
+        memo = {}
+        for geo in self.getFlattenedChildren():
+            for data in geo._getSharedData():
+                if data is not None:
+                    memo[id(data)] = data
+
+        return copy.deepcopy(self, memo)
+
+    def _getSharedData(self):
+        """
+        Return the data of this level that is not modified once the point
+        sets are embedded, and can be shared between copies.
+        """
+        shared = [self.origFFDCoef, self.coef0, self.ptAttachFull, self.links_s, self.masks, self.FFD.topo]
+
+        for vol in self.FFD.vols:
+            shared.extend(getattr(vol, name, None) for name in ["tu", "tv", "tw"])
+
+        for embeddedVolume in self.FFD.embeddedVolumes.values():
+            shared.extend(
+                [
+                    embeddedVolume.volID,
+                    embeddedVolume.u,
+                    embeddedVolume.v,
+                    embeddedVolume.w,
+                    embeddedVolume.indices,
+                    embeddedVolume.dPtdCoef,
+                    embeddedVolume.dPtdX,
+                    embeddedVolume.mask,
+                ]
+            )
+
+        for dvList in [self.DV_listLocal, self.DV_listSpanwiseLocal]:
+            shared.extend(dv.dvToCoef for dv in dvList.values())
+
+        return shared
+
+    def __getstate__(self):
+        """
+        The history recorder holds an open file, so it is not copied or pickled
+        """
+        state = self.__dict__.copy()
+        state["history"] = None
+        return state
+
     def demoDesignVars(
-        self, directory, includeLocal=True, includeGlobal=True, pointSet=None, CFDSolver=None, callBack=None, freq=2
+        self,
+        directory,
+        includeLocal=True,
+        includeGlobal=True,
+        pointSet=None,
+        CFDSolver=None,
+        callBack=None,
+        freq=2,
+        outputType="tecplot",
+        comm=None,
+        nProc=1,
     ):
         """
         This function can be used to "test" the design variable parametrization
@@ -3254,6 +3670,31 @@ class DVGeometry(BaseDVGeometry):
         freq : int, optional
             Number of snapshots to take between the upper and lower bounds of
             a given variable. If greater than 2, will do a sinusoidal sweep.
+        outputType : str, optional
+            Type of the FFD and point set files, either `tecplot` or `vtk`.
+            The binary VTK files are much faster to write for large FFDs.
+            With `vtk`, an index of the snapshots with the design variable
+            and the value of each one is also written to `index.dat`.
+        comm : MPI.IntraComm, optional
+            If given, the snapshots are distributed over the procs of the
+            comm. Every proc must hold its own DVGeometry object, created
+            on MPI.COMM_SELF, and each proc writes whole files. The point
+            set must therefore hold all the points on every proc, since a
+            point set distributed over the comm would only be written in
+            part.
+        nProc : int, optional
+            Number of processes over which the snapshots of this proc are
+            distributed. The processes are forked from this one, so they
+            share its embedding and only platforms that support forking
+            can use more than one. Forking after MPI has been initialized
+            is not supported, so more than one process can only be used
+            when running on a single proc.
+
+        Notes
+        -----
+        The surface mesh output and the callback are run on all the procs
+        for every snapshot, since the CFD solver writes collectively. The
+        snapshots are then not distributed.
         """
         # Generate directories
         os.makedirs(f"{directory}/ffd", exist_ok=True)
@@ -3264,6 +3705,67 @@ class DVGeometry(BaseDVGeometry):
 
         # Get design variables
         dvDict = self.getValues()
+        allSnapshots = self._getDemoSnapshots(dvDict, includeLocal, includeGlobal, freq)
+
+        if CFDSolver is not None or callBack is not None:
+            comm = None
+            nProc = 1
+
+        if nProc > 1 and MPI.COMM_WORLD.size > 1:
+            raise Error("demoDesignVars cannot fork processes after MPI has been initialized on several procs.")
+
+        # Each proc writes the whole point set, so it must be the same on all the procs
+        if comm is not None and pointSet is not None:
+            points = np.asarray(self.points[pointSet])
+            rootPoints = comm.bcast(points if comm.rank == 0 else None)
+            samePoints = rootPoints.shape == points.shape and np.array_equal(rootPoints, points)
+            if not comm.allreduce(samePoints, op=MPI.LAND):
+                raise Error(
+                    f"The point set {pointSet} differs between the procs. demoDesignVars with a comm requires "
+                    "the full point set on every proc."
+                )
+
+        # Snapshots of this proc
+        snapshots = allSnapshots
+        if comm is not None:
+            snapshots = allSnapshots[comm.rank :: comm.size]
+
+        # The snapshots are not designs of the optimization, so they are not recorded in the history.
+        # This also keeps the forked processes from writing to the history file.
+        history, self.history = self.history, None
+
+        global _demoState
+        _demoState = (self, directory, dvDict, pointSet, CFDSolver, callBack, outputType)
+        try:
+            if nProc > 1 and "fork" in multiprocessing.get_all_start_methods():
+                with ProcessPoolExecutor(nProc, mp_context=multiprocessing.get_context("fork")) as executor:
+                    list(executor.map(_writeDemoSnapshot, snapshots))
+            else:
+                for snapshot in snapshots:
+                    _writeDemoSnapshot(snapshot)
+        finally:
+            _demoState = None
+
+            # Reset DVs to their original values
+            self.setDesignVars(dvDict)
+            self.history = history
+
+        # Write the index of all the snapshots
+        if outputType == "vtk" and (comm is None or comm.rank == 0):
+            with open(f"{directory}/index.dat", "w") as f:
+                f.write("# snapshot design_variable index value\n")
+                for outFile, key, j, _, val in allSnapshots:
+                    f.write(f"{outFile} {key} {j} {np.real(val):.16e}\n")
+
+    def _getDemoSnapshots(self, dvDict, includeLocal, includeGlobal, freq):
+        """
+        Get the snapshots of demoDesignVars, in the order they were taken
+        serially, as a list of (outFile, key, j, count, val) tuples, where
+        outFile is the root of the file names, val is the value of the
+        j-th design variable of key and count is the number of the snapshot
+        of this design variable.
+        """
+        snapshots = []
 
         # Loop through design variables on self and children
         geoList = self.getFlattenedChildren()
@@ -3301,7 +3803,6 @@ class DVGeometry(BaseDVGeometry):
                 x = dvDict[key].flatten()
                 nDV = len(lower)
                 for j in range(nDV):
-                    count = 0
                     if freq == 2:
                         stops = [lower[j], upper[j]]
                     elif freq > 2:
@@ -3310,43 +3811,10 @@ class DVGeometry(BaseDVGeometry):
                         up_swing = x[j] + (upper[j] - x[j]) * sinusoid
                         stops = np.concatenate((down_swing[:-1], up_swing[:-1]))
 
-                    for val in stops:
-                        # Add perturbation to the design variable and update
-                        old_val = x[j]
-                        x[j] = val
-                        dvDict.update({key: x})
-                        self.setDesignVars(dvDict)
-
-                        # Set output filename
-                        outFile = f"{key}_{j:03d}_iter_{count:03d}"
-
-                        # Write FFD
-                        self.writeTecplot(f"{directory}/ffd/{outFile}.dat")
+                    for count, val in enumerate(stops):
+                        snapshots.append((f"{key}_{j:03d}_iter_{count:03d}", key, j, count, val))
 
-                        # Write point set
-                        if pointSet is not None:
-                            self.update(pointSet)
-                            self.writePointSet(pointSet, f"{directory}/pointset/{outFile}")
-
-                        # Write surface mesh
-                        if CFDSolver is not None:
-                            CFDSolver.DVGeo.setDesignVars(dvDict)
-                            CFDSolver.setAeroProblem(CFDSolver.curAP)
-                            CFDSolver.writeSurfaceSolutionFileTecplot(f"{directory}/surf/{outFile}")
-
-                        # Call user function
-                        if callBack is not None:
-                            callBack(directory, count)
-
-                        # Reset variable
-                        x[j] = old_val
-                        dvDict.update({key: x})
-
-                        # Iterate counter
-                        count += 1
-
-        # Reset DVs to their original values
-        self.setDesignVars(dvDict)
+        return snapshots
 
     def setVolBounds(self, volBounds):
         """
@@ -3745,6 +4213,27 @@ class DVGeometry(BaseDVGeometry):
 
     def _update_deriv(self, iDV=0, oneoverh=1.0 / 1e-40, config=None, localDV=False):
         """Copy of update function for derivative calc"""
+        new_pts = self._updateAttachedComplex(config=config)
+
+        if len(self.axis) > 0:
+            # create a vector with the derivative of the parent control points wrt the
+            # parent global variables
+            tmp = np.zeros(self.FFD.coef.shape, dtype="d")
+            np.put(tmp[:, 0], self.ptAttachInd, np.imag(new_pts[:, 0]) * oneoverh)
+            np.put(tmp[:, 1], self.ptAttachInd, np.imag(new_pts[:, 1]) * oneoverh)
+            np.put(tmp[:, 2], self.ptAttachInd, np.imag(new_pts[:, 2]) * oneoverh)
+
+            # set the forward effect of the global design vars in each child
+            self._addChildCascade(tmp.flatten(), iDV, localDV)
+
+        return new_pts
+
+    def _updateAttachedComplex(self, config=None):
+        """
+        Update the attached control points with the complex coefficients
+        of this level. The coefficients are updated in place and the
+        attached points are returned.
+        """
         new_pts = np.zeros((self.nPtAttach, 3), "D")
 
         # Step 1: Call all the design variables IFF we have ref axis:
@@ -3766,43 +4255,40 @@ class DVGeometry(BaseDVGeometry):
             new_pts[:, 1] = self.FFD.coef[self.ptAttachInd, 1]
             new_pts[:, 2] = self.FFD.coef[self.ptAttachInd, 2]
 
-            # set the forward effect of the global design vars in each child
-            for childName, child in self.children.items():
-                # get the derivative of the child axis and control points wrt the parent
-                # control points
-                dXrefdCoef = self.FFD.embeddedVolumes[f"{childName}_axis"].dPtdCoef
-                dCcdCoef = self.FFD.embeddedVolumes[f"{childName}_coef"].dPtdCoef
+        return new_pts
+
+    def _addChildCascade(self, dCoefdXdv, iDV, localDV):
+        """
+        Pass the derivatives of the control points of this level wrt the
+        design variables in column(s) iDV down to the children
+
+        Parameters
+        ----------
+        dCoefdXdv : ndarray of size (nCoef*3,) or (nCoef*3, nCol)
+            Derivative of the flattened control points wrt the design variables
+        iDV : int or array of ints
+            The column(s) of the design variables in the full jacobian
+        localDV : bool
+            Flag to indicate that the design variables are local ones
+        """
+        for childName, child in self.children.items():
+            # get the derivative of the child axis and control points wrt the parent
+            # control points
+            dXrefdCoef = self.FFD.embeddedVolumes[f"{childName}_axis"].dPtdCoef
+            dCcdCoef = self.FFD.embeddedVolumes[f"{childName}_coef"].dPtdCoef
 
-                # create a vector with the derivative of the parent control points wrt the
-                # parent global variables
-                tmp = np.zeros(self.FFD.coef.shape, dtype="d")
-                np.put(tmp[:, 0], self.ptAttachInd, np.imag(new_pts[:, 0]) * oneoverh)
-                np.put(tmp[:, 1], self.ptAttachInd, np.imag(new_pts[:, 1]) * oneoverh)
-                np.put(tmp[:, 2], self.ptAttachInd, np.imag(new_pts[:, 2]) * oneoverh)
-
-                # create variables for the total derivative of the child axis and control
-                # points wrt the parent global variables
-                dXrefdXdv = np.zeros((dXrefdCoef.shape[0] * 3), "d")
-                dCcdXdv = np.zeros((dCcdCoef.shape[0] * 3), "d")
-
-                # multiply the derivative of the child axis wrt the parent control points
-                # by the derivative of the parent control points wrt the parent global vars.
-                # this is just chain rule
-                dXrefdXdv[0::3] = dXrefdCoef.dot(tmp[:, 0])
-                dXrefdXdv[1::3] = dXrefdCoef.dot(tmp[:, 1])
-                dXrefdXdv[2::3] = dXrefdCoef.dot(tmp[:, 2])
-
-                # do the same for the child control points
-                dCcdXdv[0::3] = dCcdCoef.dot(tmp[:, 0])
-                dCcdXdv[1::3] = dCcdCoef.dot(tmp[:, 1])
-                dCcdXdv[2::3] = dCcdCoef.dot(tmp[:, 2])
+            # multiply the derivative of the child axis wrt the parent control points
+            # by the derivative of the parent control points wrt the parent global vars.
+            # this is just chain rule. do the same for the child control points
+            for ii in range(3):
+                dXrefdXdv = dXrefdCoef.dot(dCoefdXdv[ii::3])
+                dCcdXdv = dCcdCoef.dot(dCoefdXdv[ii::3])
                 if localDV and self._getNDVLocalSelf():
-                    child.dXrefdXdvl[:, iDV] += dXrefdXdv
-                    child.dCcdXdvl[:, iDV] += dCcdXdv
+                    child.dXrefdXdvl[ii::3, iDV] += dXrefdXdv
+                    child.dCcdXdvl[ii::3, iDV] += dCcdXdv
                 elif self._getNDVGlobalSelf():
-                    child.dXrefdXdvg[:, iDV] += dXrefdXdv.real
-                    child.dCcdXdvg[:, iDV] += dCcdXdv.real
-        return new_pts
+                    child.dXrefdXdvg[ii::3, iDV] += dXrefdXdv
+                    child.dCcdXdvg[ii::3, iDV] += dCcdXdv
 
     def _update_deriv_cs(self, ptSetName, config=None):
         """
@@ -3848,8 +4334,8 @@ class DVGeometry(BaseDVGeometry):
 
         # Apply the real and complex parts separately
         for key in self.DV_listSpanwiseLocal:
-            self.DV_listSpanwiseLocal[key](self.FFD.coef, self.coefRotM, config)
-            self.DV_listSpanwiseLocal[key].updateComplex(self.FFD.coef, self.coefRotM, config)
+            self.DV_listSpanwiseLocal[key](self.FFD.coef, config)
+            self.DV_listSpanwiseLocal[key].updateComplex(self.FFD.coef, config)
 
         for key in self.DV_listSectionLocal:
             self.DV_listSectionLocal[key](self.FFD.coef, self.coefRotM, config)
@@ -3955,8 +4441,9 @@ class DVGeometry(BaseDVGeometry):
         self._finalize()
         self.curPtSet = ptSetName
 
-        if self.JT[ptSetName] is not None:
+        if self._isJacobianCurrent(ptSetName, config):
             return
+        self.JTConfig[ptSetName] = config
 
         if self.isChild:
             refFFDCoef = copy.copy(self.FFD.coef)
@@ -4156,82 +4643,28 @@ class DVGeometry(BaseDVGeometry):
         self._getDVOffsets()
 
         if nDV != 0:
-            Jacobian = sparse.lil_matrix((self.nPtAttachFull * 3, self.nDV_T))
-
-            # Create the storage arrays for the information that must be
-            # passed to the children
-
-            for childName, child in self.children.items():
-                N = self.FFD.embeddedVolumes[f"{childName}_axis"].N
-                child.dXrefdXdvl = np.zeros((N * 3, self.nDV_T))
-
-                N = self.FFD.embeddedVolumes[f"{childName}_coef"].N
-                child.dCcdXdvl = np.zeros((N * 3, self.nDV_T))
+            self._initChildLocalJacobians()
 
+            blocks = []
             iDVSpanwiseLocal = self.nDVSW_count
             for key in self.DV_listSpanwiseLocal:
                 dv = self.DV_listSpanwiseLocal[key]
 
                 # check that the dv is active for this config
                 if dv.config is None or config is None or any(c0 == config for c0 in dv.config):
-                    nVal = dv.nVal
-
                     # apply this dv to FFD
                     self.DV_listSpanwiseLocal[key](self.FFD.coef, config)
 
-                    # loop over value of the dv
-                    # (for example a single shape dv may have 20 values that
-                    # control the shape of the FFD at 20 points)
-                    for j in range(nVal):
-                        coefs = dv.dv_to_coefs[j]  # affected control points of FFD
-
-                        # this is map from dvs to coef
-                        for coef in coefs:
-                            irow = coef * 3 + dv.axis
-                            # *3 because the jacobian has a row for each x,y,z of the FFD
-                            # It is basically
-                            # row number = coef index * n dimensions + dimension index
-
-                            # value of FFD node location = x0 + dv_SWLocal[j]
-                            # so partial(FFD node location)/partial(dv_SWLocal) = 1
-                            # for each node effected by the dv_SWLocal[j]
-                            Jacobian[irow, iDVSpanwiseLocal] = 1.0
-
-                        for childName, child in self.children.items():
-                            # Get derivatives of child ref axis and FFD control
-                            # points w.r.t. parent's FFD control points
-                            dXrefdCoef = self.FFD.embeddedVolumes[f"{childName}_axis"].dPtdCoef
-                            dCcdCoef = self.FFD.embeddedVolumes[f"{childName}_coef"].dPtdCoef
-
-                            # derivative of Change in the FFD coef due to DVs
-                            # same as Jacobian above, but differnt ordering
-                            dCoefdXdvl = np.zeros(self.FFD.coef.shape, dtype="d")
-
-                            for coef in coefs:
-                                dCoefdXdvl[coef, dv.axis] = 1.0
-
-                            dXrefdXdvl = np.zeros((dXrefdCoef.shape[0] * 3), "d")
-                            dCcdXdvl = np.zeros((dCcdCoef.shape[0] * 3), "d")
-
-                            dXrefdXdvl[0::3] = dXrefdCoef.dot(dCoefdXdvl[:, 0])
-                            dXrefdXdvl[1::3] = dXrefdCoef.dot(dCoefdXdvl[:, 1])
-                            dXrefdXdvl[2::3] = dXrefdCoef.dot(dCoefdXdvl[:, 2])
-
-                            dCcdXdvl[0::3] = dCcdCoef.dot(dCoefdXdvl[:, 0])
-                            dCcdXdvl[1::3] = dCcdCoef.dot(dCoefdXdvl[:, 1])
-                            dCcdXdvl[2::3] = dCcdCoef.dot(dCoefdXdvl[:, 2])
-
-                            # TODO: the += here is to allow recursion check this with multiple nesting
-                            # levels
-                            child.dXrefdXdvl[:, iDVSpanwiseLocal] += dXrefdXdvl
-                            child.dCcdXdvl[:, iDVSpanwiseLocal] += dCcdXdvl
-
-                        iDVSpanwiseLocal += 1
-                else:
-                    iDVSpanwiseLocal += self.DV_listSectionLocal[key].nVal
+                    # value of FFD node location = x0 + dv_SWLocal[j]
+                    # so partial(FFD node location)/partial(dv_SWLocal) = 1
+                    # for each node effected by the dv_SWLocal[j]
+                    dvToCoef = dv.getDVToCoef(len(self.FFD.coef))
+                    blocks.append((dvToCoef, iDVSpanwiseLocal))
+                    self._addChildLocalJacobians(dvToCoef, iDVSpanwiseLocal)
+
+                iDVSpanwiseLocal += dv.nVal
 
-                # end if config check
-            # end for
+            Jacobian = self._assembleLocalJacobian(blocks)
         else:
             Jacobian = None
 
@@ -4242,74 +4675,28 @@ class DVGeometry(BaseDVGeometry):
         Return the derivative of the coefficients wrt the local normal design
         variables
         """
-        # This is relatively straight forward, since the matrix is
-        # entirely one's or zeros
         nDV = self._getNDVSectionLocalSelf()
         self._getDVOffsets()
 
         if nDV != 0:
-            Jacobian = sparse.lil_matrix((self.nPtAttachFull * 3, self.nDV_T))
-
-            # Create the storage arrays for the information that must be
-            # passed to the children
-
-            for childName, child in self.children.items():
-                N = self.FFD.embeddedVolumes[f"{childName}_axis"].N
-                child.dXrefdXdvl = np.zeros((N * 3, self.nDV_T))
-
-                N = self.FFD.embeddedVolumes[f"{childName}_coef"].N
-                child.dCcdXdvl = np.zeros((N * 3, self.nDV_T))
+            self._initChildLocalJacobians()
 
+            blocks = []
             iDVSectionLocal = self.nDVSL_count
             for key in self.DV_listSectionLocal:
                 dv = self.DV_listSectionLocal[key]
                 if dv.config is None or config is None or any(c0 == config for c0 in dv.config):
-                    nVal = dv.nVal
-
                     self.DV_listSectionLocal[key](self.FFD.coef, self.coefRotM, config)
 
-                    for j in range(nVal):
-                        coef = dv.coefList[j]  # affected control point
-                        T = dv.sectionTransform[dv.sectionLink[coef]]
-                        inFrame = np.zeros((3, 1))
-                        # Set axis that is being perturbed to 1.0
-                        inFrame[dv.axis] = 1.0
-
-                        R = np.real(self.coefRotM[coef])
-                        # this is a bug fix for scipy 1.3+ related to fancy indexing
-                        # the original was:
-                        # rows = range(coef*3,(coef+1)*3)
-                        # Jacobian[rows, iDVSectionLocal] += R.dot(T.dot(inFrame))
-                        Jacobian[coef * 3 : (coef + 1) * 3, iDVSectionLocal] += R.dot(T.dot(inFrame))
-                        for childName, child in self.children.items():
-                            dXrefdCoef = self.FFD.embeddedVolumes[f"{childName}_axis"].dPtdCoef
-                            dCcdCoef = self.FFD.embeddedVolumes[f"{childName}_coef"].dPtdCoef
-
-                            tmp = np.zeros(self.FFD.coef.shape, dtype="d")
-
-                            tmp[coef, :] = R.dot(T.dot(inFrame)).flatten()
-
-                            dXrefdXdvl = np.zeros((dXrefdCoef.shape[0] * 3), "d")
-                            dCcdXdvl = np.zeros((dCcdCoef.shape[0] * 3), "d")
-
-                            dXrefdXdvl[0::3] = dXrefdCoef.dot(tmp[:, 0])
-                            dXrefdXdvl[1::3] = dXrefdCoef.dot(tmp[:, 1])
-                            dXrefdXdvl[2::3] = dXrefdCoef.dot(tmp[:, 2])
-
-                            dCcdXdvl[0::3] = dCcdCoef.dot(tmp[:, 0])
-                            dCcdXdvl[1::3] = dCcdCoef.dot(tmp[:, 1])
-                            dCcdXdvl[2::3] = dCcdCoef.dot(tmp[:, 2])
-
-                            # TODO: the += here is to allow recursion check this with multiple nesting
-                            # levels
-                            child.dXrefdXdvl[:, iDVSectionLocal] += dXrefdXdvl
-                            child.dCcdXdvl[:, iDVSectionLocal] += dCcdXdvl
-                        iDVSectionLocal += 1
-                else:
-                    iDVSectionLocal += self.DV_listSectionLocal[key].nVal
+                    # Each design variable moves its coefficient along the
+                    # rotated section frame direction
+                    dvToCoef = dv.getDVToCoef(len(self.FFD.coef), self.coefRotM)
+                    blocks.append((dvToCoef, iDVSectionLocal))
+                    self._addChildLocalJacobians(dvToCoef, iDVSectionLocal)
+
+                iDVSectionLocal += dv.nVal
 
-                # end if config check
-            # end for
+            Jacobian = self._assembleLocalJacobian(blocks)
         else:
             Jacobian = None
 
@@ -4326,106 +4713,111 @@ class DVGeometry(BaseDVGeometry):
         self._getDVOffsets()
 
         if nDV != 0:
-            Jacobian = sparse.lil_matrix((self.nPtAttachFull * 3, self.nDV_T))
-
-            # Create the storage arrays for the information that must be
-            # passed to the children
-            for childName, child in self.children.items():
-                N = self.FFD.embeddedVolumes[f"{childName}_axis"].N
-                child.dXrefdXdvl = np.zeros((N * 3, self.nDV_T))
-
-                N = self.FFD.embeddedVolumes[f"{childName}_coef"].N
-                child.dCcdXdvl = np.zeros((N * 3, self.nDV_T))
+            self._initChildLocalJacobians()
 
+            blocks = []
             iDVLocal = self.nDVL_count
             for key in self.DV_listLocal:
-                if (
-                    self.DV_listLocal[key].config is None
-                    or config is None
-                    or any(c0 == config for c0 in self.DV_listLocal[key].config)
-                ):
+                dv = self.DV_listLocal[key]
+                if dv.config is None or config is None or any(c0 == config for c0 in dv.config):
                     self.DV_listLocal[key](self.FFD.coef, config)
 
-                    # figure out if this is a regular local DV or if its a shapeFunc DV
-                    if hasattr(self.DV_listLocal[key], "shapes"):
-                        shapeFunc = True
-                    else:
-                        shapeFunc = False
+                    dvToCoef = dv.getDVToCoef(len(self.FFD.coef))
+                    blocks.append((dvToCoef, iDVLocal))
+                    self._addChildLocalJacobians(dvToCoef, iDVLocal)
 
-                    nVal = self.DV_listLocal[key].nVal
-                    for j in range(nVal):
-                        if shapeFunc:
-                            # get the current shape
-                            shape = self.DV_listLocal[key].shapes[j]
-
-                            # loop over entries in shape and set values in jac
-                            for coefInd, direction in shape.items():
-                                # set the 3 coordinates
-                                for jj in range(3):
-                                    irow = coefInd * 3 + jj
-                                    Jacobian[irow, iDVLocal] = direction[jj]
-                        else:
-                            pt_dv = self.DV_listLocal[key].coefList[j]
-                            irow = pt_dv[0] * 3 + pt_dv[1]
-                            Jacobian[irow, iDVLocal] = 1.0
-
-                        for childName, child in self.children.items():
-                            # Get derivatives of child ref axis and FFD control
-                            # points w.r.t. parent's FFD control points
-                            dXrefdCoef = self.FFD.embeddedVolumes[f"{childName}_axis"].dPtdCoef
-                            dCcdCoef = self.FFD.embeddedVolumes[f"{childName}_coef"].dPtdCoef
-
-                            tmp = np.zeros(self.FFD.coef.shape, dtype="d")
-
-                            if shapeFunc:
-                                # get the current shape
-                                shape = self.DV_listLocal[key].shapes[j]
-
-                                # loop over entries in shape and set values in jac
-                                for coefInd, direction in shape.items():
-                                    # set the 3 coordinates
-                                    for jj in range(3):
-                                        tmp[coefInd, jj] = direction[jj]
-
-                            else:
-                                tmp[pt_dv[0], pt_dv[1]] = 1.0
-
-                            dXrefdXdvl = np.zeros((dXrefdCoef.shape[0] * 3), "d")
-                            dCcdXdvl = np.zeros((dCcdCoef.shape[0] * 3), "d")
-
-                            dXrefdXdvl[0::3] = dXrefdCoef.dot(tmp[:, 0])
-                            dXrefdXdvl[1::3] = dXrefdCoef.dot(tmp[:, 1])
-                            dXrefdXdvl[2::3] = dXrefdCoef.dot(tmp[:, 2])
-
-                            dCcdXdvl[0::3] = dCcdCoef.dot(tmp[:, 0])
-                            dCcdXdvl[1::3] = dCcdCoef.dot(tmp[:, 1])
-                            dCcdXdvl[2::3] = dCcdCoef.dot(tmp[:, 2])
-
-                            # TODO: the += here is to allow recursion check this with multiple nesting
-                            # levels
-                            child.dXrefdXdvl[:, iDVLocal] += dXrefdXdvl
-                            child.dCcdXdvl[:, iDVLocal] += dCcdXdvl
-                        iDVLocal += 1
-                else:
-                    iDVLocal += self.DV_listLocal[key].nVal
+                iDVLocal += dv.nVal
 
-                # end if config check
-            # end for
+            Jacobian = self._assembleLocalJacobian(blocks)
         else:
             Jacobian = None
 
         return Jacobian
 
+    def _initChildLocalJacobians(self):
+        """
+        Create the storage arrays for the derivatives of the child reference
+        axes and control points wrt the local design variables of this level
+        """
+        for childName, child in self.children.items():
+            N = self.FFD.embeddedVolumes[f"{childName}_axis"].N
+            child.dXrefdXdvl = np.zeros((N * 3, self.nDV_T))
+
+            N = self.FFD.embeddedVolumes[f"{childName}_coef"].N
+            child.dCcdXdvl = np.zeros((N * 3, self.nDV_T))
+
+    def _addChildLocalJacobians(self, dvToCoef, iDV):
+        """
+        Pass the derivatives of a group of local design variables starting at
+        column iDV down to the children
+        """
+        cols = slice(iDV, iDV + dvToCoef.shape[1])
+        for childName, child in self.children.items():
+            # Get derivatives of child ref axis and FFD control
+            # points w.r.t. parent's FFD control points
+            dXrefdCoef = self.FFD.embeddedVolumes[f"{childName}_axis"].dPtdCoef
+            dCcdCoef = self.FFD.embeddedVolumes[f"{childName}_coef"].dPtdCoef
+
+            # TODO: the += here is to allow recursion check this with multiple nesting
+            # levels
+            for ii in range(3):
+                dCoefdXdvl = dvToCoef[ii::3, :]
+                child.dXrefdXdvl[ii::3, cols] += (dXrefdCoef @ dCoefdXdvl).toarray()
+                child.dCcdXdvl[ii::3, cols] += (dCcdCoef @ dCoefdXdvl).toarray()
+
+    def _assembleLocalJacobian(self, blocks):
+        """
+        Assemble the blocks of a local design variable type, given as
+        (dvToCoef, iDV) pairs, into a full width sparse Jacobian
+        """
+        rows = []
+        cols = []
+        data = []
+        for dvToCoef, iDV in blocks:
+            dvToCoef = dvToCoef.tocoo()
+            rows.append(dvToCoef.row)
+            cols.append(dvToCoef.col + iDV)
+            data.append(dvToCoef.data)
+
+        if len(blocks) == 0:
+            rows = cols = data = [np.zeros(0, "intc")]
+
+        return sparse.csr_matrix(
+            (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(self.nPtAttachFull * 3, self.nDV_T),
+        )
+
     def _cascadedDVJacobian(self, config=None):
         """
         Compute the cascading derivatives from the parent to the child
+
+        The parent provides the derivatives of the reference axis and of the
+        control points of this child wrt its design variables. They are
+        propagated through the update of this child, which is linear in these
+        perturbations. The update is either differentiated once in the
+        direction of each column, or its tangent is assembled once wrt the
+        reference axis and the control points and applied to all the columns,
+        whichever requires fewer updates.
         """
 
         if not self.isChild:
             return None
 
         # we are now on a child. Add in dependence passed from parent
-        Jacobian = sparse.lil_matrix((self.nPtAttachFull * 3, self.nDV_T))
+        shape = (self.nPtAttachFull * 3, self.nDV_T)
+        Jacobian = sparse.csr_matrix(shape)
+
+        cascades = []
+        if self.dXrefdXdvg is not None:
+            cascades.append((self.dXrefdXdvg, self.dCcdXdvg, False))
+        if self.dXrefdXdvl is not None:
+            cascades.append((self.dXrefdXdvl, self.dCcdXdvl, True))
+
+        # only the design variables that the parent passed down are propagated
+        cols = [np.flatnonzero(np.any(dXref != 0, axis=0) | np.any(dCc != 0, axis=0)) for dXref, dCc, _ in cascades]
+        nCol = sum(len(c) for c in cols)
+        if nCol == 0:
+            return Jacobian
 
         # Save reference values (these are necessary so that we always start
         # from the base state on the current DVGeo, and then apply the design
@@ -4433,130 +4825,113 @@ class DVGeometry(BaseDVGeometry):
         refFFDCoef = copy.copy(self.FFD.coef)
         refCoef = copy.copy(self.coef)
 
-        h = 1.0e-40j
-        oneoverh = 1.0 / 1e-40
-        if self.dXrefdXdvg is not None:
-            for iDV in range(self.dXrefdXdvg.shape[1]):
-                nz1 = np.count_nonzero(self.dXrefdXdvg[:, iDV])
-                nz2 = np.count_nonzero(self.dCcdXdvg[:, iDV])
-                if nz1 + nz2 == 0:
-                    continue
-
-                # Complexify all of the coefficients
-                self.FFD.coef = refFFDCoef.astype("D")
-                self.coef = refCoef.astype("D")
-                self._complexifyCoef()
+        nTangent = 3 * len(refCoef) + 3
+        if nTangent < nCol:
+            dCoefdXref, dCoefdCc = self._cascadeTangent(refFFDCoef, refCoef, config)
 
-                # Add a complex pertubation representing the change in the child
-                # reference axis wrt the parent global DVs
-                self.coef[:, 0] += self.dXrefdXdvg[0::3, iDV] * h
-                self.coef[:, 1] += self.dXrefdXdvg[1::3, iDV] * h
-                self.coef[:, 2] += self.dXrefdXdvg[2::3, iDV] * h
+        # the rows of the attached control points
+        attachRows = (3 * np.asarray(self.ptAttachInd, dtype=int)[:, None] + np.arange(3)).flatten()
 
-                # insert the new coef into the refAxis
-                self.refAxis.coef = self.coef.copy()
-                self.refAxis._updateCurveCoef()
-
-                # Complexify the child FFD coords
-                tmp1 = np.zeros_like(self.FFD.coef, dtype="D")
-
-                # add the effect of the global coordinates on the actual control points
-                tmp1[:, 0] = self.dCcdXdvg[0::3, iDV] * h
-                tmp1[:, 1] = self.dCcdXdvg[1::3, iDV] * h
-                tmp1[:, 2] = self.dCcdXdvg[2::3, iDV] * h
-
-                self.FFD.coef += tmp1
-
-                # Store the original FFD coordinates so that we can get the delta
-                oldCoefLocations = self.FFD.coef.copy()
-
-                # compute the deriv of the child FFD coords wrt the parent by processing
-                # the above CS perturbation
-                new_pts = self._update_deriv(iDV, oneoverh, config=config)
-
-                # insert this result in the the correct locations of a vector the correct
-                # size
-                np.put(self.FFD.coef[:, 0], self.ptAttachInd, new_pts[:, 0])
-                np.put(self.FFD.coef[:, 1], self.ptAttachInd, new_pts[:, 1])
-                np.put(self.FFD.coef[:, 2], self.ptAttachInd, new_pts[:, 2])
+        for (dXref, dCc, localDV), iDV in zip(cascades, cols):
+            if len(iDV) == 0:
+                continue
 
-                # We have to subtract off the oldCoefLocations because we only
-                # want the cascading effect on the current design variables. The
-                # complex part on oldCoefLocations was already accounted for on
-                # the parent.
-                self.FFD.coef -= oldCoefLocations
-
-                # sum up all of the various influences
-                Jacobian[0::3, iDV] += oneoverh * np.imag(self.FFD.coef[:, 0:1])
-                Jacobian[1::3, iDV] += oneoverh * np.imag(self.FFD.coef[:, 1:2])
-                Jacobian[2::3, iDV] += oneoverh * np.imag(self.FFD.coef[:, 2:3])
-
-                # decomplexify the coefficients
-                self.coef = self.coef.real.astype("d")
-                self.FFD.coef = self.FFD.coef.real.astype("d")
-                self._unComplexifyCoef()
+            # compute the deriv of the child FFD coords wrt the parent
+            if nTangent < nCol:
+                dCoef = dCoefdXref @ dXref[:, iDV] + dCoefdCc @ dCc[:, iDV]
+            else:
+                dCoef = np.zeros((shape[0], len(iDV)))
+                for j in range(len(iDV)):
+                    dCoef[:, j] = self._cascadeDirection(
+                        refFFDCoef, refCoef, dXref[:, iDV[j]].reshape((-1, 3)), dCc[:, iDV[j]].reshape((-1, 3)), config
+                    )
 
-        if self.dXrefdXdvl is not None:
-            # Now repeat for the local variables
-            for iDV in range(self.dXrefdXdvl.shape[1]):
-                # check if there is any dependence on this DV
-                nz1 = np.count_nonzero(self.dXrefdXdvl[:, iDV])
-                nz2 = np.count_nonzero(self.dCcdXdvl[:, iDV])
-                if nz1 + nz2 == 0:
-                    continue
+            # the attached points are passed down to the children of this child
+            dAttach = np.zeros_like(dCoef)
+            dAttach[attachRows] = dCoef[attachRows]
+            self._addChildCascade(dAttach, iDV, localDV)
+
+            # We have to subtract off the perturbation of the control points because we only
+            # want the cascading effect on the current design variables. It was already
+            # accounted for on the parent.
+            dCoef -= dCc[:, iDV]
+            dCoef = sparse.csr_matrix(dCoef)
+            Jacobian += sparse.csr_matrix(
+                (dCoef.data, iDV[dCoef.indices], dCoef.indptr),
+                shape=shape,
+            )
 
-                # Complexify all of the coefficients
-                self.FFD.coef = refFFDCoef.astype("D")
-                self.coef = refCoef.astype("D")
-                self._complexifyCoef()
+        # decomplexify the coefficients
+        self.coef = refCoef.real.astype("d")
+        self.FFD.coef = refFFDCoef.real.astype("d")
+        self._unComplexifyCoef()
 
-                # Add a complex pertubation representing the change in the child
-                # reference axis wrt the parent local DVs
-                self.coef[:, 0] += self.dXrefdXdvl[0::3, iDV] * h
-                self.coef[:, 1] += self.dXrefdXdvl[1::3, iDV] * h
-                self.coef[:, 2] += self.dXrefdXdvl[2::3, iDV] * h
+        return Jacobian
 
-                # insert the new coef into the refAxis
-                self.refAxis.coef = self.coef.copy()
-                self.refAxis._updateCurveCoef()
+    def _cascadeDirection(self, refFFDCoef, refCoef, dXref, dCc, config):
+        """
+        Complex step the update of this child in the direction of a
+        perturbation of its reference axis and control points. Returns the
+        derivative of the flattened control points after the update.
+        """
+        h = 1.0e-40j
+        oneoverh = 1.0 / 1e-40
 
-                # Complexify the child FFD coords
-                tmp1 = np.zeros_like(self.FFD.coef, dtype="D")
+        # Complexify all of the coefficients
+        self.FFD.coef = refFFDCoef.astype("D")
+        self.coef = refCoef.astype("D")
+        self._complexifyCoef()
 
-                # add the effect of the global coordinates on the actual control points
-                tmp1[:, 0] = self.dCcdXdvl[0::3, iDV] * h
-                tmp1[:, 1] = self.dCcdXdvl[1::3, iDV] * h
-                tmp1[:, 2] = self.dCcdXdvl[2::3, iDV] * h
+        # Add a complex pertubation representing the change in the child
+        # reference axis wrt the parent DVs
+        self.coef += dXref * h
 
-                self.FFD.coef += tmp1
+        # insert the new coef into the refAxis
+        self.refAxis.coef = self.coef.copy()
+        self.refAxis._updateCurveCoef()
 
-                # Store the original FFD coordinates so that we can get the delta
-                oldCoefLocations = self.FFD.coef.copy()
+        # add the effect of the parent DVs on the actual control points
+        self.FFD.coef += dCc * h
 
-                # compute the deriv of the child FFD coords wrt the parent by processing
-                # the above CS perturbation
-                new_pts = self._update_deriv(iDV, oneoverh, config=config, localDV=True)
-                np.put(self.FFD.coef[:, 0], self.ptAttachInd, new_pts[:, 0])
-                np.put(self.FFD.coef[:, 1], self.ptAttachInd, new_pts[:, 1])
-                np.put(self.FFD.coef[:, 2], self.ptAttachInd, new_pts[:, 2])
+        self._updateAttachedComplex(config=config)
 
-                # We have to subtract off the oldCoefLocations because we only
-                # want the cascading effect on the current design variables. The
-                # complex part on oldCoefLocations was already accounted for on
-                # the parent.
-                self.FFD.coef -= oldCoefLocations
+        return oneoverh * np.imag(self.FFD.coef).flatten()
 
-                # sum up all of the various influences
-                Jacobian[0::3, iDV] += oneoverh * np.imag(self.FFD.coef[:, 0:1])
-                Jacobian[1::3, iDV] += oneoverh * np.imag(self.FFD.coef[:, 1:2])
-                Jacobian[2::3, iDV] += oneoverh * np.imag(self.FFD.coef[:, 2:3])
+    def _cascadeTangent(self, refFFDCoef, refCoef, config):
+        """
+        Assemble the derivatives of the flattened control points after the
+        update of this child wrt its reference axis and its control points.
+        Each attached point only depends on its own control point, so the
+        second one is block diagonal and all the control points are
+        perturbed at once in each direction.
+        """
+        nRef = len(refCoef)
+        nCoef = len(refFFDCoef)
+
+        # one column per reference axis coefficient
+        dCoefdXref = np.zeros((nCoef * 3, nRef * 3))
+        for i in range(nRef * 3):
+            dXref = np.zeros(nRef * 3)
+            dXref[i] = 1.0
+            dCoefdXref[:, i] = self._cascadeDirection(
+                refFFDCoef, refCoef, dXref.reshape((-1, 3)), np.zeros((nCoef, 3)), config
+            )
 
-                # decomplexify the coefficients
-                self.coef = self.coef.real.astype("d")
-                self.FFD.coef = self.FFD.coef.real.astype("d")
-                self._unComplexifyCoef()
+        # one 3x3 block per control point
+        rows = 3 * np.arange(nCoef)[:, None] + np.arange(3)
+        data = np.zeros((nCoef, 3, 3))
+        for ii in range(3):
+            dCc = np.zeros((nCoef, 3))
+            dCc[:, ii] = 1.0
+            data[:, :, ii] = self._cascadeDirection(refFFDCoef, refCoef, np.zeros((nRef, 3)), dCc, config).reshape(
+                (-1, 3)
+            )
+        dCoefdCc = sparse.csr_matrix(
+            (data.flatten(), (np.repeat(rows, 3, axis=1).flatten(), np.tile(rows, 3).flatten())),
+            shape=(nCoef * 3, nCoef * 3),
+        )
 
-        return Jacobian
+        return sparse.csr_matrix(dCoefdXref), dCoefdCc
 
     def _writeVols(self, handle, vol_counter, solutionTime):
         for i in range(len(self.FFD.vols)):
@@ -4571,6 +4946,21 @@ class DVGeometry(BaseDVGeometry):
 
         return vol_counter
 
+    def _getVolZones(self):
+        """Collect the control points and embedding volumes of this
+        DVGeo and its children for VTK output"""
+        zones = []
+        for i in range(len(self.FFD.vols)):
+            zones.append(self.FFD.vols[i].coef)
+            self.FFD.vols[i].computeData(recompute=True)
+            zones.append(self.FFD.vols[i].data)
+
+        # Add children volumes:
+        for child in self.children.values():
+            zones.extend(child._getVolZones())
+
+        return zones
+
     def checkDerivatives(self, ptSetName):
         """
         Run a brute force FD check on ALL design variables
@@ -4727,6 +5117,102 @@ class DVGeometry(BaseDVGeometry):
         for child in self.children.values():
             child.checkDerivatives(ptSetName)
 
+    def checkDerivativesRandom(self, ptSetName, nDirections=2, h=1e-6, config=None, seed=0, nProc=1):
+        """
+        Check the derivatives along random directions of the design
+        variables, instead of one design variable at a time as
+        :func:`checkDerivatives` does. For each design variable group, the
+        forward product of the jacobian (:func:`totalSensitivityProd`) is
+        compared to a central finite difference along nDirections random
+        unit directions of the group. The reverse product
+        (:func:`totalSensitivity`) is checked against the forward one with
+        a dot product test using random seeds on the points. This costs two
+        updates per direction regardless of the number of design variables
+        in each group.
+
+        Parameters
+        ----------
+        ptSetName : str
+            name of the point set to check
+        nDirections : int
+            Number of random directions of each design variable group
+        h : float
+            Finite difference step along the unit directions
+        config : str
+            The configuration to check
+        seed : int
+            Seed of the random directions
+        nProc : int
+            Number of processes that compute the finite differences. The
+            processes are forked from this one, so this can only be used
+            on platforms that support forking. Forking after MPI has been
+            initialized is not supported, so more than one process can
+            only be used when running on a single proc.
+
+        Returns
+        -------
+        errors : dict
+            The maximum relative error of the finite difference check
+            ("fd") and of the dot product test ("dot") of each design
+            variable group
+        """
+        if nProc > 1 and MPI.COMM_WORLD.size > 1:
+            raise Error("checkDerivativesRandom cannot fork processes after MPI has been initialized on several procs.")
+
+        rng = np.random.default_rng(seed)
+        x0 = {key: np.array(value).real.copy() for key, value in self.getValues().items()}
+        names = self.getVarNames()
+
+        # random unit directions, nDirections per design variable group
+        directions = []
+        for name in names:
+            for _ in range(nDirections):
+                d = rng.standard_normal(np.size(x0[name]))
+                directions.append({name: d / np.linalg.norm(d)})
+
+        # The perturbed designs are not recorded in the history.
+        # This also keeps the forked processes from writing to the history file.
+        history, self.history = self.history, None
+
+        global _directionCheck
+        try:
+            # analytic forward and reverse products
+            self.setDesignVars(x0)
+            coords0 = self.update(ptSetName, config=config)
+            seeds = rng.standard_normal(coords0.shape)
+            dIdx = self.totalSensitivity(seeds, ptSetName, config=config)
+            jvp = [np.ravel(self.totalSensitivityProd(d, ptSetName, config=config)) for d in directions]
+
+            # finite differences along the directions
+            _directionCheck = (self, ptSetName, x0, directions, h, config)
+            if nProc > 1 and "fork" in multiprocessing.get_all_start_methods():
+                with ProcessPoolExecutor(nProc, mp_context=multiprocessing.get_context("fork")) as executor:
+                    fd = list(executor.map(_finiteDifferenceDirection, range(len(directions))))
+            else:
+                fd = [_finiteDifferenceDirection(i) for i in range(len(directions))]
+        finally:
+            _directionCheck = None
+            self.setDesignVars(x0)
+            self.history = history
+
+        errors = {}
+        print("%-30s %15s %15s" % ("Design variable", "Max FD error", "Max dot error"))
+        for i, name in enumerate(names):
+            fdErr = []
+            dotErr = []
+            for j in range(i * nDirections, (i + 1) * nDirections):
+                scale = max(np.linalg.norm(fd[j]), 1e-16)
+                fdErr.append(np.linalg.norm(fd[j] - jvp[j]) / scale)
+
+                forward = np.dot(np.ravel(seeds), jvp[j])
+                reverse = np.dot(np.ravel(dIdx[name]), directions[j][name])
+                dotErr.append(abs(forward - reverse) / max(abs(forward), 1e-16))
+
+            errors[name] = {"fd": max(fdErr), "dot": max(dotErr)}
+            print("%-30s %15.6e %15.6e" % (name, errors[name]["fd"], errors[name]["dot"]))
+
+        return errors
+
     def printDesignVariables(self):
         """
         Print a formatted list of design variables to the screen
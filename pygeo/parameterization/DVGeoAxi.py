@@ -61,50 +61,14 @@ class _AxiTransform:
         beta = pts[:, self.beta_idx] - center[self.beta_idx]
         gamma = pts[:, self.gamma_idx] - center[self.gamma_idx]
 
-        self.radii = np.sqrt(beta**2 + gamma**2)
+        radii = np.sqrt(beta**2 + gamma**2)
         # need to get the real part because arctan2 is not complex save
         # but its ok, becuase these are constants
-        self.thetas = np.arctan2(gamma.real, beta.real)
-
-        self.cos_thetas = np.cos(self.thetas)
-        self.sin_thetas = np.sin(self.thetas)
-
-        # transformation jacobian to account for the axisymmetric transformation
-        n_pts = len(pts)
-
-        row = np.empty(3 * n_pts, dtype="int")
-        col = np.empty(3 * n_pts, dtype="int")
-        data = np.empty(3 * n_pts)
-        # for j in range(n_pts):
-        #     # Pt_j_x
-        #     row[j] = 0 + 3*j
-        #     col[j] = self.alpha_idx + 3*j
-        #     data[j] = 1.
-        #     # Pt_j_y
-        #     row[j+1] = 1 + 3*j
-        #     col[j+1] = self.beta_idx + 3*j
-        #     data[j+1] = self.sin_thetas[j]
-        #     # Pt_j_z
-        #     row[j+2] = 2 + 3*j
-        #     col[j+2] = self.beta_idx + 3*j
-        #     data[j+2] = self.cos_thetas[j]
-
-        # vectorized
-        idx = 3 * np.arange(n_pts, dtype="int")
-        row[0::3] = idx
-        row[1::3] = 1 + idx
-        row[2::3] = 2 + idx
-
-        col[0::3] = self.alpha_idx + idx
-        col[1::3] = self.beta_idx + idx
-        col[2::3] = self.beta_idx + idx
-
-        data[0::3] = 1.0
-        data[1::3] = self.sin_thetas
-        data[2::3] = self.cos_thetas
-
-        # derivative of the Cartesian points w.r.t the collapsed axi-symmetric points
-        self.dPtCdPtA = sparse.coo_matrix((data, (row, col)), shape=(3 * n_pts, 3 * n_pts)).tocsr()
+        thetas = np.arctan2(gamma.real, beta.real)
+
+        # only the rotation of each point is needed after the points are collapsed
+        self.cos_thetas = np.cos(thetas)
+        self.sin_thetas = np.sin(thetas)
 
         # points collapsed into the prescribed plane
         # self.c_pts_axi = np.vstack((self.alpha, self.radii, np.zeros(self.n_points))).T
@@ -114,9 +78,31 @@ class _AxiTransform:
             self.c_pts = np.empty((self.n_points, 3))
 
         self.c_pts[:, 0] = alpha
-        self.c_pts[:, self.beta_idx] = self.radii
+        self.c_pts[:, self.beta_idx] = radii
         self.c_pts[:, self.gamma_idx] = 0.0  # no need to store zeros
 
+    def expand_jacobian(self, c_JT):
+        """given the transposed jacobian of the collapsed points, returns the transposed jacobian
+        of the points in physical space. Each physical point only depends on its own collapsed point"""
+        c_JT = c_JT.tocoo()
+        pt = c_JT.col // 3
+        c_idx = c_JT.col % 3
+
+        # each collapsed coordinate maps to the physical coordinates that depend on it
+        alpha = c_idx == self.alpha_idx
+        beta = c_idx == self.beta_idx
+        row = np.concatenate((c_JT.row[alpha], c_JT.row[beta], c_JT.row[beta]))
+        col = np.concatenate((3 * pt[alpha], 3 * pt[beta] + 1, 3 * pt[beta] + 2))
+        data = np.concatenate(
+            (
+                c_JT.data[alpha],
+                self.sin_thetas[pt[beta]] * c_JT.data[beta],
+                self.cos_thetas[pt[beta]] * c_JT.data[beta],
+            )
+        )
+
+        return sparse.csr_matrix((data, (row, col)), shape=c_JT.shape)
+
     def expand(self, new_c_pts):
         """given new collapsed points, re-expands them into physical space"""
 
@@ -256,13 +242,17 @@ class DVGeometryAxi(DVGeometry):
 
     def computeTotalJacobian(self, ptSetName, config=None):
         """compute the total point jacobian in CSR format since we
-        need this for TACS"""
+        need this for TACS. The jacobian of the collapsed points is
+        expanded point by point, so JT is in the Cartesian frame"""
+        # a current jacobian is already expanded
+        if self._isJacobianCurrent(ptSetName, config):
+            return
 
         super().computeTotalJacobian(ptSetName, config)
+
         if self.JT[ptSetName] is not None:
             xform = self.axiTransforms[ptSetName]
-
-            self.JT[ptSetName] = xform.dPtCdPtA.dot(self.JT[ptSetName].T).T
+            self.JT[ptSetName] = xform.expand_jacobian(self.JT[ptSetName])
 
     # TODO JSG: the computeTotalJacobianFD method is broken in DVGeometry Base class
     # def computeTotalJacobianFD(self, ptSetName, config=None):
@@ -271,4 +261,4 @@ class DVGeometryAxi(DVGeometry):
 
     #     xform = self.axiTransforms[ptSetName]
 
-    #     self.JT[ptSetName] = xform.dPtCdPtA.dot(self.JT[ptSetName].T).T
+    #     self.JT[ptSetName] = xform.expand_jacobian(self.JT[ptSetName])
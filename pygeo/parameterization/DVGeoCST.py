@@ -6,9 +6,15 @@ DVGeo: CST Parameterisation
 @Description : A DVGeo implementation based on the Class-Shape Transformation method
 """
 
+# Standard Python modules
+import hashlib
+import os
+import tempfile
+
 # External modules
 from mpi4py import MPI
 import numpy as np
+from scipy.spatial import cKDTree
 from scipy.special import factorial
 
 try:
@@ -255,6 +261,15 @@ class DVGeometryCST(BaseDVGeometry):
         self.foil = Airfoil(coords)
         self.upperSpline, self.lowerSpline = self.foil.splitAirfoil()
 
+        # Sample the surface splines densely for a fast bound on the distance of points to them.
+        # The distance to the nearest sample overestimates the distance to the spline by at most
+        # the largest gap between samples.
+        self.splineSamples = {}
+        for surf, spline in [("upper", self.upperSpline), ("lower", self.lowerSpline)]:
+            samples = np.real(spline(np.linspace(0.0, 1.0, 2001)))
+            gap = np.max(np.linalg.norm(np.diff(samples, axis=0), axis=1))
+            self.splineSamples[surf] = (cKDTree(samples), gap)
+
         # Fit CST parameters to the airfoil's upper and lower surface
         chord = self.xMax - self.xMin
         self.defaultDV["chord"][0] = chord
@@ -297,7 +312,7 @@ class DVGeometryCST(BaseDVGeometry):
             # Broadcast the fit DV to the rest of the procs
             self.comm.Bcast([self.defaultDV[dvType], self.dtypeMPI])
 
-    def addPointSet(self, points, ptName, boundTol=1e-10, **kwargs):
+    def addPointSet(self, points, ptName, boundTol=1e-10, cacheDir=None, **kwargs):
         """
         Add a set of coordinates to DVGeometry.
         The is the main way that geometry in the form of a coordinate list is given to DVGeometry
@@ -318,6 +333,11 @@ class DVGeometryCST(BaseDVGeometry):
         boundTol : float, optional
             Small absolute deviation by which the airfoil coordinates can exceed the initial
             minimum and maximum x coordinates, by default 1e-10.
+        cacheDir : str, optional
+            Directory in which the split of the points into upper and lower surface points
+            is cached. The cache files are keyed by a hash of the points and the airfoil,
+            so adding the same point set again, for example on a restart, skips the
+            classification. By default no cache is used.
         \\*\\*kwargs
             Any other parameters are ignored.
         """
@@ -340,7 +360,25 @@ class DVGeometryCST(BaseDVGeometry):
         }
 
         # Determine which points are on the upper and lower surfaces
-        self.points[ptName]["upper"], self.points[ptName]["lower"] = self._splitUpperLower(points)
+        self.points[ptName]["upper"], self.points[ptName]["lower"] = self._splitUpperLowerCached(points, cacheDir)
+
+        # The normalized x coordinates of the points do not change when the chord is scaled,
+        # so the Bernstein basis of each surface only needs to be computed once
+        scaledX = (points[:, self.xIdx] - self.xMin) / (self.xMax - self.xMin)
+        self.points[ptName]["basis"] = {}
+        for surf in ["upper", "lower"]:
+            x = scaledX[self.points[ptName][surf]]
+            logX = np.zeros_like(x)
+            logX[x != 0.0] = np.log(x[x != 0.0])
+            log1mX = np.zeros_like(x)
+            log1mX[x != 1.0] = np.log(1.0 - x[x != 1.0])
+            self.points[ptName]["basis"][surf] = {
+                "x": x,
+                "S": self.computeShapeFunctions(x, np.ones(self.defaultDV[surf].size), dtype=self.dtype),
+                "logX": logX,
+                "log1mX": log1mX,
+                "classShapeKey": None,
+            }
 
         # If debug mode is on, plot the upper and lower surface points
         if self.debug:
@@ -601,11 +639,8 @@ class DVGeometryCST(BaseDVGeometry):
         # Unpack some useful variables
         desVars = self._unpackDVs()
         ptsX = self.points[ptSetName]["points"][:, self.xIdx]
-        xMax = self.points[ptSetName]["xMax"]
         xMin = self.points[ptSetName]["xMin"]
-        scaledX = (ptsX - xMin) / (xMax - xMin)
-        idxUpper = self.points[ptSetName]["upper"]
-        idxLower = self.points[ptSetName]["lower"]
+        idx = {surf: self.points[ptSetName][surf] for surf in ["upper", "lower"]}
         funcSens_local = {}
 
         # If dIdpt is a group of vectors, reorder the axes so it
@@ -614,82 +649,21 @@ class DVGeometryCST(BaseDVGeometry):
         if len(dim) == 3:
             dIdpt = np.moveaxis(dIdpt, 0, -1)
 
+        # Derivatives of the y coordinates of each surface wrt all the shape DV types at once
+        dydDV = {surf: self._computeSurfaceSens(ptSetName, surf, desVars) for surf in ["upper", "lower"]}
+
         for dvName, DV in self.DVs.items():
             dvType = DV.type
 
-            if dvType == "upper":
-                dydUpperCST = self.computeCSTdydw(
-                    scaledX[idxUpper], desVars["n1_upper"], desVars["n2_upper"], desVars["upper"], dtype=self.dtype
-                )
-                dydUpperCST *= desVars["chord"]
-                funcSens_local[dvName] = dydUpperCST @ dIdpt[idxUpper, self.yIdx]
-            elif dvType == "lower":
-                dydLowerCST = self.computeCSTdydw(
-                    scaledX[idxLower], desVars["n1_lower"], desVars["n2_lower"], desVars["lower"], dtype=self.dtype
-                )
-                dydLowerCST *= desVars["chord"]
-                funcSens_local[dvName] = dydLowerCST @ dIdpt[idxLower, self.yIdx]
-            elif dvType == "n1_upper":
-                funcSens_local[dvName] = (
-                    desVars["chord"]
-                    * self.computeCSTdydN1(
-                        scaledX[idxUpper], desVars["n1_upper"], desVars["n2_upper"], desVars["upper"], dtype=self.dtype
-                    )
-                    @ dIdpt[idxUpper, self.yIdx]
-                )
-            elif dvType == "n2_upper":
-                funcSens_local[dvName] = (
-                    desVars["chord"]
-                    * self.computeCSTdydN2(
-                        scaledX[idxUpper], desVars["n1_upper"], desVars["n2_upper"], desVars["upper"], dtype=self.dtype
-                    )
-                    @ dIdpt[idxUpper, self.yIdx]
-                )
-            elif dvType == "n1_lower":
-                funcSens_local[dvName] = (
-                    desVars["chord"]
-                    * self.computeCSTdydN1(
-                        scaledX[idxLower], desVars["n1_lower"], desVars["n2_lower"], desVars["lower"], dtype=self.dtype
-                    )
-                    @ dIdpt[idxLower, self.yIdx]
-                )
-            elif dvType == "n2_lower":
-                funcSens_local[dvName] = (
-                    desVars["chord"]
-                    * self.computeCSTdydN2(
-                        scaledX[idxLower], desVars["n1_lower"], desVars["n2_lower"], desVars["lower"], dtype=self.dtype
-                    )
-                    @ dIdpt[idxLower, self.yIdx]
-                )
-            elif dvType == "n1":
-                funcSens_local[dvName] = (
-                    desVars["chord"]
-                    * self.computeCSTdydN1(
-                        scaledX[idxUpper], desVars["n1_upper"], desVars["n2_upper"], desVars["upper"], dtype=self.dtype
-                    )
-                    @ dIdpt[idxUpper, self.yIdx]
-                )
-                funcSens_local[dvName] += (
-                    desVars["chord"]
-                    * self.computeCSTdydN1(
-                        scaledX[idxLower], desVars["n1_lower"], desVars["n2_lower"], desVars["lower"], dtype=self.dtype
-                    )
-                    @ dIdpt[idxLower, self.yIdx]
-                )
-            elif dvType == "n2":
+            if dvType in ["upper", "lower"]:
+                funcSens_local[dvName] = dydDV[dvType]["w"] @ dIdpt[idx[dvType], self.yIdx]
+            elif dvType in ["n1_upper", "n2_upper", "n1_lower", "n2_lower"]:
+                param, surf = dvType.split("_")
+                funcSens_local[dvName] = dydDV[surf][param] @ dIdpt[idx[surf], self.yIdx]
+            elif dvType in ["n1", "n2"]:
                 funcSens_local[dvName] = (
-                    desVars["chord"]
-                    * self.computeCSTdydN2(
-                        scaledX[idxUpper], desVars["n1_upper"], desVars["n2_upper"], desVars["upper"], dtype=self.dtype
-                    )
-                    @ dIdpt[idxUpper, self.yIdx]
-                )
-                funcSens_local[dvName] += (
-                    desVars["chord"]
-                    * self.computeCSTdydN2(
-                        scaledX[idxLower], desVars["n1_lower"], desVars["n2_lower"], desVars["lower"], dtype=self.dtype
-                    )
-                    @ dIdpt[idxLower, self.yIdx]
+                    dydDV["upper"][dvType] @ dIdpt[idx["upper"], self.yIdx]
+                    + dydDV["lower"][dvType] @ dIdpt[idx["lower"], self.yIdx]
                 )
             else:  # chord
                 dydchord = self.points[ptSetName]["points"][:, self.yIdx] / desVars["chord"]
@@ -736,64 +710,25 @@ class DVGeometryCST(BaseDVGeometry):
         # Unpack some useful variables
         desVars = self._unpackDVs()
         ptsX = self.points[ptSetName]["points"][:, self.xIdx]
-        xMax = self.points[ptSetName]["xMax"]
         xMin = self.points[ptSetName]["xMin"]
-        scaledX = (ptsX - xMin) / (xMax - xMin)
-        idxUpper = self.points[ptSetName]["upper"]
-        idxLower = self.points[ptSetName]["lower"]
-        idxTE = np.full((self.points[ptSetName]["points"].shape[0],), True, dtype=bool)
-        idxTE[idxUpper] = False
-        idxTE[idxLower] = False
+        idx = {surf: self.points[ptSetName][surf] for surf in ["upper", "lower"]}
         xsdot = np.zeros_like(self.points[ptSetName]["points"], dtype=self.dtype)
 
+        # Derivatives of the y coordinates of each surface wrt all the shape DV types at once
+        dydDV = {surf: self._computeSurfaceSens(ptSetName, surf, desVars) for surf in ["upper", "lower"]}
+
         for dvName, dvSeed in vec.items():
             dvType = self.DVs[dvName].type
 
-            if dvType == "upper":
-                dydUpperCST = self.computeCSTdydw(
-                    scaledX[idxUpper], desVars["n1_upper"], desVars["n2_upper"], desVars["upper"], dtype=self.dtype
-                )
-                dydUpperCST *= desVars["chord"]
-                xsdot[idxUpper, self.yIdx] += dydUpperCST.T @ dvSeed
-            if dvType == "lower":
-                dydLowerCST = self.computeCSTdydw(
-                    scaledX[idxLower], desVars["n1_lower"], desVars["n2_lower"], desVars["lower"], dtype=self.dtype
-                )
-                dydLowerCST *= desVars["chord"]
-                xsdot[idxLower, self.yIdx] += dydLowerCST.T @ dvSeed
-            if dvType == "n1_upper" or dvType == "n1":
-                xsdot[idxUpper, self.yIdx] += (
-                    dvSeed
-                    * desVars["chord"]
-                    * self.computeCSTdydN1(
-                        scaledX[idxUpper], desVars["n1_upper"], desVars["n2_upper"], desVars["upper"], dtype=self.dtype
-                    )
-                )
-            if dvType == "n2_upper" or dvType == "n2":
-                xsdot[idxUpper, self.yIdx] += (
-                    dvSeed
-                    * desVars["chord"]
-                    * self.computeCSTdydN2(
-                        scaledX[idxUpper], desVars["n1_upper"], desVars["n2_upper"], desVars["upper"], dtype=self.dtype
-                    )
-                )
-            if dvType == "n1_lower" or dvType == "n1":
-                xsdot[idxLower, self.yIdx] += (
-                    dvSeed
-                    * desVars["chord"]
-                    * self.computeCSTdydN1(
-                        scaledX[idxLower], desVars["n1_lower"], desVars["n2_lower"], desVars["lower"], dtype=self.dtype
-                    )
-                )
-            if dvType == "n2_lower" or dvType == "n2":
-                xsdot[idxLower, self.yIdx] += (
-                    dvSeed
-                    * desVars["chord"]
-                    * self.computeCSTdydN2(
-                        scaledX[idxLower], desVars["n1_lower"], desVars["n2_lower"], desVars["lower"], dtype=self.dtype
-                    )
-                )
-            if dvType == "chord":
+            if dvType in ["upper", "lower"]:
+                xsdot[idx[dvType], self.yIdx] += dydDV[dvType]["w"].T @ dvSeed
+            elif dvType in ["n1_upper", "n2_upper", "n1_lower", "n2_lower"]:
+                param, surf = dvType.split("_")
+                xsdot[idx[surf], self.yIdx] += dvSeed * dydDV[surf][param]
+            elif dvType in ["n1", "n2"]:
+                for surf in ["upper", "lower"]:
+                    xsdot[idx[surf], self.yIdx] += dvSeed * dydDV[surf][dvType]
+            elif dvType == "chord":
                 dydchord = self.points[ptSetName]["points"][:, self.yIdx] / desVars["chord"]
                 dxdchord = (ptsX - xMin) / desVars["chord"]
                 xsdot[:, self.yIdx] += dvSeed * dydchord
@@ -850,36 +785,20 @@ class DVGeometryCST(BaseDVGeometry):
         idxTE[idxUpper] = False
         idxTE[idxLower] = False
         points = self.points[ptSetName]["points"]
-        ptsX = points[:, self.xIdx]
         ptsY = points[:, self.yIdx]
         xMax = self.points[ptSetName]["xMax"]
         xMin = self.points[ptSetName]["xMin"]
         yUpperTE = self.points[ptSetName]["yUpperTE"]
         yLowerTE = self.points[ptSetName]["yLowerTE"]
 
-        # Scale the airfoil to the range 0 to 1 in x direction
+        # Scale the trailing edge to the range 0 to 1 in x direction
         shift = xMin
         chord = xMax - xMin
-        scaledX = (ptsX - shift) / chord
-        scaledYUpperTE = yUpperTE / chord
-        scaledYLowerTE = yLowerTE / chord
-
-        ptsY[idxUpper] = desVars["chord"] * self.computeCSTCoordinates(
-            scaledX[idxUpper],
-            desVars["n1_upper"],
-            desVars["n2_upper"],
-            desVars["upper"],
-            scaledYUpperTE,
-            dtype=self.dtype,
-        )
-        ptsY[idxLower] = desVars["chord"] * self.computeCSTCoordinates(
-            scaledX[idxLower],
-            desVars["n1_lower"],
-            desVars["n2_lower"],
-            desVars["lower"],
-            scaledYLowerTE,
-            dtype=self.dtype,
-        )
+        scaledYTE = {"upper": yUpperTE / chord, "lower": yLowerTE / chord}
+
+        for surf, idx in [("upper", idxUpper), ("lower", idxLower)]:
+            basis = self._getBasis(ptSetName, surf, desVars)
+            ptsY[idx] = desVars["chord"] * (basis["C"] * (desVars[surf] @ basis["S"]) + scaledYTE[surf] * basis["x"])
         ptsY[idxTE] *= desVars["chord"] / chord
 
         # Scale the chord according to the chord DV
@@ -956,11 +875,75 @@ class DVGeometryCST(BaseDVGeometry):
 
         return desVars
 
+    def _getBasis(self, ptSetName, surf, desVars):
+        """
+        Return the cached basis of the points of a point set on one surface.
+        The Bernstein basis is computed when the point set is added and the
+        class shape is only recomputed when N1 or N2 change.
+
+        Parameters
+        ----------
+        ptSetName : str
+            Name of the point set
+        surf : str
+            Either ``"upper"`` or ``"lower"``
+        desVars : dict
+            Airfoil shape parameters from :meth:`_unpackDVs`
+
+        Returns
+        -------
+        basis : dict
+            Dictionary with the normalized x coordinates ``"x"``, the Bernstein
+            basis ``"S"``, the class shape ``"C"``, their product ``"CS"``, and the
+            logarithms ``"logX"`` and ``"log1mX"`` used in the class shape derivatives
+        """
+        basis = self.points[ptSetName]["basis"][surf]
+        N1 = desVars[f"n1_{surf}"]
+        N2 = desVars[f"n2_{surf}"]
+        key = (N1.tobytes(), N2.tobytes())
+        if basis["classShapeKey"] != key:
+            basis["C"] = self.computeClassShape(basis["x"], N1, N2, dtype=self.dtype)
+            basis["CS"] = basis["C"] * basis["S"]
+            basis["classShapeKey"] = key
+
+        return basis
+
+    def _computeSurfaceSens(self, ptSetName, surf, desVars):
+        """
+        Compute the derivatives of the y coordinates of the points on one
+        surface with respect to the CST coefficients and the class shape
+        parameters of that surface.
+
+        Parameters
+        ----------
+        ptSetName : str
+            Name of the point set
+        surf : str
+            Either ``"upper"`` or ``"lower"``
+        desVars : dict
+            Airfoil shape parameters from :meth:`_unpackDVs`
+
+        Returns
+        -------
+        dydDV : dict
+            Dictionary with the derivatives wrt the CST coefficients ``"w"``
+            of size (# coeff, # pts), and wrt N1 ``"n1"`` and N2 ``"n2"`` of size (# pts,)
+        """
+        basis = self._getBasis(ptSetName, surf, desVars)
+        chord = desVars["chord"]
+        CSum = basis["C"] * (desVars[surf] @ basis["S"])
+
+        return {
+            "w": chord * basis["CS"],
+            "n1": chord * CSum * basis["logX"],
+            "n2": chord * CSum * basis["log1mX"],
+        }
+
     def _splitUpperLower(self, points):
         """
         Figure out the indices of points on the upper and lower
         surfaces of the airfoil. This requires that the attributes
-        self.xMax, self.lowerSpline, self.upperSpline, self.xIdx,
+        self.xMax, self.lowerSpline, self.upperSpline, self.splineSamples, self.xIdx,
         and self.yIdx have already been set.
 
         Parameters
@@ -977,30 +960,94 @@ class DVGeometryCST(BaseDVGeometry):
         """
         # Determine which surface (either upper, lower, or trailing edge) each point is
         # on based on which spline it is closest to
-        # Upper (if it's complex, ignore the imaginary part since the spline doesn't handle that)
-        _, upperDist = self.upperSpline.projectPoint(np.real(points[:, [self.xIdx, self.yIdx]]))
-        upperDist = np.linalg.norm(upperDist, axis=1)
-        # Lower
-        _, lowerDist = self.lowerSpline.projectPoint(np.real(points[:, [self.xIdx, self.yIdx]]))
-        lowerDist = np.linalg.norm(lowerDist, axis=1)
+        # (if it's complex, ignore the imaginary part since the spline doesn't handle that)
+        xy = np.real(points[:, [self.xIdx, self.yIdx]])
+
         # Trailing edge
-        teDist = np.full_like(upperDist, np.inf)
+        teDist = np.full(xy.shape[0], np.inf)
         if not self.sharp:
-            x0 = points[:, self.xIdx]
-            y0 = points[:, self.yIdx]
+            x0 = xy[:, 0]
+            y0 = xy[:, 1]
             x1 = self.coordLowerTE[self.xIdx]
             y1 = self.coordLowerTE[self.yIdx]
             x2 = self.coordUpperTE[self.xIdx]
             y2 = self.coordUpperTE[self.yIdx]
             teDist = np.abs((x2 - x1) * (y1 - y0) - (x1 - x0) * (y2 - y1)) / np.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
 
+        # Bound the distances to the upper and lower splines with the distances to their samples
+        upperDist, _ = self.splineSamples["upper"][0].query(xy)
+        lowerDist, _ = self.splineSamples["lower"][0].query(xy)
+        upperMin = upperDist - self.splineSamples["upper"][1]
+        lowerMin = lowerDist - self.splineSamples["lower"][1]
+
         # Determine if each point is on the upper surface if it's closer to the upper spline than
-        # either the lower spline or the trailing edge line (and do the same for the lower surface)
-        upperBool = np.logical_and(upperDist <= lowerDist, upperDist <= teDist)
-        lowerBool = np.logical_and(lowerDist < upperDist, lowerDist <= teDist)
+        # either the lower spline or the trailing edge line (and do the same for the lower surface).
+        # Most points are decided by the bounds alone.
+        upperBool = np.logical_and(upperDist <= lowerMin, upperDist <= teDist)
+        lowerBool = np.logical_and(lowerDist < upperMin, lowerDist <= teDist)
+        teBool = np.logical_and(teDist < upperMin, teDist < lowerMin)
+
+        # Project the remaining points onto the splines to find the exact distances
+        unsure = np.where(~(upperBool | lowerBool | teBool))[0]
+        if len(unsure) > 0:
+            _, upperDist = self.upperSpline.projectPoint(xy[unsure])
+            upperDist = np.linalg.norm(upperDist, axis=1)
+            _, lowerDist = self.lowerSpline.projectPoint(xy[unsure])
+            lowerDist = np.linalg.norm(lowerDist, axis=1)
+            upperBool[unsure] = np.logical_and(upperDist <= lowerDist, upperDist <= teDist[unsure])
+            lowerBool[unsure] = np.logical_and(lowerDist < upperDist, lowerDist <= teDist[unsure])
 
         return np.where(upperBool)[0], np.where(lowerBool)[0]
 
+    def _splitUpperLowerCached(self, points, cacheDir=None):
+        """
+        Split the points into upper and lower surface points with
+        :meth:`_splitUpperLower`, reusing the result stored in cacheDir
+        if the same points were split before for the same airfoil.
+
+        Parameters
+        ----------
+        points : ndarray (Npts x 3)
+            Point array to separate upper and lower surfaces
+        cacheDir : str, optional
+            Directory of the cache files. If None, no cache is used.
+
+        Returns
+        -------
+        ndarray (1D)
+            Indices of upper surface points (correspond to rows in points)
+        ndarray (1D)
+            Indices of lower surface points (correspond to rows in points)
+        """
+        if cacheDir is None:
+            return self._splitUpperLower(points)
+
+        # The split depends on the point coordinates, the airfoil, and the axis indices
+        sha = hashlib.sha256()
+        sha.update(np.ascontiguousarray(np.real(points[:, [self.xIdx, self.yIdx]]), dtype="d").tobytes())
+        sha.update(np.ascontiguousarray(np.real(self.foilCoords), dtype="d").tobytes())
+        sha.update(np.array([self.xIdx, self.yIdx, self.sharp], dtype="intc").tobytes())
+        fileName = os.path.join(cacheDir, f"cst_split_{sha.hexdigest()}.npz")
+
+        if os.path.isfile(fileName):
+            with np.load(fileName) as data:
+                return data["upper"], data["lower"]
+
+        idxUpper, idxLower = self._splitUpperLower(points)
+        # Several procs or runs may share the cache directory, so the file is written
+        # under a temporary name and moved into place in one step
+        os.makedirs(cacheDir, exist_ok=True)
+        fd, tmpName = tempfile.mkstemp(dir=cacheDir, suffix=".npz.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, upper=idxUpper, lower=idxLower)
+            os.replace(tmpName, fileName)
+        except BaseException:
+            os.remove(tmpName)
+            raise
+
+        return idxUpper, idxLower
+
     @staticmethod
     def computeCSTCoordinates(x, N1, N2, w, yte, dtype=float):
         """
@@ -1087,12 +1134,12 @@ class DVGeometryCST(BaseDVGeometry):
         """
         numCoeffs = len(w)
         order = numCoeffs - 1
-        S = np.zeros((numCoeffs, len(x)), dtype=dtype)
-        facts = factorial(np.arange(0, order + 1))
-        for i in range(numCoeffs):
-            binom = facts[-1] / (facts[i] * facts[order - i])
-            S[i] = w[i] * binom * x ** (i) * (1.0 - x) ** (order - i)
-        return S
+        i = np.arange(0, order + 1)
+        facts = factorial(i)
+        binom = facts[-1] / (facts * facts[::-1])
+        x = np.asarray(x, dtype=dtype)
+        S = (np.asarray(w) * binom)[:, np.newaxis] * x ** i[:, np.newaxis] * (1.0 - x) ** (order - i)[:, np.newaxis]
+        return S.astype(dtype, copy=False)
 
     @staticmethod
     def computeCSTdydw(x, N1, N2, w, dtype=float):
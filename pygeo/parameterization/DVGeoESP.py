@@ -785,7 +785,7 @@ class DVGeometryESP(DVGeoSketch):
         tmp = dIdpt.T
 
         # we also stack the pointset jacobian
-        jac = self.pointSets[ptSetName].jac.copy()
+        jac = self.pointSets[ptSetName].jac
 
         dIdxT_local = jac.T.dot(tmp)
         dIdx_local = dIdxT_local.T
@@ -1278,8 +1278,6 @@ class DVGeometryESP(DVGeoSketch):
         any_ptset_nondistributed = False
         any_ptset_distributed = False
         for ptSetName in self.pointSets:
-            # initialize the Jacobians
-            self.pointSets[ptSetName].jac = np.zeros((3 * self.pointSets[ptSetName].nPts, nDV))
             if self.pointSets[ptSetName].distributed:
                 any_ptset_distributed = True
             else:
@@ -1304,17 +1302,15 @@ class DVGeometryESP(DVGeoSketch):
             # need to get ALL the coordinates from every proc on every proc to do the parallel FD
             if self.maxproc is not None:
                 raise ValueError("Max processor limit is not usable with distributed pointsets")
-            # now figure out which proc has how many points.
-            sizes = np.array(self.comm.allgather(len(ul)), dtype="intc")
-            # displacements for allgather
-            disp = np.array([np.sum(sizes[:i]) for i in range(nproc)], dtype="intc")
-            # global number of points
-            nptsg = np.sum(sizes)
             ug, vg, tg, faceIDg, bodyIDg, edgeIDg, uvlimitsg, tlimitsg, sizes = self._allgatherCoordinates(
                 ul, vl, tl, faceIDl, bodyIDl, edgeIDl, uvlimitsl, tlimitsl
             )
+            # global number of points
+            nptsg = np.sum(sizes)
         else:
+            # every proc has all the points
             nptsg = len(ul)
+            sizes = np.full(self.comm.size, nptsg, dtype="intc")
             ug = ul
             vg = vl
             tg = tl
@@ -1323,82 +1319,22 @@ class DVGeometryESP(DVGeoSketch):
             edgeIDg = edgeIDl
             uvlimitsg = uvlimitsl
             tlimitsg = tlimitsl
-        # create a local new point array. We will use this to get the new
-        # coordinates as we perturb DVs. We just need one (instead of nDV times the size)
-        # because we get the new points, calculate the jacobian and save it right after
-        ptsNewL = np.zeros(len(ul) * 3)
 
         # we now have all the point info on all procs.
         tcomm += time.time() - t1
 
+        if not fd:
+            raise NotImplementedError("ESP analytic derivatives are not implemented")
+
         # We need to evaluate all the points on respective procs for FD computations
+        pts0 = None
 
-        # determine how many DVs this proc will perturb.
-        n = 0
-        for iDV in range(self.getNDV()):
-            # I have to do this one.
-            if iDV % nproc == rank:
-                n += 1
-        if fd:
-            # evaluate all the points
-            pts0 = self._evaluatePoints(ug, vg, tg, uvlimitsg, tlimitsg, bodyIDg, faceIDg, edgeIDg, nptsg)
-            # allocate the approriate sized numpy array for the perturbed points
-            ptsNew = np.zeros((n, nptsg, 3))
-
-            # perturb the DVs on different procs and compute the new point coordinates.
-            i = 0  # Counter on local Jac
-
-            for iDV in range(self.getNDV()):
-                # I have to do this one.
-                if iDV % nproc == rank:
-                    # Get the DV object for this variable
-                    dvName = self.globalDVList[iDV][0]
-                    dvLocalIndex = self.globalDVList[iDV][1]
-                    dvObj = self.DVs[dvName]
-                    # Step size for this particular DV
-                    dh = dvObj.dh
-
-                    # Perturb the DV
-                    dvSave = dvObj.value.copy()
-                    dvObj.value[dvLocalIndex] += dh
-
-                    # update the esp model
-                    t11 = time.time()
-                    self._updateModel()
-                    t12 = time.time()
-                    tesp += t12 - t11
-
-                    t11 = time.time()
-                    # evaluate the points
-
-                    ptsNew[i, :, :] = self._evaluatePoints(
-                        ug, vg, tg, uvlimitsg, tlimitsg, bodyIDg, faceIDg, edgeIDg, nptsg
-                    )
-                    t12 = time.time()
-                    teval += t12 - t11
-                    # now we can calculate the jac and put it back in ptsNew
-                    ptsNew[i, :, :] = (ptsNew[i, :, :] - pts0[:, :]) / dh
-
-                    # Reset the DV
-                    dvObj.value = dvSave.copy()
-
-                    # increment the counter
-                    i += 1
-
-            # Now, we have perturbed points on each proc that perturbed a DV
-
-            # reset the model.
-            t11 = time.time()
-            self._updateModel()
-            t12 = time.time()
-            tesp += t12 - t11
+        def computeColumn(iDV):
+            nonlocal pts0, tesp, teval
+            # evaluate the baseline points once, only on the procs that perturb DVs
+            if pts0 is None:
+                pts0 = self._evaluatePoints(ug, vg, tg, uvlimitsg, tlimitsg, bodyIDg, faceIDg, edgeIDg, nptsg)
 
-        else:
-            raise NotImplementedError("ESP analytic derivatives are not implemented")
-
-        ii = 0
-        # loop over the DVs and scatter the perturbed points to original procs
-        for iDV in range(self.getNDV()):
             # Get the DV object for this variable
             dvName = self.globalDVList[iDV][0]
             dvLocalIndex = self.globalDVList[iDV][1]
@@ -1406,51 +1342,59 @@ class DVGeometryESP(DVGeoSketch):
             # Step size for this particular DV
             dh = dvObj.dh
 
-            t11 = time.time()
-            root_proc = iDV % nproc
-            if any_ptset_distributed:
-                # create the send/recv buffers for the scatter
-                if root_proc == rank:
-                    sendbuf = [ptsNew[ii, :, :].flatten(), sizes * 3, disp * 3, MPI.DOUBLE]
-                else:
-                    sendbuf = [np.zeros((0, 3)), sizes * 3, disp * 3, MPI.DOUBLE]
-                recvbuf = [ptsNewL, MPI.DOUBLE]
-                # scatter the info from the proc that perturbed this DV to all procs
-                self.comm.Scatterv(sendbuf, recvbuf, root=root_proc)
-            else:
-                # create the send/recv buffers for the bcast
-                if root_proc == rank:
-                    bcastbuf = [ptsNew[ii, :, :].flatten(), MPI.DOUBLE]
-                    ptsNewL[:] = ptsNew[ii, :, :].flatten()
-                else:
-                    bcastbuf = [ptsNewL, MPI.DOUBLE]
-                # bcast the info from the proc that perturbed this DV to all procs
-                self.comm.Bcast(bcastbuf, root=root_proc)
-                self.comm.Barrier()
+            # Perturb the DV
+            dvSave = dvObj.value.copy()
+            dvObj.value[dvLocalIndex] += dh
 
+            # update the esp model
+            t11 = time.time()
+            self._updateModel()
             t12 = time.time()
-            tcomm += t12 - t11
+            tesp += t12 - t11
 
-            # calculate the jacobian here for the pointsets
-            offset = 0
-            for ptSet in self.pointSets:
-                # number of points in this pointset
-                nPts = self.pointSets[ptSet].nPts
+            # evaluate the points
+            ptsNew = self._evaluatePoints(ug, vg, tg, uvlimitsg, tlimitsg, bodyIDg, faceIDg, edgeIDg, nptsg)
+            teval += time.time() - t12
+
+            # Reset the DV
+            dvObj.value = dvSave.copy()
+
+            return (ptsNew - pts0) / dh
+
+        # perturb the DVs on different procs and exchange the columns of the jacobian
+        dvValues = [(self.DVs[dvName].value[i], self.DVs[dvName].dh) for dvName, i in self.globalDVList]
+        key = b"".join(a.tobytes() for a in (ug, vg, tg, faceIDg, bodyIDg, edgeIDg))
+        jac = self.fdScheduler.computeJacobian(
+            nDV,
+            computeColumn,
+            sizes,
+            distributed=any_ptset_distributed,
+            nWorker=nproc,
+            dvValues=dvValues,
+            key=key,
+        )
+        tcomm += self.fdScheduler.tComm
 
-                # indices to extract correct points from the long pointset array
-                ibeg = offset * 3
-                iend = ibeg + nPts * 3
+        # reset the model.
+        t11 = time.time()
+        self._updateModel()
+        t12 = time.time()
+        tesp += t12 - t11
+
+        # split the jacobian into the pointsets
+        offset = 0
+        for ptSet in self.pointSets:
+            # number of points in this pointset
+            nPts = self.pointSets[ptSet].nPts
 
-                # ptsNewL has the jacobian itself...
-                self.pointSets[ptSet].jac[:, iDV] = ptsNewL[ibeg:iend].copy()
+            # indices to extract correct points from the long pointset array
+            ibeg = offset * 3
+            iend = ibeg + nPts * 3
 
-                # increment the offset
-                offset += nPts
+            self.pointSets[ptSet].jac = jac[ibeg:iend]
 
-            # pertrub the local counter on this proc.
-            # This loops over the DVs that this proc perturbed
-            if iDV % nproc == rank:
-                ii += 1
+            # increment the offset
+            offset += nPts
 
         t2 = time.time()
         if rank == 0:
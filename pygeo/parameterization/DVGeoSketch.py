@@ -18,6 +18,7 @@ from pyspline.utils import closeTecplot, openTecplot, writeTecplot1D
 # Local modules
 from .BaseDVGeo import BaseDVGeometry
 from .designVars import geoDVComposite
+from .fdScheduler import ParallelFDScheduler
 
 
 class DVGeoSketch(BaseDVGeometry):
@@ -45,7 +46,8 @@ class DVGeoSketch(BaseDVGeometry):
 
     5. Because of limitations with ESP and OpenVSP, this class
     uses parallel finite differencing to obtain the required Jacobian
-    matrices.
+    matrices. The DVs are handed out to the procs by ``self.fdScheduler``,
+    see :class:`.ParallelFDScheduler` for its options.
 
     Parameters
     ----------
@@ -76,13 +78,18 @@ class DVGeoSketch(BaseDVGeometry):
         self.updatedJac = {}
         self.comm = comm
 
+        # scheduler of the parallel finite difference jacobians
+        self.fdScheduler = ParallelFDScheduler(comm)
+
         # Initial list of DVs
         self.DVs = OrderedDict()
 
-    def addCompositeDV(self, dvName, ptSetName=None, u=None, scale=None, comm=None):
+    def addCompositeDV(self, dvName, ptSetName=None, u=None, scale=None, comm=None, nModes=None):
         """
-        Add composite DVs. Note that this is essentially a preprocessing call which only works in serial
-        at the moment.
+        Add composite DVs. Note that this is essentially a preprocessing call.
+        If the composite DVs are computed from a point set, the singular
+        value decomposition of the point set Jacobian is obtained from its
+        (nDV, nDV) Gram matrix, so the point set can be distributed.
 
         Parameters
         ----------
@@ -94,6 +101,13 @@ class DVGeoSketch(BaseDVGeometry):
             The u matrix used for the composite DV, by default None
         scale : float or ndarray, optional
             The scaling applied to this DV, by default None
+        comm : MPI communicator, optional
+            The communicator over which the point set is distributed. If
+            given, the Gram matrix is summed over all procs.
+        nModes : int, optional
+            Number of composite DVs to keep when they are computed from a
+            point set. Only the modes with the largest singular values are
+            kept. By default there is one composite DV per DV.
         """
         NDV = self.getNDV()
 
@@ -110,20 +124,18 @@ class DVGeoSketch(BaseDVGeometry):
             if not self.updatedJac[ptSetName]:
                 self._computeSurfJacobian()
 
-            J_full = self.pointSets[ptSetName].jac
-
-            u, s, _ = np.linalg.svd(J_full.T, full_matrices=False)
-
-            scale = np.sqrt(s)
-            # normalize the scaling
-            scale = scale * (NDV / np.sum(scale))
+            jac = self.pointSets[ptSetName].jac
+            gram = (jac.T @ jac).toarray()
+            if comm:
+                gram = comm.allreduce(gram, op=MPI.SUM)
+            u, s, scale = self._computeCompositeBasis(gram, nModes)
 
         # map the initial design variable values
         # we do this manually instead of calling self.mapVecToComp
         # because self.DVComposite.u isn't available yet
         values = u.T @ self.convertDictToSensitivity(self.getValues())
 
-        self.DVComposite = geoDVComposite(dvName, values, NDV, u, scale=scale, s=s)
+        self.DVComposite = geoDVComposite(dvName, values, u.shape[1], u, scale=scale, s=s)
 
         self.useComposite = True
 
@@ -628,7 +628,7 @@ class DVGeometryVSP(DVGeoSketch):
         # reshape the dIdpt array from [N] * [nPt] * [3] to  [N] * [nPt*3]
         dIdpt = dIdpt.reshape((dIdpt.shape[0], dIdpt.shape[1] * 3))
 
-        jac = self.pointSets[ptSetName].jac.copy()
+        jac = self.pointSets[ptSetName].jac
         dIdxT_local = jac.T.dot(dIdpt.T)
         dIdx_local = dIdxT_local.T
 
@@ -927,9 +927,6 @@ class DVGeometryVSP(DVGeoSketch):
         gl = np.zeros(0, dtype="intc")
 
         for ptSetName in self.pointSets:
-            # initialize the Jacobians
-            self.pointSets[ptSetName].jac = np.zeros((3 * self.pointSets[ptSetName].nPts, nDV))
-
             # first, we need to vstack all the point set info we have
             # counts of these are also important, saved in ptSet.nPts
             rl = np.concatenate((rl, self.pointSets[ptSetName].r))
@@ -943,10 +940,6 @@ class DVGeometryVSP(DVGeoSketch):
         disp = np.array([np.sum(sizes[:i]) for i in range(nproc)], dtype="intc")
         # global number of points
         nptsg = np.sum(sizes)
-        # create a local new point array. We will use this to get the new
-        # coordinates as we perturb DVs. We just need one (instead of nDV times the size)
-        # because we get the new points, calculate the jacobian and save it right after
-        ptsNewL = np.zeros(len(rl) * 3)
 
         # create the arrays to receive the global info
         rg = np.zeros(nptsg)
@@ -964,116 +957,73 @@ class DVGeometryVSP(DVGeoSketch):
         tcomm += time.time() - t1
 
         # We need to evaluate all the points on respective procs for FD computations
+        def evaluatePoints():
+            pts = np.zeros((nptsg, 3))
+            for j in range(nptsg):
+                pnt = self.vspModel.CompPntRST(self.allComps[gg[j]], 0, rg[j], sg[j], tg[j])
+                pts[j, :] = (pnt.x(), pnt.y(), pnt.z())
+            return pts
 
-        # allocate memory
-        pts0 = np.zeros((nptsg, 3))
-
-        # evaluate the points
-        for j in range(nptsg):
-            pnt = self.vspModel.CompPntRST(self.allComps[gg[j]], 0, rg[j], sg[j], tg[j])
-            pts0[j, :] = (pnt.x(), pnt.y(), pnt.z())
-
-        # determine how many DVs this proc will perturb.
-        n = 0
-        for iDV in range(len(dvKeys)):
-            # I have to do this one.
-            if iDV % nproc == rank:
-                n += 1
-
-        # allocate the approriate sized numpy array for the perturbed points
-        ptsNew = np.zeros((n, nptsg, 3))
-
-        # perturb the DVs on different procs and compute the new point coordinates.
-        i = 0  # Counter on local Jac
-
-        for iDV in range(len(dvKeys)):
-            # I have to do this one.
-            if iDV % nproc == rank:
-                # Step size for this particular DV
-                dh = self.DVs[dvKeys[iDV]].dh
-
-                # Perturb the DV
-                dvSave = self.DVs[dvKeys[iDV]].value.copy()
-                self.DVs[dvKeys[iDV]].value += dh
-
-                # update the vsp model
-                t11 = time.time()
-                self._updateModel()
-                t12 = time.time()
-                tvsp += t12 - t11
-
-                t11 = time.time()
-                # evaluate the points
-                for j in range(nptsg):
-                    pnt = self.vspModel.CompPntRST(self.allComps[gg[j]], 0, rg[j], sg[j], tg[j])
-                    ptsNew[i, j, :] = (pnt.x(), pnt.y(), pnt.z())
-                t12 = time.time()
-                teval += t12 - t11
-
-                # now we can calculate the jac and put it back in ptsNew
-                ptsNew[i, :, :] = (ptsNew[i, :, :] - pts0[:, :]) / dh
-
-                # Reset the DV
-                self.DVs[dvKeys[iDV]].value = dvSave.copy()
-
-                # increment the counter
-                i += 1
-
-        # scale the points
-        ptsNew *= self.modelScale
+        pts0 = None
 
-        # Now, we have perturbed points on each proc that perturbed a DV
+        def computeColumn(iDV):
+            nonlocal pts0, tvsp, teval
+            # evaluate the baseline points once, only on the procs that perturb DVs
+            if pts0 is None:
+                pts0 = evaluatePoints()
 
-        # reset the model.
-        t11 = time.time()
-        self._updateModel()
-        t12 = time.time()
-        tvsp += t12 - t11
-
-        ii = 0
-        # loop over the DVs and scatter the perturbed points to original procs
-        for iDV in range(len(dvKeys)):
             # Step size for this particular DV
             dh = self.DVs[dvKeys[iDV]].dh
 
+            # Perturb the DV
+            dvSave = self.DVs[dvKeys[iDV]].value.copy()
+            self.DVs[dvKeys[iDV]].value += dh
+
+            # update the vsp model
             t11 = time.time()
-            # create the send/recv buffers for the scatter
-            if iDV % nproc == rank:
-                sendbuf = [ptsNew[ii, :, :].flatten(), sizes * 3, disp * 3, MPI.DOUBLE]
-            else:
-                sendbuf = [np.zeros((0, 3)), sizes * 3, disp * 3, MPI.DOUBLE]
-            recvbuf = [ptsNewL, MPI.DOUBLE]
+            self._updateModel()
+            t12 = time.time()
+            tvsp += t12 - t11
 
-            # scatter the info from the proc that perturbed this DV to all procs
-            self.comm.Scatterv(sendbuf, recvbuf, root=(iDV % nproc))
+            # evaluate the points
+            ptsNew = evaluatePoints()
+            teval += time.time() - t12
 
-            t12 = time.time()
-            tcomm += t12 - t11
+            # Reset the DV
+            self.DVs[dvKeys[iDV]].value = dvSave.copy()
+
+            # scale the points
+            return (ptsNew - pts0) / dh * self.modelScale
 
-            # calculate the jacobian here for the pointsets
-            offset = 0
-            for ptSet in self.pointSets:
-                # number of points in this pointset
-                nPts = self.pointSets[ptSet].nPts
+        # perturb the DVs on different procs and exchange the columns of the jacobian
+        dvValues = [(self.DVs[dvKey].value[0], self.DVs[dvKey].dh) for dvKey in dvKeys]
+        key = b"".join(a.tobytes() for a in (rg, sg, tg, gg))
+        jac = self.fdScheduler.computeJacobian(nDV, computeColumn, sizes, dvValues=dvValues, key=key)
+        tcomm += self.fdScheduler.tComm
+
+        # reset the model.
+        t11 = time.time()
+        self._updateModel()
+        t12 = time.time()
+        tvsp += t12 - t11
 
-                # indices to extract correct points from the long pointset array
-                ibeg = offset * 3
-                iend = ibeg + nPts * 3
+        # split the jacobian into the pointsets
+        offset = 0
+        for ptSet in self.pointSets:
+            # number of points in this pointset
+            nPts = self.pointSets[ptSet].nPts
 
-                # ptsNewL has the jacobian itself...
-                self.pointSets[ptSet].jac[0 : nPts * 3, iDV] = ptsNewL[ibeg:iend].copy()
+            # indices to extract correct points from the long pointset array
+            ibeg = offset * 3
+            iend = ibeg + nPts * 3
 
-                # TODO when OpenVSP fixes the bug in spanwise u-v distribution, we can disable the line above and
-                # go back to the proper way below. we also need to clean up the evaluations themselves
-                # self.pointSets[ptSet].jac[0:nPts*3, iDV] = (ptsNewL[ibeg:iend] - self.pointSets[ptSet].pts.flatten())/dh
+            self.pointSets[ptSet].jac = jac[ibeg:iend]
 
-                # increment the offset
-                offset += nPts
+            # TODO when OpenVSP fixes the bug in spanwise u-v distribution, the baseline points
+            # can be computed once on every proc again instead of on the procs that perturb the DVs
 
-            # pertrub the local counter on this proc.
-            # This loops over the DVs that this proc perturbed
-            if iDV % nproc == rank:
-                ii += 1
+            # increment the offset
+            offset += nPts
 
         t2 = time.time()
         if rank == 0:
@@ -1,6 +1,36 @@
-from .DVGeo import DVGeometry
-from .DVGeoAxi import DVGeometryAxi
-from .DVGeoCST import DVGeometryCST
-from .DVGeoVSP import DVGeometryVSP
-from .DVGeoESP import DVGeometryESP
-from .DVGeoMulti import DVGeometryMulti
+# Standard Python modules
+import importlib
+
+# The parameterizations are only imported when they are first accessed, so that
+# the optional geometry engines are not loaded unless they are used
+_lazyImports = {
+    "DVGeometry": ".DVGeo",
+    "DVGeometryAxi": ".DVGeoAxi",
+    "DVGeometryCST": ".DVGeoCST",
+    "DVGeometryVSP": ".DVGeoVSP",
+    "DVGeometryESP": ".DVGeoESP",
+    "DVGeometryMulti": ".DVGeoMulti",
+    "DVGeoHistory": ".history",
+}
+
+__all__ = [
+    "DVGeometry",
+    "DVGeometryAxi",
+    "DVGeometryCST",
+    "DVGeometryVSP",
+    "DVGeometryESP",
+    "DVGeometryMulti",
+    "DVGeoHistory",
+]
+
+
+def __getattr__(name):
+    if name in _lazyImports:
+        value = getattr(importlib.import_module(_lazyImports[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazyImports))
@@ -1,5 +1,9 @@
+# Standard Python modules
+from abc import ABC, abstractmethod
+
 # External modules
 import numpy as np
+from scipy import sparse
 
 # Local modules
 from ..geo_utils import convertTo1D
@@ -19,6 +23,70 @@ class geoDV:
         if scale is not None:
             self.scale = convertTo1D(scale, self.nVal)
 
+    def _isActive(self, config):
+        """Check if the design variable applies to this config"""
+        return self.config is None or config is None or any(c0 == config for c0 in self.config)
+
+    @staticmethod
+    def _mapIndexSets(coefToDV, indSetA, indSetB):
+        """
+        Map pairs of coefficient indices to pairs of design variable
+        indices with the coefficient to design variable lookup coefToDV.
+        Pairs where either coefficient is not controlled are skipped.
+        """
+        cons = []
+        for indA, indB in zip(indSetA, indSetB):
+            up = coefToDV.get(int(indA))
+            down = coefToDV.get(int(indB))
+
+            # If we haven't found up AND down do nothing
+            if up is not None and down is not None:
+                cons.append([up, down])
+
+        return cons
+
+
+class geoDVLinear(ABC):
+    """
+    Mixin for the local design variables that change the coefficients
+    through a fixed linear operator, which is assembled once from the
+    triplets given by the subclass.
+    """
+
+    dvToCoef = None
+
+    def getDVToCoef(self, nCoef):
+        """
+        Return the sparse operator that maps the values of this design
+        variable group to the change of the flattened coefficients. The
+        operator is assembled on the first call and reused afterwards.
+
+        Parameters
+        ----------
+        nCoef : int
+            Number of FFD coefficients
+
+        Returns
+        -------
+        dvToCoef : scipy sparse matrix of size (nCoef*3, nVal)
+            The derivative of the flattened coefficients with respect
+            to the design variables
+        """
+        if self.dvToCoef is None or self.dvToCoef.shape[0] != nCoef * 3:
+            rows, cols, data = self._getDVToCoefEntries()
+            self.dvToCoef = sparse.csr_matrix((data, (rows, cols)), shape=(nCoef * 3, self.nVal))
+
+        return self.dvToCoef
+
+    @abstractmethod
+    def _getDVToCoefEntries(self):
+        """Return the (row, col, data) triplets of the DV to coefficient operator"""
+        pass
+
+    def _addToCoef(self, coef, values):
+        """Add the change of the coefficients due to values to coef in place"""
+        coef += self.getDVToCoef(len(coef)).dot(values).reshape(coef.shape)
+
 
 class geoDVGlobal(geoDV):
     def __init__(self, name, value, lower, upper, scale, function, config):
@@ -54,7 +122,7 @@ class geoDVGlobal(geoDV):
                 return self.function(np.real(self.value), geo)
 
 
-class geoDVLocal(geoDV):
+class geoDVLocal(geoDVLinear, geoDV):
     def __init__(self, name, lower, upper, scale, axis, coefListIn, mask, config):
         """
         Create a set of geometric design variables which change the shape
@@ -91,47 +159,33 @@ class geoDVLocal(geoDV):
     def __call__(self, coef, config):
         """When the object is called, apply the design variable values to
         coefficients"""
-        if self.config is None or config is None or any(c0 == config for c0 in self.config):
-            for i in range(self.nVal):
-                coef[self.coefList[i, 0], self.coefList[i, 1]] += self.value[i].real
+        if self._isActive(config):
+            self._addToCoef(coef, self.value.real)
 
         return coef
 
     def updateComplex(self, coef, config):
-        if self.config is None or config is None or any(c0 == config for c0 in self.config):
-            for i in range(self.nVal):
-                coef[self.coefList[i, 0], self.coefList[i, 1]] += self.value[i].imag * 1j
+        if self._isActive(config):
+            self._addToCoef(coef, self.value.imag * 1j)
 
         return coef
 
+    def _getDVToCoefEntries(self):
+        rows = self.coefList[:, 0] * 3 + self.coefList[:, 1]
+        cols = np.arange(self.nVal)
+        return rows, cols, np.ones(self.nVal)
+
     def mapIndexSets(self, indSetA, indSetB):
         """
         Map the index sets from the full coefficient indices to the local set.
         """
-        # Temp is the list of FFD coefficients that are included
-        # as shape variables in this localDV "key"
-        temp = self.coefList
-        cons = []
-        for j in range(len(indSetA)):
-            # Try to find this index # in the coefList (temp)
-            up = None
-            down = None
-
-            # Note: We are doing inefficient double looping here
-            for k in range(len(temp)):
-                if temp[k][0] == indSetA[j]:
-                    up = k
-                if temp[k][0] == indSetB[j]:
-                    down = k
-
-            # If we haven't found up AND down do nothing
-            if up is not None and down is not None:
-                cons.append([up, down])
-
-        return cons
+        # Map the FFD coefficients that are included as shape variables in
+        # this localDV "key" to the last design variable that moves them
+        coefToDV = {int(coef): k for k, coef in enumerate(self.coefList[:, 0])}
+        return self._mapIndexSets(coefToDV, indSetA, indSetB)
 
 
-class geoDVSpanwiseLocal(geoDV):
+class geoDVSpanwiseLocal(geoDVLinear, geoDV):
     def __init__(self, name, lower, upper, scale, axis, vol_dv_to_coefs, mask, config):
         """
         Create a set of geometric design variables which change the shape
@@ -173,42 +227,33 @@ class geoDVSpanwiseLocal(geoDV):
         """
         When the object is called, apply the design variable values to coefficients
         """
-        if self.config is None or config is None or any(c0 == config for c0 in self.config):
-            for i in range(self.nVal):
-                coef[self.dv_to_coefs[i], self.axis] += self.value[i].real
+        if self._isActive(config):
+            self._addToCoef(coef, self.value.real)
 
         return coef
 
     def updateComplex(self, coef, config):
-        if self.config is None or config is None or any(c0 == config for c0 in self.config):
-            for i in range(self.nVal):
-                coef[self.dv_to_coefs[i], self.axis] += self.value[i].imag * 1j
+        if self._isActive(config):
+            self._addToCoef(coef, self.value.imag * 1j)
 
         return coef
 
+    def _getDVToCoefEntries(self):
+        # Each coefficient is moved once by a design variable even if it is listed more than once
+        coefs = [np.unique(np.array(c, dtype="intc")) for c in self.dv_to_coefs]
+        rows = np.concatenate([c * 3 + self.axis for c in coefs] + [np.zeros(0, "intc")])
+        cols = np.repeat(np.arange(self.nVal), [len(c) for c in coefs])
+        return rows, cols, np.ones(len(rows))
+
     def mapIndexSets(self, indSetA, indSetB):
         """
         Map the index sets from the full coefficient indices to the local set.
         """
-        cons = []
-        for j in range(len(indSetA)):
-            # Try to find this index # in the coefList (temp)
-            up = None
-            down = None
-
-            # Note: We are doing inefficient double looping here
-            for idx_dv, coefs in enumerate(self.dv_to_coefs):
-                for coef in coefs:
-                    if coef == indSetA[j]:
-                        up = idx_dv
-                    if coef == indSetB[j]:
-                        down = idx_dv
-
-            # If we haven't found up AND down do nothing
-            if up is not None and down is not None:
-                cons.append([up, down])
-
-        return cons
+        coefToDV = {}
+        for idx_dv, coefs in enumerate(self.dv_to_coefs):
+            for coef in coefs:
+                coefToDV[int(coef)] = idx_dv
+        return self._mapIndexSets(coefToDV, indSetA, indSetB)
 
 
 class geoDVSectionLocal(geoDV):
@@ -234,56 +279,67 @@ class geoDVSectionLocal(geoDV):
 
         self.axis = axis
 
+        # The direction each design variable moves its coefficient in the
+        # section frame. Only the rotation of the coefficients changes
+        # with the global design variables.
+        self.coefInd = np.array(self.coefList, dtype="intc")
+        self.frameDir = np.zeros((nVal, 3))
+        for i in range(nVal):
+            self.frameDir[i] = self.sectionTransform[self.sectionLink[self.coefList[i]]][:, self.axis]
+
     def __call__(self, coef, coefRotM, config):
         """
         When the object is called, apply the design variable values to coefficients
         """
-        if self.config is None or config is None or any(c0 == config for c0 in self.config):
-            for i in range(len(self.coefList)):
-                T = self.sectionTransform[self.sectionLink[self.coefList[i]]]
-                inFrame = np.zeros(3)
-                inFrame[self.axis] = self.value[i].real
-
-                R = coefRotM[self.coefList[i]].real
-                coef[self.coefList[i]] += R.dot(T.dot(inFrame))
+        if self._isActive(config):
+            direction = self._getDirections(coefRotM).real
+            np.add.at(coef, self.coefInd, direction * self.value.real[:, None])
         return coef
 
     def updateComplex(self, coef, coefRotM, config):
-        if self.config is None or config is None or any(c0 == config for c0 in self.config):
-            for i in range(len(self.coefList)):
-                T = self.sectionTransform[self.sectionLink[self.coefList[i]]]
-                inFrame = np.zeros(3, "D")
-                inFrame[self.axis] = self.value[i]
-
-                R = coefRotM[self.coefList[i]]
-                coef[self.coefList[i]] += R.dot(T.dot(inFrame)).imag * 1j
+        if self._isActive(config):
+            direction = self._getDirections(coefRotM)
+            np.add.at(coef, self.coefInd, (direction * self.value[:, None]).imag * 1j)
         return coef
 
+    def getDVToCoef(self, nCoef, coefRotM):
+        """
+        Return the sparse operator that maps the values of this design
+        variable group to the change of the flattened coefficients.
+        Unlike the other local design variables, the operator depends on
+        the current rotation of the coefficients and is not stored.
+
+        Parameters
+        ----------
+        nCoef : int
+            Number of FFD coefficients
+        coefRotM : dict
+            The rotation matrix of each coefficient
+
+        Returns
+        -------
+        dvToCoef : scipy sparse matrix of size (nCoef*3, nVal)
+            The derivative of the flattened coefficients with respect
+            to the design variables
+        """
+        direction = self._getDirections(coefRotM).real
+        rows = (3 * self.coefInd[:, None] + np.arange(3)).ravel()
+        cols = np.repeat(np.arange(self.nVal), 3)
+        return sparse.csr_matrix((direction.ravel(), (rows, cols)), shape=(nCoef * 3, self.nVal))
+
+    def _getDirections(self, coefRotM):
+        """Rotate the section frame directions with the current coefficient rotations"""
+        if self.nVal == 0:
+            return np.zeros((0, 3))
+        R = np.array([coefRotM[c] for c in self.coefList])
+        return np.einsum("ijk,ik->ij", R, self.frameDir)
+
     def mapIndexSets(self, indSetA, indSetB):
         """
         Map the index sets from the full coefficient indices to the local set.
         """
-        # Temp is the list of FFD coefficients that are included
-        # as shape variables in this localDV "key"
-        temp = self.coefList
-        cons = []
-        for j in range(len(indSetA)):
-            # Try to find this index # in the coefList (temp)
-            up = None
-            down = None
-
-            # Note: We are doing inefficient double looping here
-            for k in range(len(temp)):
-                if temp[k] == indSetA[j]:
-                    up = k
-                if temp[k] == indSetB[j]:
-                    down = k
-
-            # If we haven't found up AND down do nothing
-            if up is not None and down is not None:
-                cons.append([up, down])
-
-        return cons
+        coefToDV = {int(coef): k for k, coef in enumerate(self.coefList)}
+        return self._mapIndexSets(coefToDV, indSetA, indSetB)
 
 
 class geoDVComposite(geoDV):
@@ -296,7 +352,7 @@ class geoDVComposite(geoDV):
         self.s = s
 
 
-class geoDVShapeFunc(geoDV):
+class geoDVShapeFunc(geoDVLinear, geoDV):
     def __init__(self, name, shapes, lower, upper, scale, config):
         """
         Create a set of geometric design variables that are represented
@@ -314,22 +370,28 @@ class geoDVShapeFunc(geoDV):
     def __call__(self, coef, config):
         """When the object is called, apply the design variable values to
         coefficients"""
-        if self.config is None or config is None or any(c0 == config for c0 in self.config):
-            # loop over the shapes and add the perturbations to each coef
-            for ii, shape in enumerate(self.shapes):
-                for idx, vec in shape.items():
-                    coef[idx] += vec * self.value[ii].real
+        if self._isActive(config):
+            self._addToCoef(coef, self.value.real)
 
         return coef
 
     def updateComplex(self, coef, config):
-        if self.config is None or config is None or any(c0 == config for c0 in self.config):
-            for ii, shape in enumerate(self.shapes):
-                for idx, vec in shape.items():
-                    coef[idx] += vec * self.value[ii].imag * 1j
+        if self._isActive(config):
+            self._addToCoef(coef, self.value.imag * 1j)
 
         return coef
 
+    def _getDVToCoefEntries(self):
+        rows = []
+        cols = []
+        data = []
+        for ii, shape in enumerate(self.shapes):
+            for idx, vec in shape.items():
+                rows.extend(3 * idx + np.arange(3))
+                cols.extend([ii] * 3)
+                data.extend(np.real(vec))
+        return np.array(rows, dtype="intc"), np.array(cols, dtype="intc"), np.array(data)
+
 
 class espDV(geoDV):
     def __init__(self, csmDesPmtr, name, value, lower, upper, scale, rows, cols, dh, globalstartind):
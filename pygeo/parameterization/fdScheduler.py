@@ -0,0 +1,243 @@
+# Standard Python modules
+import time
+
+# External modules
+from mpi4py import MPI
+import numpy as np
+from scipy import sparse
+
+
+class ParallelFDScheduler:
+    """
+    Scheduler for the parallel finite difference jacobians of the
+    parametric geometry engines (ESP and OpenVSP).
+
+    Each column of the jacobian requires a rebuild of the model, and the
+    cost of a rebuild can be very different from one DV to another. The
+    columns are therefore handed out dynamically: every worker proc takes
+    the next chunk of DVs from a counter shared through MPI one-sided
+    communication as soon as it has finished its previous chunk. Once all
+    the columns are computed, the part of each column that belongs to the
+    points of every proc is exchanged with a single set of ``Alltoallv``.
+
+    Many CAD parameters only move a few faces or components of the model.
+    Only the points that move when a DV is perturbed are kept in its
+    column, so the columns are communicated and the jacobian is stored in
+    sparse form.
+
+    The scheduler does not know anything about the geometry engine. The
+    caller provides a function that computes one column of the jacobian
+    for all the points, which makes it possible to use any object that can
+    be perturbed and evaluated.
+
+    Parameters
+    ----------
+    comm : MPI Intra Comm
+        Comm over which the jacobian is computed.
+    dynamic : bool
+        Flag to hand out the DVs dynamically. If False, the DVs are
+        distributed round-robin over the workers.
+    chunkSize : int
+        Number of DVs taken by a worker at a time when the DVs are handed
+        out dynamically.
+    reuseColumns : bool
+        Flag to reuse the columns of the DVs whose value and step size did
+        not change since the last jacobian, as long as the points did not
+        change either. This neglects the effect of the other DVs on these
+        columns, so it is only exact if the DVs change the geometry
+        independently of each other.
+    sparseTol : float
+        The derivative of a point with respect to a DV is considered zero if
+        the magnitude of all its components is below this tolerance.
+    """
+
+    def __init__(self, comm=MPI.COMM_WORLD, dynamic=True, chunkSize=1, reuseColumns=False, sparseTol=0.0):
+        self.comm = comm
+        self.dynamic = dynamic
+        self.chunkSize = chunkSize
+        self.reuseColumns = reuseColumns
+        self.sparseTol = sparseTol
+
+        # data of the last jacobian, used to reuse columns
+        self.lastValues = None
+        self.lastKey = None
+        self.lastJac = None
+
+        # timings of the last jacobian
+        self.tEval = 0.0
+        self.tComm = 0.0
+
+    def computeJacobian(self, nDV, computeColumn, sizes, distributed=True, nWorker=None, dvValues=None, key=None):
+        """
+        Compute the finite difference jacobian of the points of this proc.
+
+        Parameters
+        ----------
+        nDV : int
+            The number of DVs
+        computeColumn : callable
+            Function that takes the index of a DV and returns the
+            derivative of all the points with respect to that DV as an
+            array of size (nPtsGlobal, 3). The function is responsible for
+            perturbing the DV and resetting it afterwards.
+        sizes : array of size (comm.size,)
+            The number of points on each proc
+        distributed : bool
+            Flag to indicate that the points are distributed over the procs.
+            If False, every proc has all the points.
+        nWorker : int
+            Number of procs that compute columns. Defaults to all the procs
+            of the comm.
+        dvValues : array of size (nDV, 2)
+            The value and the step size of each DV. This is only needed
+            if the columns are reused.
+        key : bytes
+            Key identifying the points the jacobian is computed for. This
+            is only needed if the columns are reused.
+
+        Returns
+        -------
+        jac : sparse matrix of size (3 * sizes[comm.rank], nDV)
+            The jacobian of the points of this proc in CSR format
+        """
+        comm = self.comm
+        rank = comm.rank
+        if nWorker is None or nWorker > comm.size:
+            nWorker = comm.size
+        self.tEval = 0.0
+        self.tComm = 0.0
+
+        # range of the points of each proc
+        sizes = np.asarray(sizes, dtype="intc")
+        if distributed:
+            starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+            counts = sizes
+        else:
+            starts = np.zeros(comm.size, dtype="intc")
+            counts = np.full(comm.size, sizes[rank], dtype="intc")
+        shape = (3 * counts[rank], nDV)
+
+        # only the columns of the DVs that changed are computed
+        todo = np.arange(nDV)
+        reused = sparse.coo_matrix(shape)
+        if self.reuseColumns and dvValues is not None:
+            dvValues = np.array(dvValues, dtype=float)
+            if (
+                self.lastValues is not None
+                and self.lastValues.shape == dvValues.shape
+                and self.lastKey == key
+                and self.lastJac.shape == shape
+            ):
+                same = np.all(dvValues == self.lastValues, axis=1)
+                todo = np.flatnonzero(~same)
+                reused = self.lastJac.tocoo()
+                keep = same[reused.col]
+                reused = sparse.coo_matrix((reused.data[keep], (reused.row[keep], reused.col[keep])), shape=shape)
+
+        # compute the columns of this proc and only keep the points that moved
+        myDVs = []
+        myPts = []
+        myValues = []
+        for iDV in self._getWork(len(todo), nWorker):
+            t0 = time.time()
+            column = np.reshape(computeColumn(todo[iDV]), (-1, 3))
+            self.tEval += time.time() - t0
+            pts = np.flatnonzero(np.any(np.abs(column) > self.sparseTol, axis=1))
+            myDVs.append(int(todo[iDV]))
+            myPts.append(pts)
+            myValues.append(column[pts])
+
+        # exchange all the columns at once
+        t0 = time.time()
+        allDVs = comm.allgather(myDVs)
+        nMine = len(myDVs)
+
+        # the number of points of each column, the local point indices and the values sent to each proc
+        sendNPts = np.zeros((comm.size, nMine), dtype="intc")
+        sendPts = []
+        sendValues = []
+        for q in range(comm.size):
+            for j in range(nMine):
+                sel = (myPts[j] >= starts[q]) & (myPts[j] < starts[q] + counts[q])
+                sendNPts[q, j] = np.count_nonzero(sel)
+                sendPts.append(myPts[j][sel] - starts[q])
+                sendValues.append(myValues[j][sel].ravel())
+
+        recvDVCounts = np.array([len(dvs) for dvs in allDVs], dtype="intc")
+        recvNPts = np.zeros(np.sum(recvDVCounts), dtype="intc")
+        self._alltoallv(sendNPts.ravel(), np.full(comm.size, nMine, dtype="intc"), recvNPts, recvDVCounts, MPI.INT)
+
+        ptCounts = np.array([np.sum(n) for n in np.split(sendNPts, comm.size)], dtype="intc")
+        recvPtCounts = np.array([np.sum(n) for n in np.split(recvNPts, np.cumsum(recvDVCounts)[:-1])], dtype="intc")
+        recvPts = np.zeros(np.sum(recvPtCounts), dtype="intc")
+        recvValues = np.zeros(3 * np.sum(recvPtCounts))
+        self._alltoallv(_concatenate(sendPts, "intc"), ptCounts, recvPts, recvPtCounts, MPI.INT)
+        self._alltoallv(_concatenate(sendValues, float), 3 * ptCounts, recvValues, 3 * recvPtCounts, MPI.DOUBLE)
+        self.tComm += time.time() - t0
+
+        # assemble the jacobian
+        cols = np.repeat(np.concatenate([np.zeros(0, dtype="intc")] + allDVs), recvNPts)
+        rows = 3 * np.repeat(recvPts, 3) + np.tile(np.arange(3), len(recvPts))
+        jac = sparse.coo_matrix((recvValues, (rows, np.repeat(cols, 3))), shape=shape)
+        jac = (jac + reused).tocsr()
+
+        if self.reuseColumns and dvValues is not None:
+            self.lastValues = dvValues
+            self.lastKey = key
+            self.lastJac = jac.copy()
+
+        return jac
+
+    def _alltoallv(self, sendbuf, sendcounts, recvbuf, recvcounts, mpiType):
+        """Exchange vectors of variable sizes between all the procs"""
+        self.comm.Alltoallv(
+            [sendbuf, sendcounts, _getDisplacements(sendcounts), mpiType],
+            [recvbuf, recvcounts, _getDisplacements(recvcounts), mpiType],
+        )
+
+    def reset(self):
+        """
+        Discard the data of the last jacobian so that no columns are reused.
+        """
+        self.lastValues = None
+        self.lastKey = None
+        self.lastJac = None
+
+    def _getWork(self, nWork, nWorker):
+        """
+        Generator of the indices of the work items of this proc. This must
+        be called and exhausted on all the procs of the comm.
+        """
+        comm = self.comm
+        if not self.dynamic or nWorker == 1:
+            if comm.rank < nWorker:
+                yield from range(comm.rank, nWork, nWorker)
+            return
+
+        # shared counter of the next work item, stored on the root proc
+        counter = np.zeros(1 if comm.rank == 0 else 0, dtype="l")
+        win = MPI.Win.Create(counter, counter.itemsize, comm=comm)
+
+        if comm.rank < nWorker:
+            increment = np.array([self.chunkSize], dtype="l")
+            start = np.zeros(1, dtype="l")
+            while True:
+                win.Lock(0)
+                win.Fetch_and_op(increment, start, 0, 0, MPI.SUM)
+                win.Unlock(0)
+                if start[0] >= nWork:
+                    break
+                yield from range(start[0], min(start[0] + self.chunkSize, nWork))
+
+        comm.Barrier()
+        win.Free()
+
+
+def _concatenate(arrays, dtype):
+    """Concatenate a possibly empty list of arrays"""
+    return np.concatenate([np.zeros(0, dtype=dtype)] + arrays).astype(dtype)
+
+
+def _getDisplacements(counts):
+    """Get the displacements of a vector communication from the counts"""
+    return np.concatenate(([0], np.cumsum(counts)[:-1])).astype("intc")
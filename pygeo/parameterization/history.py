@@ -0,0 +1,326 @@
+# Standard Python modules
+import atexit
+import io
+import json
+import weakref
+import zipfile
+
+# External modules
+from baseclasses.utils import Error
+from mpi4py import MPI
+import numpy as np
+
+# The histories that are recording. They are flushed at exit, but only weakly referenced so that a history that is
+# no longer used can still be garbage collected.
+_recordingHistories = weakref.WeakSet()
+
+
+@atexit.register
+def _flushRecordingHistories():
+    for history in list(_recordingHistories):
+        history.flush()
+
+
+class DVGeoHistory:
+    """
+    A compact record of the design history of one or more DVGeometry
+    objects.
+
+    Each record stores the design variables returned by ``getValues()``
+    and, optionally, the deltas of the FFD coefficients from their
+    original positions and a dictionary of function values. Records are
+    buffered and written in chunks to a single compressed .npz file, so
+    a full optimization history takes a fraction of the space of
+    writing the FFD or the point sets at every iteration. Any FFD or
+    point set in the history can be reconstructed afterwards with
+    :meth:`update` and :meth:`getCoef`.
+
+    The recorder is usually created with
+    :meth:`DVGeometry.addHistory <.DVGeometry.addHistory>` or
+    :meth:`DVConstraints.addHistory <.DVConstraints.addHistory>`.
+    To read an existing history, create the object with the file name
+    only.
+
+    The buffered records are written when the program exits, but a
+    history that is discarded before then loses them, so call
+    :meth:`close` once the recording is done.
+
+    Parameters
+    ----------
+    fileName : str
+        Name of the history file. Should have a .npz extension.
+    DVGeometries : dict
+        The DVGeometry objects to record, keyed by name. If None, the
+        existing file is opened for reading.
+    storeCoef : bool
+        Flag to also store the FFD coefficient deltas of each record.
+        They are computed with all the design variables applied, as for
+        ``config=None``, without updating any point set or changing the
+        state of the DVGeometry.
+    chunkSize : int
+        Number of records buffered in memory before they are written to
+        the file.
+    comm : MPI Intra Comm
+        Communicator of the DVGeometry objects. Only the root proc
+        writes the file.
+    """
+
+    def __init__(self, fileName, DVGeometries=None, storeCoef=False, chunkSize=10, comm=MPI.COMM_WORLD):
+        self.fileName = fileName
+        self.comm = comm
+        self.DVGeometries = DVGeometries
+        self.chunkSize = chunkSize
+        self.buffer = []
+        self.nChunk = 0
+
+        if DVGeometries is None:
+            self._readHeader()
+        else:
+            self.storeCoef = storeCoef
+            self.DVGeoNames = list(DVGeometries.keys())
+            self.coef0 = {}
+            if self.storeCoef:
+                for name, DVGeo in DVGeometries.items():
+                    self.coef0[name] = DVGeo.origFFDCoef.real.copy()
+            self.nRecord = 0
+
+            if self.comm.rank == 0:
+                header = {"DVGeoNames": self.DVGeoNames, "storeCoef": self.storeCoef}
+                with zipfile.ZipFile(self.fileName, "w", compression=zipfile.ZIP_DEFLATED) as f:
+                    f.writestr("header.json", json.dumps(header))
+                    for name, coef in self.coef0.items():
+                        self._writeArray(f, f"coef0/{name}", coef)
+
+            _recordingHistories.add(self)
+
+    def record(self, funcs=None):
+        """
+        Record the current design of the DVGeometry objects.
+
+        Parameters
+        ----------
+        funcs : dict
+            Optional dictionary of function values to store with the
+            design, for example the constraint values. The keys may
+            differ between records; the values missing from a record are
+            read back as NaN.
+        """
+        if self.DVGeometries is None:
+            raise Error("A history opened for reading cannot record new designs.")
+
+        entry = {"values": {}, "coef": {}, "funcs": {}}
+        for name, DVGeo in self.DVGeometries.items():
+            entry["values"][name] = {key: np.atleast_1d(val).real.copy() for key, val in DVGeo.getValues().items()}
+            if self.storeCoef and len(DVGeo.points) > 0:
+                entry["coef"][name] = DVGeo._computeFFDCoef() - self.coef0[name]
+
+        if funcs is not None:
+            entry["funcs"] = {key: np.atleast_1d(val).real.copy() for key, val in funcs.items()}
+
+        self.buffer.append(entry)
+        self.nRecord += 1
+        if len(self.buffer) >= self.chunkSize:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered records to the history file.
+        """
+        if len(self.buffer) == 0:
+            return
+
+        if self.comm.rank == 0:
+            chunk = "chunk%05d" % self.nChunk
+            with zipfile.ZipFile(self.fileName, "a", compression=zipfile.ZIP_DEFLATED) as f:
+                self._writeArray(f, f"{chunk}/nRecord", np.array([len(self.buffer)]))
+                for name in self.DVGeoNames:
+                    for key in self._getKeys("values", name):
+                        self._writeArray(f, f"{chunk}/values/{name}/{key}", self._stack("values", name, key))
+                    if name in self._getKeys("coef"):
+                        self._writeArray(f, f"{chunk}/coef/{name}", self._stack("coef", name))
+                for key in self._getKeys("funcs"):
+                    self._writeArray(f, f"{chunk}/funcs/{key}", self._stack("funcs", key))
+
+        self.nChunk += 1
+        self.buffer = []
+
+    def close(self):
+        """
+        Write any remaining records to the file and stop recording.
+        """
+        self.flush()
+        _recordingHistories.discard(self)
+
+    def getNRecords(self):
+        """
+        Return the number of records in the history.
+        """
+        return self.nRecord
+
+    def getValues(self, iRecord, name=None):
+        """
+        Return the design variables of a record.
+
+        Parameters
+        ----------
+        iRecord : int
+            Index of the record. Negative indices count from the end.
+        name : str
+            Name of the DVGeometry. Defaults to the first one.
+
+        Returns
+        -------
+        dvDict : dict
+            Dictionary of design variables suitable for a call to
+            ``setDesignVars``
+        """
+        if name is None:
+            name = self.DVGeoNames[0]
+        return self._getRecord(iRecord, f"values/{name}/")
+
+    def getFuncs(self, iRecord):
+        """
+        Return the function values stored with a record.
+
+        Parameters
+        ----------
+        iRecord : int
+            Index of the record. Negative indices count from the end.
+
+        Returns
+        -------
+        funcs : dict
+            Dictionary of the function values
+        """
+        return self._getRecord(iRecord, "funcs/")
+
+    def getCoef(self, iRecord, name=None):
+        """
+        Return the FFD coefficients of a record. The history must have
+        been written with ``storeCoef=True``.
+
+        Parameters
+        ----------
+        iRecord : int
+            Index of the record. Negative indices count from the end.
+        name : str
+            Name of the DVGeometry. Defaults to the first one.
+
+        Returns
+        -------
+        coef : array of size (nCoef, 3)
+            The FFD coefficients
+        """
+        if not self.storeCoef:
+            raise Error("The FFD coefficients were not stored in this history.")
+        if name is None:
+            name = self.DVGeoNames[0]
+        delta = self._getRecord(iRecord, "coef/")[name]
+        return self.data[f"coef0/{name}"] + delta
+
+    def update(self, iRecord, DVGeo, ptSetName, name=None):
+        """
+        Reconstruct a point set for a record by setting its design
+        variables on a DVGeometry and updating the point set.
+
+        Parameters
+        ----------
+        iRecord : int
+            Index of the record. Negative indices count from the end.
+        DVGeo : DVGeometry
+            The DVGeometry object set up with the same design variables
+            as the recorded one and with the point set embedded.
+        ptSetName : str
+            The name of the point set to update.
+        name : str
+            Name of the recorded DVGeometry. Defaults to the first one.
+
+        Returns
+        -------
+        coords : array of size (N, 3)
+            The coordinates of the point set
+        """
+        # Do not record the designs that are replayed
+        history = getattr(DVGeo, "history", None)
+        DVGeo.history = None
+        try:
+            DVGeo.setDesignVars(self.getValues(iRecord, name))
+            coords = DVGeo.update(ptSetName)
+        finally:
+            DVGeo.history = history
+
+        return coords
+
+    def _readHeader(self):
+        """Read the header and the chunk sizes of an existing file"""
+        self.data = np.load(self.fileName)
+        self.cachedChunk = None
+        self.chunkData = {}
+        with zipfile.ZipFile(self.fileName, "r") as f:
+            header = json.loads(f.read("header.json"))
+        self.DVGeoNames = header["DVGeoNames"]
+        self.storeCoef = header["storeCoef"]
+
+        self.chunkStart = []
+        self.nRecord = 0
+        while "chunk%05d/nRecord" % self.nChunk in self.data.files:
+            self.chunkStart.append(self.nRecord)
+            self.nRecord += int(self.data["chunk%05d/nRecord" % self.nChunk][0])
+            self.nChunk += 1
+
+    def _getRecord(self, iRecord, prefix):
+        """Get all the arrays of a record whose names start with prefix"""
+        if self.DVGeometries is not None:
+            raise Error("The history must be opened for reading to access the records.")
+        if iRecord < 0:
+            iRecord += self.nRecord
+        if iRecord < 0 or iRecord >= self.nRecord:
+            raise Error(f"Record {iRecord} is not in the history, which has {self.nRecord} records.")
+
+        iChunk = np.searchsorted(self.chunkStart, iRecord, side="right") - 1
+        index = iRecord - self.chunkStart[iChunk]
+
+        # Only the arrays of the most recently accessed chunk are kept in memory
+        if self.cachedChunk != iChunk:
+            chunkPrefix = "chunk%05d/" % iChunk
+            self.chunkData = {
+                key[len(chunkPrefix) :]: self.data[key] for key in self.data.files if key.startswith(chunkPrefix)
+            }
+            self.cachedChunk = iChunk
+
+        return {key[len(prefix) :]: val[index] for key, val in self.chunkData.items() if key.startswith(prefix)}
+
+    def _getKeys(self, field, *keys):
+        """Get the keys of a field over all the buffered records, in order of appearance"""
+        names = {}
+        for entry in self.buffer:
+            value = entry[field]
+            for key in keys:
+                value = value.get(key, {})
+            names.update(dict.fromkeys(value))
+        return list(names)
+
+    def _stack(self, field, *keys):
+        """Stack a field of the buffered records. The records without the field are filled with NaN."""
+        values = []
+        for entry in self.buffer:
+            value = entry[field]
+            for key in keys:
+                value = value.get(key) if value is not None else None
+            values.append(value)
+
+        shapes = {np.shape(value) for value in values if value is not None}
+        if len(shapes) > 1:
+            raise Error(
+                f"The shape of '{'/'.join((field,) + keys)}' changes between the records of the history: "
+                f"{sorted(shapes)}. Each entry must keep the same shape to be stacked."
+            )
+        shape = shapes.pop()
+        return np.array([np.full(shape, np.nan) if value is None else value for value in values])
+
+    @staticmethod
+    def _writeArray(f, key, array):
+        """Write an array as a .npy member of an open zip file"""
+        buffer = io.BytesIO()
+        np.lib.format.write_array(buffer, np.asarray(array))
+        f.writestr(key + ".npy", buffer.getvalue())
@@ -12,7 +12,7 @@ from scipy.sparse import linalg
 from scipy.spatial import ConvexHull
 
 # Local modules
-from .geo_utils import blendKnotVectors, readNValues
+from .geo_utils import blendKnotVectors, readNValues, writeVTK
 from .topology import BlockTopology
 
 
@@ -595,6 +595,41 @@ class pyBlock:
 
         closeTecplot(f)
 
+    def writeVTK(self, fileName, vols=True, coef=True, orig=False, solutionTime=None):
+        """Write a binary VTK visualization of the pyBlock object.
+
+        Parameters
+        ----------
+        fileName : str
+            Filename of VTK file. Should have a .vtu extension
+
+        vols : bool. Default is True
+            Flag to write interpolated volumes
+
+        coef : bool. Default is True
+            Flag to write spline control points
+
+        orig : bool. Default is False
+            Flag to write original data (if it exists)
+
+        solutionTime : float
+            Solution time to write to the file. If given, the file is
+            added as a step of a time series.
+        """
+        zones = []
+        if vols:
+            for ivol in range(self.nVol):
+                self.vols[ivol].computeData()
+                zones.append(self.vols[ivol].data)
+        if orig:
+            for ivol in range(self.nVol):
+                zones.append(self.vols[ivol].X)
+        if coef:
+            for ivol in range(self.nVol):
+                zones.append(self.vols[ivol].coef)
+
+        writeVTK(fileName, zones, solutionTime)
+
     def writePlot3d(self, fileName):
         """Write the grid to a plot3d file. This isn't efficient as it
         used ASCII format. Only useful for quick visualizations
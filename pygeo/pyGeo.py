@@ -8,6 +8,7 @@ import numpy as np
 from pyspline import Curve, Surface
 from pyspline.utils import closeTecplot, openTecplot, writeTecplot2D
 from scipy import sparse
+from scipy.spatial import cKDTree
 from scipy.sparse.linalg import factorized
 
 # Local modules
@@ -1087,6 +1088,39 @@ class pyGeo:
         # Close out the file
         closeTecplot(f)
 
+    def writeVTK(self, fileName, orig=False, surfs=True, coef=True, solutionTime=None):
+        """Write the pyGeo Object to a binary VTK file
+
+        Parameters
+        ----------
+        fileName : str
+            File name for VTK file. Should have .vtu extension
+        orig : bool
+            Flag to write the original data
+        surfs : bool
+            Flag to write discrete approximation of the actual surface
+        coef: bool
+            Flag to write b-spline coefficients
+        solutionTime : float
+            Solution time to write to the file. If given, the file is
+            added as a step of a time series.
+        """
+        zones = []
+        if surfs:
+            for isurf in range(self.nSurf):
+                self.surfs[isurf].computeData()
+                zones.append(self.surfs[isurf].data)
+
+        if coef:
+            for isurf in range(self.nSurf):
+                zones.append(self.surfs[isurf].coef)
+
+        if orig:
+            for isurf in range(self.nSurf):
+                zones.append(self.surfs[isurf].X)
+
+        geo_utils.writeVTK(fileName, zones, solutionTime)
+
     def writeIGES(self, fileName):
         """
         Write the surface to IGES format
@@ -1269,6 +1303,14 @@ class pyGeo:
     def projectPoints(self, points, *args, surfs=None, **kwargs):
         """Project on or more points onto the nearest surface.
 
+        To avoid projecting every point onto every surface, the
+        distance from a point to the bounding box of a surface's
+        control points is used as a lower bound on the distance to that
+        surface. An upper bound on the closest distance is obtained
+        from a coarse sampling of the surfaces. A point is only
+        projected onto the surfaces whose lower bound does not exceed
+        the best distance found so far.
+
         Parameters
         ----------
         points : list or array
@@ -1292,29 +1334,49 @@ class pyGeo:
         if surfs is None:
             surfs = np.arange(self.nSurf)
 
+        points = np.atleast_2d(points).real
         N = len(points)
-        U = np.zeros((N, len(surfs)))
-        V = np.zeros((N, len(surfs)))
-        D = np.zeros((N, len(surfs), 3))
-        for i in range(len(surfs)):
-            isurf = surfs[i]
-            U[:, i], V[:, i], D[:, i, :] = self.surfs[isurf].projectPoint(points, *args, **kwargs)
+
+        # Initial guesses for the parameters have to follow the points
+        # that are actually projected
+        guesses = {}
+        for key in ["u", "v"]:
+            if key in kwargs and np.size(kwargs[key]) == N:
+                guesses[key] = np.atleast_1d(kwargs.pop(key))
+
+        # Upper bound on the closest distance from a coarse sampling
+        nSample = 5
+        uu, vv = np.meshgrid(np.linspace(0, 1, nSample), np.linspace(0, 1, nSample))
+        samples = np.vstack([self.surfs[isurf](uu, vv).reshape((-1, 3)).real for isurf in surfs])
+        dBound, _ = cKDTree(samples).query(points)
+
+        # Allow for round-off in the sampled points
+        tol = 1e-10 * np.linalg.norm(np.ptp(samples, axis=0))
 
         u = np.zeros(N)
         v = np.zeros(N)
         patchID = np.zeros(N, "intc")
-
-        # Now post-process to get the lowest one
-        for i in range(N):
-            d0 = np.linalg.norm(D[i, 0])
-            u[i] = U[i, 0]
-            v[i] = V[i, 0]
-            patchID[i] = surfs[0]
-            for j in range(len(surfs)):
-                if np.linalg.norm(D[i, j]) < d0:
-                    d0 = np.linalg.norm(D[i, j])
-                    u[i] = U[i, j]
-                    v[i] = V[i, j]
-                    patchID[i] = surfs[j]
+        dBest = np.inf * np.ones(N)
+
+        for isurf in surfs:
+            xMin, xMax = self.surfs[isurf].getBounds()
+            dBox = np.linalg.norm(np.maximum(np.maximum(xMin.real - points, points - xMax.real), 0.0), axis=1)
+            ind = np.where(dBox <= np.minimum(dBound, dBest) + tol)[0]
+            if len(ind) == 0:
+                continue
+
+            surfKwargs = kwargs.copy()
+            for key in guesses:
+                surfKwargs[key] = guesses[key][ind]
+            U, V, D = self.surfs[isurf].projectPoint(points[ind], *args, **surfKwargs)
+            dist = np.linalg.norm(np.atleast_2d(D), axis=1)
+
+            # Only a strictly closer surface replaces the current one
+            better = dist < dBest[ind]
+            iBetter = ind[better]
+            u[iBetter] = np.atleast_1d(U)[better]
+            v[iBetter] = np.atleast_1d(V)[better]
+            patchID[iBetter] = isurf
+            dBest[iBetter] = dist[better]
 
         return u, v, patchID
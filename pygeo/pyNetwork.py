@@ -3,7 +3,7 @@ import os
 
 # External modules
 import numpy as np
-from pyspline import Surface
+from pyspline import Curve, Surface
 from pyspline.utils import closeTecplot, line, openTecplot, writeTecplot1D
 
 # Local modules
@@ -248,48 +248,132 @@ class pyNetwork:
         # that we know how large to make the line representing the ray.
         curveID0, s0 = self.projectPoints(points, curves=curves, **kwargs)
 
-        D0 = np.zeros((len(s0), 3), "d")
-        for i in range(len(s0)):
-            D0[i, :] = self.curves[curveID0[i]](s0[i]) - points[i]
+        points = np.atleast_2d(points)
+        N = len(points)
+        D0 = np.zeros((N, 3), "d")
+        for icurve in np.unique(curveID0):
+            mask = curveID0 == icurve
+            D0[mask] = self.curves[icurve](s0[mask]).reshape((-1, 3)) - points[mask]
+        halfLength = raySize * np.linalg.norm(D0, axis=1)
 
         if curves is None:
             curves = np.arange(self.nCurve)
 
-        # Now do the same calc as before
-        N = len(points)
+        # A single axis is applied to every point. Otherwise group the
+        # points that share a direction so each group is one batch.
+        axis = np.array(axis, "d")
+        if axis.ndim == 1:
+            axes = axis.reshape((1, 3))
+            axisInd = np.zeros(N, "intc")
+        else:
+            axes, axisInd = np.unique(axis, axis=0, return_inverse=True)
+            axisInd = axisInd.ravel()
+
         S = np.zeros((N, len(curves)))
         D = np.zeros((N, len(curves), 3))
 
         for i in range(len(curves)):
             icurve = curves[i]
-            for j in range(N):
-                ray = line(
-                    points[j] - axis * raySize * np.linalg.norm(D0[j]),
-                    points[j] + axis * raySize * np.linalg.norm(D0[j]),
+            for iAxis in range(len(axes)):
+                ptInd = np.where(axisInd == iAxis)[0]
+                S[ptInd, i], D[ptInd, i, :] = self._projectRaysCurve(
+                    self.curves[icurve], points[ptInd], axes[iAxis], halfLength[ptInd], ptInd
                 )
 
-                S[j, i], t, D[j, i, :] = self.curves[icurve].projectCurve(ray, nIter=2000)
-                if t == 0.0 or t == 1.0:
-                    print(
-                        "Warning: The link for attached point {:d} was drawn"
-                        "from the curve to the end of the ray,"
-                        "indicating that the ray might not have been long"
-                        "enough to intersect the nearest curve.".format(j)
-                    )
+        return self._selectClosest(S, D, curves)
+
+    def _projectRaysCurve(self, curve, points, axis, halfLength, ptInd):
+        """Project a batch of rays sharing the same direction onto a
+        single curve.
 
+        The closest point between the infinite line through a point
+        and the curve is the closest point between the point and the
+        curve after both have been projected onto the plane normal to
+        the line. Because B-splines are affine invariant, the projected
+        curve is obtained by projecting the control points, so all the
+        rays are handled with a single point projection. Rays whose
+        intersection lies beyond their finite length fall back to a
+        direct ray-curve projection.
+
+        Parameters
+        ----------
+        curve : pySpline.Curve
+            The curve to project onto
+        points : array of size (N,3)
+            The origins of the rays
+        axis : array of size 3
+            The direction shared by all the rays
+        halfLength : array of size N
+            Half the length of each ray in multiples of the axis length
+        ptInd : array of size N
+            The index of each point in the full set of points, used in
+            the warnings
+
+        Returns
+        -------
+        s : array of size N
+            The curve parameter closest to each ray
+        D : array of size (N,3)
+            The distance vector between the curve and each ray
+        """
+        N = len(points)
         s = np.zeros(N)
-        curveID = np.zeros(N, "intc")
-
-        # Now post-process to get the lowest one
-        for i in range(N):
-            d0 = np.linalg.norm(D[i, 0])
-            s[i] = S[i, 0]
-            curveID[i] = curves[0]
-            for j in range(len(curves)):
-                if np.linalg.norm(D[i, j]) < d0:
-                    d0 = np.linalg.norm(D[i, j])
-                    s[i] = S[i, j]
-                    curveID[i] = curves[j]
+        D = np.zeros((N, 3))
+        if N == 0:
+            return s, D
+
+        axisLength = np.linalg.norm(axis)
+        unitAxis = axis / axisLength
+        coef = curve.coef - np.outer(curve.coef.dot(unitAxis), unitAxis)
+        planeCurve = Curve(k=curve.k, t=curve.t, coef=coef)
+        planePts = points - np.outer(points.dot(unitAxis), unitAxis)
+        s[:], _ = planeCurve.projectPoint(planePts, nIter=2000)
+
+        curvePts = curve(s).reshape((-1, 3))
+        t = (curvePts - points).dot(unitAxis)
+        D[:] = curvePts - (points + np.outer(t, unitAxis))
+
+        # The line intersection is outside of the ray, so the result
+        # clamps to the end of the ray as in a direct projection. The
+        # ray spans halfLength times the axis on each side of the point.
+        for j in np.where(np.abs(t) >= halfLength * axisLength)[0]:
+            ray = line(points[j] - axis * halfLength[j], points[j] + axis * halfLength[j])
+            s[j], tRay, D[j] = curve.projectCurve(ray, nIter=2000)
+            if tRay == 0.0 or tRay == 1.0:
+                print(
+                    "Warning: The link for attached point {:d} was drawn"
+                    "from the curve to the end of the ray,"
+                    "indicating that the ray might not have been long"
+                    "enough to intersect the nearest curve.".format(ptInd[j])
+                )
+
+        return s, D
+
+    def _selectClosest(self, S, D, curves):
+        """Select the closest curve for each point from the results of
+        a projection onto several curves.
+
+        Parameters
+        ----------
+        S : array of size (N, nCurves)
+            The curve parameters for each point and curve
+        D : array of size (N, nCurves, 3)
+            The distance vectors for each point and curve
+        curves : list
+            The curve indices corresponding to the second axis of S and D
+
+        Returns
+        -------
+        curveID : array of size N
+            The index of the curve with the closest distance
+        s : array of size N
+            The curve parameter on self.curves[curveID] that is closest
+            to the point(s).
+        """
+        N = len(S)
+        iMin = np.argmin(np.linalg.norm(D, axis=2), axis=1)
+        s = S[np.arange(N), iMin]
+        curveID = np.asarray(curves, "intc")[iMin]
 
         return curveID, s
 
@@ -327,21 +411,7 @@ class pyNetwork:
             icurve = curves[i]
             S[:, i], D[:, i, :] = self.curves[icurve].projectPoint(points, *args, **kwargs)
 
-        s = np.zeros(N)
-        curveID = np.zeros(N, "intc")
-
-        # Now post-process to get the lowest one
-        for i in range(N):
-            d0 = np.linalg.norm(D[i, 0])
-            s[i] = S[i, 0]
-            curveID[i] = curves[0]
-            for j in range(len(curves)):
-                if np.linalg.norm(D[i, j]) < d0:
-                    d0 = np.linalg.norm(D[i, j])
-                    s[i] = S[i, j]
-                    curveID[i] = curves[j]
-
-        return curveID, s
+        return self._selectClosest(S, D, curves)
 
     def intersectPlanes(self, points, axis, curves=None, raySize=1.5, **kwargs):
         """Find the intersection of the curves with the plane defined by the points and
@@ -451,18 +521,4 @@ class pyNetwork:
                         "enough to intersect the nearest curve.".format(j)
                     )
 
-        s = np.zeros(N)
-        curveID = np.zeros(N, "intc")
-
-        # Now post-process to get the lowest one
-        for i in range(N):
-            d0 = np.linalg.norm(D[i, 0])
-            s[i] = S[i, 0]
-            curveID[i] = curves[0]
-            for j in range(len(curves)):
-                if np.linalg.norm(D[i, j]) < d0:
-                    d0 = np.linalg.norm(D[i, j])
-                    s[i] = S[i, j]
-                    curveID[i] = curves[j]
-
-        return curveID, s
+        return self._selectClosest(S, D, curves)
@@ -1,6 +1,7 @@
 # Standard Python modules
 import os
 import unittest
+from unittest.mock import patch
 
 # External modules
 from baseclasses import BaseRegTest
@@ -277,6 +278,46 @@ class RegTestPyGeo(unittest.TestCase):
                 sens = big.totalSensitivity(dIdPt, "X")
                 handler.root_add_dict("dIdx", sens, rtol=1e-12, atol=1e-12, msg="Check sens dict")
 
+    def test_cascade_branches(self):
+        """
+        Test both ways of cascading the derivatives down the hierarchy against complex step and finite differences.
+        A few parent design variables are propagated one column at a time, while the local design variables of the
+        big cube outnumber the tangent of the children wrt their reference axis and control points.
+        """
+        for local, nTangentCalls in [(False, 0), (True, 2)]:
+            big, small, tiny = self.setup_blocks(testID=6)
+            add_vars(big, "big", rotate="x")
+            add_vars(small, "small", translate=True)
+            add_vars(tiny, "tiny", rotate="y")
+            if local:
+                for axis in ["x", "y", "z"]:
+                    add_vars(big, "big", local=axis)
+
+            rng = np.random.default_rng(0)
+            x = {key: 0.1 * rng.random(len(val)) for key, val in big.getValues().items()}
+            big.setDesignVars(x)
+
+            with patch.object(
+                DVGeometry, "_cascadeTangent", autospec=True, side_effect=DVGeometry._cascadeTangent
+            ) as cascadeTangent:
+                big.update("X")
+                big.computeTotalJacobian("X")
+                Jac = big.JT["X"].toarray()
+            self.assertEqual(cascadeTangent.call_count, nTangentCalls)
+
+            big.setDesignVars(x)
+            big.update("X")
+            big.computeTotalJacobianCS("X")
+            JacCS = big.JT["X"]
+
+            big.setDesignVars(x)
+            big.update("X")
+            big.computeTotalJacobianFD("X")
+            JacFD = big.JT["X"]
+
+            np.testing.assert_allclose(Jac, JacCS, rtol=1e-12, atol=1e-12, err_msg="Analytic vs complex-step")
+            np.testing.assert_allclose(Jac, JacFD, rtol=1e-6, atol=1e-6, err_msg="Analytic vs finite difference")
+
 
 """
 The following are some helper functions for setting up the design variables for
@@ -1,6 +1,7 @@
 # Standard Python modules
 import os
 import unittest
+from unittest.mock import patch
 
 # External modules
 from baseclasses import BaseRegTest
@@ -416,6 +417,25 @@ class RegTestPyGeo(unittest.TestCase):
 
             funcs, funcsSens = self.wing_test_deformed(DVGeo, DVCon, handler)
 
+    def test_intersectionCache(self):
+        DVGeo, DVCon = self.generate_dvgeo_dvcon("c172")
+
+        leList = [[0.7, 0.0, 0.1], [0.7, 0.0, 1.325], [0.7, 0.0, 5.0]]
+        teList = [[0.9, 0.0, 0.1], [0.9, 0.0, 1.325], [0.9, 0.0, 5.0]]
+        for nSpan in [5, [1, 4]]:
+            coords = DVCon._generateIntersections(leList, teList, nSpan, 5, "default")
+            np.testing.assert_array_equal(coords, DVCon._projectIntersections(leList, teList, nSpan, 5, "default"))
+
+            # The same grid is not projected again
+            with patch.object(DVCon, "_projectIntersections") as project:
+                cached = DVCon._generateIntersections(leList, teList, nSpan, 5, "default")
+                project.assert_not_called()
+            np.testing.assert_array_equal(cached, coords)
+
+            # Modifying the returned coordinates does not modify the cache
+            cached[:] = 0.0
+            np.testing.assert_array_equal(DVCon._generateIntersections(leList, teList, nSpan, 5, "default"), coords)
+
     def test_thickness2D_box(self, train=False, refDeriv=False):
         refFile = os.path.join(self.base_path, "ref/test_DVConstraints_thickness2D_box.ref")
         with BaseRegTest(refFile, train=train) as handler:
@@ -1056,6 +1076,31 @@ class RegTestPyGeo(unittest.TestCase):
             funcs, funcsSens = self.wing_test_twist(DVGeo, DVCon, handler)
             funcs, funcsSens = self.wing_test_deformed(DVGeo, DVCon, handler)
 
+    def test_curvature_types(self):
+        # Check the Gaussian, combined and KS mean curvature derivatives against finite differences
+        surfFile = os.path.join(self.base_path, "../../input_files/deform_geometry_wing.xyz")
+        for curvatureType in ["Gaussian", "combined", "KSmean"]:
+            DVGeo, DVCon = self.generate_dvgeo_dvcon("rae2822", addToDVGeo=True)
+            DVCon.addCurvatureConstraint(surfFile, curvatureType=curvatureType, name="curvature_con")
+            DVCon.addCurvatureConstraint(
+                surfFile, curvatureType=curvatureType, scaled=False, name="unscaled_curvature_con"
+            )
+
+            funcs = {}
+            DVCon.evalFunctions(funcs)
+            funcsSens = {}
+            DVCon.evalFunctionsSens(funcsSens)
+            funcsSensFD = evalFunctionsSensFD(DVGeo, DVCon, fdstep=1e-5)
+            for outkey in funcs.keys():
+                for inkey in DVGeo.getValues().keys():
+                    np.testing.assert_allclose(
+                        funcsSens[outkey][inkey],
+                        funcsSensFD[outkey][inkey],
+                        rtol=1e-3,
+                        atol=1e-3,
+                        err_msg=f"{curvatureType}: d{outkey}/d{inkey}",
+                    )
+
     def test_curvature1D(self, train=False, refDeriv=False):
         refFile = os.path.join(self.base_path, "ref/test_DVConstraints_curvature1D.ref")
         with BaseRegTest(refFile, train=train) as handler:
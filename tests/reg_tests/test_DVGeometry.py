@@ -2,17 +2,22 @@
 from collections import OrderedDict
 import copy
 import os
+import pickle
 import shutil
 import unittest
+from unittest.mock import patch
+import weakref
 
 # External modules
 from baseclasses import BaseRegTest
+from baseclasses.utils import Error
 import commonUtils
+from mpi4py import MPI
 import numpy as np
 from stl import mesh
 
 # First party modules
-from pygeo import DVConstraints, DVGeometry
+from pygeo import DVConstraints, DVGeoHistory, DVGeometry
 
 
 class RegTestPyGeo(unittest.TestCase):
@@ -737,6 +742,44 @@ class RegTestPyGeo(unittest.TestCase):
 
             handler.root_add_dict("dIdx", dIdx, rtol=1e-7, atol=1e-7)
 
+    def test_21_sensitivities(self):
+        """
+        Test the axisymmetric FFD jacobian and products against finite differences for points at several angles
+        """
+        DVGeo = commonUtils.setupDVGeoAxi(self.base_path)
+
+        DVGeo.addGlobalDV("mainAxis", np.zeros(1), commonUtils.mainAxisPointAxi)
+        DVGeo.addLocalDV("x_axis", lower=-2, upper=2, axis="x")
+        DVGeo.addLocalDV("z_axis", lower=-2, upper=2, axis="z")
+
+        ptName = "points"
+        points = np.array([[0, 0.5, 0.5], [0, -0.3, 0.6], [0, 0.6, -0.2]])
+        nPt = 3 * points.shape[0]
+        DVGeo.addPointSet(points=points, ptName=ptName)
+
+        rng = np.random.default_rng(0)
+        DVGeo.setDesignVars({key: 0.01 * rng.random(len(val)) for key, val in DVGeo.getValues().items()})
+        dIdxFD = commonUtils.totalSensitivityFD(DVGeo, nPt, ptName, step=1e-6)
+
+        # reverse mode with one seed per coordinate
+        dIdPt = np.eye(nPt).reshape(nPt, -1, 3)
+        dIdx = DVGeo.totalSensitivity(dIdPt, ptName)
+        for key in dIdxFD:
+            np.testing.assert_allclose(dIdx[key], dIdxFD[key], atol=1e-5, err_msg=key)
+
+        # forward mode one DV at a time
+        for key, val in DVGeo.getValues().items():
+            for i in range(len(val)):
+                seed = np.zeros(len(val))
+                seed[i] = 1.0
+                xsdot = DVGeo.totalSensitivityProd({key: seed}, ptName)
+                np.testing.assert_allclose(xsdot, dIdxFD[key][:, i], atol=1e-5, err_msg=key)
+
+        # the public jacobian is in the Cartesian frame
+        dIdxJT = DVGeo.convertSensitivityToDict(DVGeo.JT[ptName].toarray().T)
+        for key in dIdxFD:
+            np.testing.assert_allclose(dIdxJT[key], dIdxFD[key], atol=1e-5, err_msg=key)
+
     def test_spanwise_dvs(self, train=False, refDeriv=False):
         """
         Test spanwise_dvs
@@ -992,6 +1035,52 @@ class RegTestPyGeo(unittest.TestCase):
             Composite_FFD = DVGeo.getValues()
             handler.root_add_val("Composite DVs :", Composite_FFD["ffdComp"], rtol=1e-12, atol=1e-12)
 
+    def test_composite_nModes(self):
+        """
+        Test composite DVs truncated to the modes with the largest singular values
+        """
+        DVGeo = DVGeometry(os.path.join(self.base_path, "../../input_files/2x1x8_rectangle.xyz"))
+        DVGeo.addLocalDV("xdir", lower=-1.0, upper=1.0, axis="x")
+        DVGeo.addLocalDV("ydir", lower=-1.0, upper=1.0, axis="y")
+        NDV = DVGeo.getNDV()
+
+        rng = np.random.default_rng(0)
+        nPoints = 100
+        points = np.array([-0.9, 0.1, 0.5]) + rng.random((nPoints, 3)) * np.array([1.8, 0.8, 7.0])
+        ptName = "testPoints"
+        DVGeo.addPointSet(points, ptName)
+
+        # the singular values of the dense jacobian
+        DVGeo.computeTotalJacobian(ptName)
+        J = DVGeo.JT[ptName].toarray().T
+        sRef = np.linalg.svd(J, compute_uv=False)
+
+        nModes = 5
+        DVGeo.addCompositeDV("ffdComp", ptName, comm=MPI.COMM_WORLD, nModes=nModes)
+        u = DVGeo.DVComposite.u
+        s = DVGeo.DVComposite.s
+        self.assertEqual(u.shape, (NDV, nModes))
+        self.assertEqual(DVGeo.getNDV(), nModes)
+        self.assertEqual(len(DVGeo.getValues()["ffdComp"]), nModes)
+
+        # the modes are orthonormal right singular vectors of the jacobian
+        np.testing.assert_allclose(s, sRef[:nModes], rtol=1e-8)
+        np.testing.assert_allclose(u.T @ u, np.eye(nModes), atol=1e-10)
+        np.testing.assert_allclose(J.T @ (J @ u), u * s**2, atol=1e-8 * sRef[0] ** 2)
+        np.testing.assert_allclose(np.sum(DVGeo.DVComposite.scale), nModes)
+
+        # the sensitivities are mapped to the truncated basis
+        dIdPt = np.zeros((1, nPoints, 3))
+        dIdPt[0, :, 1] = 1.0
+        dIdx = DVGeo.totalSensitivity(dIdPt, ptName)
+        np.testing.assert_allclose(dIdx["ffdComp"], (dIdPt.reshape(1, -1) @ J) @ u, atol=1e-12)
+
+        # a composite design moves the points along the modes
+        coords0 = DVGeo.update(ptName).copy()
+        dvComp = 1e-3 * rng.random(nModes)
+        DVGeo.setDesignVars({"ffdComp": DVGeo.getValues()["ffdComp"] + dvComp})
+        np.testing.assert_allclose(DVGeo.update(ptName) - coords0, (J @ (u @ dvComp)).reshape(-1, 3), atol=1e-12)
+
     def test_demoDesignVars(self):
         DVGeo, DVGeoChild = commonUtils.setupDVGeo(self.base_path)
         DVGeo.addChild(DVGeoChild)
@@ -1071,6 +1160,149 @@ class RegTestPyGeo(unittest.TestCase):
         shutil.rmtree(ffdPath)
         shutil.rmtree(pointSetPath)
 
+    def test_demoDesignVars_parallel(self):
+        DVGeo, DVGeoChild = commonUtils.setupDVGeo(self.base_path)
+        DVGeo.addChild(DVGeoChild)
+
+        globalVarName = "nestedX"
+        localVarName = "childXDir"
+        DVGeoChild.addGlobalDV(globalVarName, -0.5, commonUtils.childAxisPoints, lower=-1.0, upper=0.0, scale=1.0)
+        DVGeoChild.addLocalDV(localVarName, lower=-1.1, upper=1.1, axis="x", scale=1.0)
+
+        ptName = "point"
+        DVGeo.addPointSet(points=np.array([[0, 0.5, 0.5]]), ptName=ptName)
+
+        # The snapshots are not recorded in the history, which is only written by this process
+        historyFile = os.path.join(self.base_path, "demo_history.npz")
+        history = DVGeo.addHistory(historyFile, chunkSize=2)
+        DVGeo.setDesignVars({globalVarName: -0.5})
+
+        # Write the binary files with a process pool
+        directory = os.path.join(self.base_path, "demo_parallel")
+        DVGeo.demoDesignVars(directory, pointSet=ptName, outputType="vtk", nProc=2)
+        self.assertEqual(history.getNRecords(), 1)
+        self.assertIs(DVGeo.history, history)
+
+        refNames = sorted(
+            [f"{localVarName}_{j:03d}_iter_{i:03d}" for j in range(8) for i in range(2)]
+            + [f"{globalVarName}_000_iter_{i:03d}" for i in range(2)]
+        )
+        self.assertEqual(sorted(os.listdir(os.path.join(directory, "ffd"))), [name + ".vtu" for name in refNames])
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(directory, "pointset"))), [name + f"_{ptName}.vtu" for name in refNames]
+        )
+
+        # The index lists every snapshot
+        with open(os.path.join(directory, "index.dat")) as f:
+            index = [line.split() for line in f if not line.startswith("#")]
+        self.assertEqual(sorted(row[0] for row in index), refNames)
+
+        # The DVs are reset
+        np.testing.assert_allclose(DVGeo.getValues()[globalVarName], -0.5)
+
+        history.close()
+        self.assertEqual(DVGeoHistory(historyFile).getNRecords(), 1)
+
+        shutil.rmtree(directory)
+        os.remove(historyFile)
+
+    def test_clone(self):
+        DVGeo, DVGeoChild = commonUtils.setupDVGeo(self.base_path)
+        DVGeo.addChild(DVGeoChild)
+
+        DVGeo.addGlobalDV("mainX", -1.0, commonUtils.mainAxisPoints, lower=-1.0, upper=0.0, scale=1.0)
+        DVGeoChild.addLocalDV("childYDir", lower=-1.0, upper=1.0, axis="y", scale=1.0)
+
+        ptName = "point"
+        DVGeo.addPointSet(np.array([[0, 0.5, 0.5]]), ptName)
+        coords0 = DVGeo.update(ptName)
+
+        for copied in [DVGeo.clone(), pickle.loads(pickle.dumps(DVGeo))]:
+            np.testing.assert_allclose(copied.update(ptName), coords0)
+
+            # the copy has its own design variables
+            copied.setDesignVars({"mainX": -0.5, "childYDir": np.full(copied.getNDV() - 1, 0.1)})
+            self.assertGreater(np.linalg.norm(copied.update(ptName) - coords0), 0.0)
+            np.testing.assert_allclose(DVGeo.update(ptName), coords0)
+            self.assertEqual(DVGeo.getValues()["mainX"], -1.0)
+
+        # the embedding is shared with the clone
+        copied = DVGeo.clone()
+        for geo, geoCopy in zip(DVGeo.getFlattenedChildren(), copied.getFlattenedChildren()):
+            self.assertIs(geoCopy.FFD.embeddedVolumes[ptName].u, geo.FFD.embeddedVolumes[ptName].u)
+            self.assertIs(geoCopy.FFD.embeddedVolumes[ptName].dPtdCoef, geo.FFD.embeddedVolumes[ptName].dPtdCoef)
+            self.assertIsNot(geoCopy.FFD.coef, geo.FFD.coef)
+
+    def test_history(self):
+        DVGeo = DVGeometry(os.path.join(self.base_path, "../../input_files/2x1x8_rectangle.xyz"))
+        DVGeo.addRefAxis("RefAx", xFraction=0.5, alignIndex="k", rotType=0, rot0ang=-90)
+        DVGeo.addGlobalDV(dvName="span", value=0.5, func=commonUtils.span, lower=0.1, upper=10)
+        DVGeo.addLocalDV("xdir", lower=-1.0, upper=1.0, axis="x")
+
+        ptName = "testPoints"
+        DVGeo.addPointSet(np.array([[0.25, 0.4, 4], [-0.8, 0.2, 7]]), ptName)
+
+        # Record five designs in chunks of two so the last chunk is only written on close
+        fileName = os.path.join(self.base_path, "history.npz")
+        history = DVGeo.addHistory(fileName, storeCoef=True, chunkSize=2)
+        rng = np.random.default_rng(0)
+        nDV = DVGeo.DV_listLocal["xdir"].nVal
+        dvs, coefs, coords = [], [], []
+        DVGeo.update(ptName)
+        for i in range(5):
+            dvs.append(0.1 * rng.random(nDV))
+
+            # Recording the coefficients does not update the point sets or change the control points
+            coef = DVGeo.FFD.coef.copy()
+            with patch.object(DVGeo, "update", wraps=DVGeo.update) as update:
+                DVGeo.setDesignVars({"span": 0.5 + 0.1 * i, "xdir": dvs[-1]})
+            self.assertEqual(update.call_count, 0)
+            self.assertFalse(DVGeo.updated[ptName])
+            np.testing.assert_equal(DVGeo.FFD.coef, coef)
+
+            coords.append(DVGeo.update(ptName).copy())
+            coefs.append(DVGeo.FFD.coef.copy())
+        history.close()
+
+        history = DVGeoHistory(fileName)
+        self.assertEqual(history.getNRecords(), 5)
+        for i in range(5):
+            np.testing.assert_allclose(history.getValues(i)["xdir"], dvs[i])
+            np.testing.assert_allclose(history.getCoef(i), coefs[i], atol=1e-14)
+        np.testing.assert_allclose(history.getValues(-1)["xdir"], dvs[-1])
+
+        # Replaying a record gives the same point set and is not recorded again
+        DVGeo.history = None
+        np.testing.assert_allclose(history.update(2, DVGeo, ptName), coords[2], atol=1e-14)
+
+        # The function values are stored with each record, even if their keys change
+        fileName = os.path.join(self.base_path, "history_funcs.npz")
+        history = DVGeoHistory(fileName, {"default": DVGeo}, chunkSize=2)
+        for i in range(3):
+            funcs = {"thickness": np.full(3, float(i))}
+            if i != 1:
+                funcs["volume"] = 10.0 + i
+            history.record(funcs)
+        history.close()
+
+        history = DVGeoHistory(fileName)
+        for i in range(3):
+            funcs = history.getFuncs(i)
+            np.testing.assert_allclose(funcs["thickness"], np.full(3, float(i)))
+            if i == 1:
+                self.assertTrue(np.isnan(funcs["volume"]).all())
+            else:
+                np.testing.assert_allclose(funcs["volume"], 10.0 + i)
+
+        # A history that is not closed is only flushed at exit, and does not keep the recorder alive until then
+        fileName = os.path.join(self.base_path, "history_open.npz")
+        history = weakref.ref(DVGeoHistory(fileName, {"default": DVGeo}))
+        self.assertIsNone(history())
+
+        os.remove(os.path.join(self.base_path, "history.npz"))
+        os.remove(os.path.join(self.base_path, "history_funcs.npz"))
+        os.remove(fileName)
+
     def test_writeRefAxes(self):
         DVGeo, DVGeoChild = commonUtils.setupDVGeo(self.base_path)
         DVGeo.addChild(DVGeoChild)
@@ -1177,6 +1409,132 @@ class RegTestPyGeo(unittest.TestCase):
 
         np.testing.assert_allclose(dIdx["span"], dIdx_FD["span"], atol=1e-15)
 
+    def test_updateConfigs(self):
+        """
+        Test the batched update of several configs and the jacobians of each config
+        """
+        DVGeo = DVGeometry(os.path.join(self.base_path, "../../input_files/2x1x8_rectangle.xyz"))
+
+        DVGeo.addRefAxis("RefAx", xFraction=0.5, alignIndex="k", rotType=0, rot0ang=-90)
+        DVGeo.addGlobalDV(dvName="span", value=0.5, func=commonUtils.span, lower=0.1, upper=10, config="cruise")
+        DVGeo.addLocalDV("xdir", lower=-1.0, upper=1.0, axis="x")
+        DVGeo.addLocalDV("ydir", lower=-1.0, upper=1.0, axis="y", config=["takeoff", "landing"])
+
+        points = np.array([[0.25, 0.4, 4], [-0.8, 0.2, 7]])
+        ptName = "testPoints"
+        DVGeo.addPointSet(points, ptName)
+
+        rng = np.random.default_rng(0)
+        DVGeo.setDesignVars(
+            {
+                "span": 0.8,
+                "xdir": 0.1 * rng.random(DVGeo.DV_listLocal["xdir"].nVal),
+                "ydir": 0.1 * rng.random(DVGeo.DV_listLocal["ydir"].nVal),
+            }
+        )
+
+        configs = ["cruise", "takeoff", "landing", None]
+        coords = DVGeo.updateConfigs(ptName, configs)
+
+        # the control points are left in the state of the last config, although its group is not the last one
+        coef = DVGeo.FFD.coef.copy()
+        DVGeo.update(ptName, config=configs[-1])
+        np.testing.assert_allclose(coef, DVGeo.FFD.coef, atol=1e-14)
+
+        for config in configs:
+            np.testing.assert_allclose(coords[config], DVGeo.update(ptName, config=config), atol=1e-14)
+
+        # the jacobian of each config is cached separately, and the point jacobian is recomputed for a new config
+        dIdPt = np.zeros([1, 2, 3])
+        dIdPt[0, 0, 1] = 1.0
+        dIdx = {}
+        for config in configs:
+            dIdx[config] = DVGeo.totalSensitivity(dIdPt, ptName, config=config)
+        self.assertEqual(len(DVGeo.dCoefdDV), len(configs))
+        self.assertEqual(np.count_nonzero(dIdx["cruise"]["ydir"]), 0)
+        self.assertGreater(np.count_nonzero(dIdx["takeoff"]["ydir"]), 0)
+        np.testing.assert_allclose(dIdx["takeoff"]["ydir"], dIdx["landing"]["ydir"])
+
+        dIdxCruise = DVGeo.totalSensitivity(dIdPt, ptName, config="cruise")
+        for key in dIdxCruise:
+            np.testing.assert_allclose(dIdxCruise[key], dIdx["cruise"][key])
+
+    def test_localDVJacobians(self):
+        """
+        Test the sparse local DV jacobians against complex step, including a spanwise local DV group that is
+        inactive for the config
+        """
+        DVGeo = DVGeometry(os.path.join(self.base_path, "../../input_files/2x1x8_rectangle.xyz"))
+
+        DVGeo.addRefAxis("RefAx", xFraction=0.5, alignIndex="k", rotType=0, rot0ang=-90)
+        DVGeo.addGlobalDV(dvName="span", value=0.5, func=commonUtils.span, lower=0.1, upper=10)
+        DVGeo.addSpanwiseLocalDV("swCruise", "k", axis="y", lower=-1.0, upper=1.0, config="cruise")
+        DVGeo.addSpanwiseLocalDV("swAll", "k", axis="x", lower=-1.0, upper=1.0)
+        DVGeo.addLocalSectionDV("section", "k", axis=1, lower=-1.0, upper=1.0)
+        DVGeo.addLocalDV("zdir", lower=-1.0, upper=1.0, axis="z")
+        DVGeo.addShapeFunctionDV("shapeFunc", commonUtils.getShapeFunc(DVGeo.getLocalIndex(0)))
+
+        ptName = "testPoints"
+        DVGeo.addPointSet(np.array([[0.25, 0.4, 4], [-0.8, 0.2, 7], [0.5, 0.7, 1]]), ptName)
+
+        rng = np.random.default_rng(0)
+        dvs = DVGeo.getValues()
+        DVGeo.setDesignVars({key: 0.1 * rng.random(len(val)) for key, val in dvs.items() if key != "span"})
+
+        for config in ["cruise", "takeoff", None]:
+            DVGeo.zeroJacobians([ptName])
+            DVGeo.update(ptName, config=config)
+            DVGeo.computeTotalJacobian(ptName, config=config)
+            JT = DVGeo.JT[ptName].toarray()
+
+            DVGeo.zeroJacobians([ptName])
+            DVGeo.update(ptName, config=config)
+            DVGeo.computeTotalJacobianCS(ptName, config=config)
+            JTCS = DVGeo.JT[ptName]
+
+            np.testing.assert_allclose(JT, JTCS, atol=1e-12, err_msg=f"config {config}")
+
+            # the rows of the inactive spanwise local DVs are zero
+            iSW = DVGeo.nDVSW_count
+            nSW = DVGeo.DV_listSpanwiseLocal["swCruise"].nVal
+            if config == "takeoff":
+                self.assertEqual(np.count_nonzero(JT[iSW : iSW + nSW]), 0)
+            else:
+                self.assertGreater(np.count_nonzero(JT[iSW : iSW + nSW]), 0)
+            self.assertGreater(np.count_nonzero(JT[iSW + nSW :]), 0)
+
+    def test_checkDerivativesRandom(self):
+        DVGeo, DVGeoChild = commonUtils.setupDVGeo(self.base_path)
+        DVGeo.addChild(DVGeoChild)
+
+        DVGeo.addGlobalDV("mainX", -1.0, commonUtils.mainAxisPoints, lower=-1.0, upper=0.0, scale=1.0)
+        DVGeo.addLocalDV("xdir", lower=-1.0, upper=1.0, axis="x", scale=1.0)
+        DVGeoChild.addGlobalDV("nestedX", -0.5, commonUtils.childAxisPoints, lower=-1.0, upper=0.0, scale=1.0)
+        DVGeoChild.addLocalDV("childYDir", lower=-1.0, upper=1.0, axis="y", scale=1.0)
+
+        ptName = "testPoints"
+        DVGeo.addPointSet(np.array([[0.0, 0.5, 0.5]]), ptName)
+
+        errors = DVGeo.checkDerivativesRandom(ptName, nDirections=2)
+        self.assertEqual(sorted(errors.keys()), sorted(DVGeo.getVarNames()))
+        for name in errors:
+            self.assertLess(errors[name]["fd"], 1e-6)
+            self.assertLess(errors[name]["dot"], 1e-10)
+
+        # the finite differences computed in forked processes are the same and are not recorded in the history
+        historyFile = os.path.join(self.base_path, "check_history.npz")
+        history = DVGeo.addHistory(historyFile, chunkSize=2)
+        errorsProc = DVGeo.checkDerivativesRandom(ptName, nDirections=2, nProc=2)
+        for name in errors:
+            self.assertAlmostEqual(errorsProc[name]["fd"], errors[name]["fd"], places=12)
+            self.assertAlmostEqual(errorsProc[name]["dot"], errors[name]["dot"], places=12)
+        self.assertEqual(history.getNRecords(), 0)
+        self.assertIs(DVGeo.history, history)
+
+        history.close()
+        self.assertEqual(DVGeoHistory(historyFile).getNRecords(), 0)
+        os.remove(historyFile)
+
     def test_embedding_solver(self):
         DVGeo = DVGeometry(os.path.join(self.base_path, "../../input_files/fuselage_ffd_severe.xyz"))
 
@@ -1485,6 +1843,46 @@ class RegTestPyGeo(unittest.TestCase):
                 handler.root_add_val(f"new_coords_{ptName}", new_pts, rtol=1e-10, atol=1e-10)
 
 
+class RegTestDemoDesignVarsParallel(unittest.TestCase):
+    N_PROCS = 2
+
+    def setUp(self):
+        self.base_path = os.path.dirname(os.path.abspath(__file__))
+        self.comm = MPI.COMM_WORLD
+
+    def test_demoDesignVars_comm(self):
+        # Every proc holds its own DVGeometry with the full point set
+        DVGeo, DVGeoChild = commonUtils.setupDVGeo(self.base_path)
+        DVGeo.addChild(DVGeoChild)
+        DVGeoChild.addLocalDV("childXDir", lower=-1.1, upper=1.1, axis="x", scale=1.0)
+
+        ptName = "point"
+        DVGeo.addPointSet(points=np.array([[0, 0.5, 0.5], [0.1, 0.4, 0.5]]), ptName=ptName)
+
+        # The snapshots are distributed over the procs
+        directory = os.path.join(self.base_path, "demo_comm")
+        DVGeo.demoDesignVars(directory, pointSet=ptName, outputType="vtk", comm=self.comm)
+        self.comm.Barrier()
+
+        refNames = sorted([f"childXDir_{j:03d}_iter_{i:03d}" for j in range(8) for i in range(2)])
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(directory, "pointset"))), [name + f"_{ptName}.vtu" for name in refNames]
+        )
+
+        # A point set distributed over the procs would only be written in part
+        DVGeo.addPointSet(points=np.array([[0, 0.5, 0.5 - 0.1 * self.comm.rank]]), ptName="distributed")
+        with self.assertRaises(Error):
+            DVGeo.demoDesignVars(directory, pointSet="distributed", comm=self.comm)
+
+        # Forking is refused after MPI has been initialized on several procs
+        with self.assertRaises(Error):
+            DVGeo.demoDesignVars(directory, pointSet=ptName, nProc=2)
+
+        self.comm.Barrier()
+        if self.comm.rank == 0:
+            shutil.rmtree(directory)
+
+
 if __name__ == "__main__":
     unittest.main()
 
@@ -6,7 +6,9 @@ DVGeometryCST: Test suite for the DVGeometryCST module.
 
 # Standard Python modules
 import os
+import tempfile
 import unittest
+from unittest.mock import patch
 
 # External modules
 from baseclasses import BaseRegTest
@@ -319,6 +321,62 @@ class DVGeometryCSTPointSetSerial(unittest.TestCase):
         self.assertEqual(min(coords[:, 0]), self.DVGeo.points["test"]["xMin"])
         self.assertEqual(max(coords[:, 0]), self.DVGeo.points["test"]["xMax"])
 
+    def test_splitUpperLower_projection(self):
+        # Points scattered around the airfoil so that some of them cannot be decided by the sampled splines
+        coords = readCoordFile(self.datFile)
+        rng = np.random.default_rng(2)
+        points = np.zeros((500, 3))
+        points[:, :2] = coords[rng.integers(0, coords.shape[0], 500)] + 1e-3 * (rng.random((500, 2)) - 0.5)
+        points[:, 0] = np.clip(points[:, 0], np.min(coords[:, 0]), np.max(coords[:, 0]))
+
+        idxUpper, idxLower = self.DVGeo._splitUpperLower(points)
+
+        # Classify all the points by projecting them onto the splines
+        _, upperDist = self.DVGeo.upperSpline.projectPoint(points[:, :2])
+        upperDist = np.linalg.norm(upperDist, axis=1)
+        _, lowerDist = self.DVGeo.lowerSpline.projectPoint(points[:, :2])
+        lowerDist = np.linalg.norm(lowerDist, axis=1)
+        teDist = np.full(points.shape[0], np.inf)
+        if not self.DVGeo.sharp:
+            x1, y1 = self.DVGeo.coordLowerTE[:2]
+            x2, y2 = self.DVGeo.coordUpperTE[:2]
+            teDist = np.abs((x2 - x1) * (y1 - points[:, 1]) - (x1 - points[:, 0]) * (y2 - y1)) / np.hypot(
+                x2 - x1, y2 - y1
+            )
+        upperRef = np.where(np.logical_and(upperDist <= lowerDist, upperDist <= teDist))[0]
+        lowerRef = np.where(np.logical_and(lowerDist < upperDist, lowerDist <= teDist))[0]
+
+        np.testing.assert_equal(idxUpper, upperRef)
+        np.testing.assert_equal(idxLower, lowerRef)
+
+    def test_addPointSet_cacheDir(self):
+        coords = readCoordFile(self.datFile)
+        coords = np.hstack((coords, np.zeros((coords.shape[0], 1))))
+
+        self.DVGeo.addPointSet(coords, "test")
+        with tempfile.TemporaryDirectory() as cacheDir:
+            # The first call splits the points and writes a single cache file
+            self.DVGeo.addPointSet(coords, "cached", cacheDir=cacheDir)
+            files = os.listdir(cacheDir)
+            self.assertEqual(len(files), 1)
+            self.assertTrue(files[0].startswith("cst_split_") and files[0].endswith(".npz"))
+
+            # The second call reads the split from the file
+            DVGeo = DVGeometryCST(self.datFile, comm=self.comm)
+            with patch.object(DVGeometryCST, "_splitUpperLower") as mock:
+                DVGeo.addPointSet(coords, "cached", cacheDir=cacheDir)
+            mock.assert_not_called()
+            self.assertEqual(os.listdir(cacheDir), files)
+
+            for geo in [self.DVGeo, DVGeo]:
+                for surf in ["upper", "lower"]:
+                    np.testing.assert_equal(geo.points["cached"][surf], self.DVGeo.points["test"][surf])
+
+            # Different points get their own file
+            coords[:, 1] *= 1.01
+            DVGeo.addPointSet(coords, "scaled", cacheDir=cacheDir)
+            self.assertEqual(len(os.listdir(cacheDir)), 2)
+
 
 @unittest.skipUnless(prefoilImported, "preFoil is required for DVGeometryCST")
 @parameterized_class(airfoils)
@@ -657,6 +715,69 @@ class DVGeometryCSTSensitivity(unittest.TestCase):
         np.testing.assert_allclose(sens, sensCS, atol=self.sensTol, rtol=self.sensTol)
 
 
+@unittest.skipUnless(prefoilImported, "preFoil is required for DVGeometryCST")
+class DVGeometryCSTBasisCache(unittest.TestCase):
+    # Test in serial
+    N_PROCS = 1
+
+    def setUp(self):
+        self.datFile = os.path.join(inputDir, "naca2412.dat")
+        self.DVGeo = DVGeometryCST(self.datFile, numCST=[5, 4])
+        for dvType in ["upper", "lower", "n1_upper", "n2_upper", "n1_lower", "n2_lower", "chord"]:
+            self.DVGeo.addDV(dvType, dvType=dvType)
+
+        coords = readCoordFile(self.datFile)
+        self.coords = np.hstack((coords, np.zeros((coords.shape[0], 1))))
+        self.ptName = "pt"
+        self.DVGeo.addPointSet(self.coords.copy(), self.ptName)
+
+    def test_update_cachedBasis(self):
+        """
+        Test that the point set updated with the cached bases matches a direct evaluation of the CST curves,
+        and that the class shape is only recomputed when N1 or N2 change
+        """
+        rng = np.random.default_rng(1)
+        idx = {surf: self.DVGeo.points[self.ptName][surf] for surf in ["upper", "lower"]}
+        xMin = np.min(self.coords[:, 0])
+        chord0 = np.max(self.coords[:, 0]) - xMin
+        scaledX = (self.coords[:, 0] - xMin) / chord0
+        yTE = {"upper": self.coords[0, 1] / chord0, "lower": self.coords[-1, 1] / chord0}
+
+        # The class shapes are computed on the first update
+        self.DVGeo.update(self.ptName)
+        DVs = self.DVGeo.getValues()
+        nClassShape = 0
+        for i in range(4):
+            DVs["upper"] = DVs["upper"] + 0.01 * rng.random(DVs["upper"].size)
+            DVs["lower"] = DVs["lower"] - 0.01 * rng.random(DVs["lower"].size)
+            DVs["chord"] = np.array([1.0 + 0.1 * i])
+            # Only change the class shape on every other design
+            if i % 2 == 1:
+                for dvType in ["n1_upper", "n2_upper", "n1_lower", "n2_lower"]:
+                    DVs[dvType] = DVs[dvType] + 0.05 * rng.random(1)
+            self.DVGeo.setDesignVars(DVs)
+
+            with patch.object(DVGeometryCST, "computeClassShape", wraps=DVGeometryCST.computeClassShape) as mock:
+                coords = self.DVGeo.update(self.ptName)
+            nClassShape += mock.call_count
+            self.assertEqual(mock.call_count, 2 if i % 2 == 1 else 0)
+
+            for surf in ["upper", "lower"]:
+                yRef = DVs["chord"] * DVGeometryCST.computeCSTCoordinates(
+                    scaledX[idx[surf]], DVs[f"n1_{surf}"], DVs[f"n2_{surf}"], DVs[surf], yTE[surf]
+                )
+                np.testing.assert_allclose(coords[idx[surf], 1], yRef, atol=1e-14)
+            np.testing.assert_allclose(coords[:, 0], scaledX * DVs["chord"] + xMin, atol=1e-14)
+
+        # The bases are not recomputed for the sensitivities at the same design
+        dIdpt = np.ones_like(self.coords)
+        with patch.object(DVGeometryCST, "computeClassShape", wraps=DVGeometryCST.computeClassShape) as mock:
+            self.DVGeo.totalSensitivity(dIdpt, self.ptName)
+            self.DVGeo.totalSensitivityProd({"upper": np.ones(DVs["upper"].size)}, self.ptName)
+        self.assertEqual(mock.call_count, 0)
+        self.assertEqual(nClassShape, 4)
+
+
 @unittest.skipUnless(prefoilImported, "preFoil is required for DVGeometryCST")
 class TestFunctionality(unittest.TestCase):
     """
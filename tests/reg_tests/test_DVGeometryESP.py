@@ -228,7 +228,7 @@ class TestPyGeoESP_BasicCube(unittest.TestCase):
         npts = initpts.shape[0]
         ndvs = DVGeo.getNDV()
         # check the jacobian results match analytic result
-        testjac = DVGeo.pointSets["mypts"].jac.reshape(npts, 3, ndvs)
+        testjac = DVGeo.pointSets["mypts"].jac.toarray().reshape(npts, 3, ndvs)
         analyticjac = self.setup_cubemodel_analytic_jac()
 
         for ipt in range(npts):
@@ -251,7 +251,7 @@ class TestPyGeoESP_BasicCube(unittest.TestCase):
         npts = initpts.shape[0]
         ndvs = DVGeo.getNDV()
         # check the jacobian results match analytic result
-        testjac = DVGeo.pointSets["mypts"].jac.reshape(npts, 3, ndvs)
+        testjac = DVGeo.pointSets["mypts"].jac.toarray().reshape(npts, 3, ndvs)
         ordered_analyticjac = self.setup_cubemodel_analytic_jac()
         analyticjac = np.zeros((npts, 3, ndvs))
 
@@ -547,7 +547,7 @@ class TestPyGeoESP_BasicCube_Distributed(unittest.TestCase):
         npts = initpts.shape[0]
         ndvs = DVGeo.getNDV()
         # check the jacobian results match analytic result
-        testjac = DVGeo.pointSets["mypts"].jac.reshape(npts, 3, ndvs)
+        testjac = DVGeo.pointSets["mypts"].jac.toarray().reshape(npts, 3, ndvs)
         analyticjac = self.setup_cubemodel_analytic_jac()
 
         for ipt in range(npts):
@@ -570,7 +570,7 @@ class TestPyGeoESP_BasicCube_Distributed(unittest.TestCase):
         npts = initpts.shape[0]
         ndvs = DVGeo.getNDV()
         # check the jacobian results match analytic result
-        testjac = DVGeo.pointSets["mypts"].jac.reshape(npts, 3, ndvs)
+        testjac = DVGeo.pointSets["mypts"].jac.toarray().reshape(npts, 3, ndvs)
         ordered_analyticjac = self.setup_cubemodel_analytic_jac()
         analyticjac = np.zeros((npts, 3, ndvs))
 
@@ -733,7 +733,7 @@ class TestPyGeoESP_BasicCube_Distributed_OneProcBlank(unittest.TestCase):
         npts = initpts.shape[0]
         ndvs = DVGeo.getNDV()
         # check the jacobian results match analytic result
-        testjac = DVGeo.pointSets["mypts"].jac.reshape(npts, 3, ndvs)
+        testjac = DVGeo.pointSets["mypts"].jac.toarray().reshape(npts, 3, ndvs)
         analyticjac = self.setup_cubemodel_analytic_jac()
 
         if self.comm.rank != 2:
@@ -273,9 +273,14 @@ class TestDVGeoMPhysFFD(unittest.TestCase):
         childFFD = self.childFFD
 
         class FFDGroup(Group):
+            def initialize(self):
+                self.options.declare("usePartials", default=False)
+
             def setup(self):
                 self.add_subsystem("dvs", IndepVarComp(), promotes=["*"])
-                self.add_subsystem("geometry", OM_DVGEOCOMP(file=parentFFD, type="ffd"))
+                self.add_subsystem(
+                    "geometry", OM_DVGEOCOMP(file=parentFFD, type="ffd", usePartials=self.options["usePartials"])
+                )
 
             def configure(self):
                 # get the DVGeo object out of the geometry component
@@ -323,6 +328,7 @@ class TestDVGeoMPhysFFD(unittest.TestCase):
 
                 self.add_constraint(f"geometry.{ptName}")
 
+        self.FFDGroup = FFDGroup
         self.prob = Problem(model=FFDGroup())
 
     def test_run_model(self):
@@ -343,6 +349,14 @@ class TestDVGeoMPhysFFD(unittest.TestCase):
         totals = self.prob.check_totals(step=1e-5, out_stream=None)
         commonUtils.assert_check_totals(totals, atol=1e-5, rtol=1e-5)
 
+    def test_deriv_partials(self):
+        prob = Problem(model=self.FFDGroup(usePartials=True))
+        prob.setup(mode="rev")
+        prob.run_model()
+
+        totals = prob.check_totals(step=1e-5, out_stream=None)
+        commonUtils.assert_check_totals(totals, atol=1e-5, rtol=1e-5)
+
 
 @unittest.skipUnless(omInstalled, "OpenMDAO is required to test the pyGeo MPhys wrapper")
 @parameterized_class(test_params_constraints_box)
@@ -351,7 +365,7 @@ class TestDVConMPhysBox(unittest.TestCase):
         # Random number generator
         self.rand = np.random.default_rng(1)
 
-    def get_box_prob(self, **kwargs):
+    def get_box_prob(self, usePartials=False, **kwargs):
         """
         Generate an OpenMDAO problem with the OM_DVGEOCOMP component with the
         functional dictated by the parameterized class. Custom keyword arguments
@@ -372,7 +386,9 @@ class TestDVConMPhysBox(unittest.TestCase):
 
         class BoxGeo(Group):
             def setup(self):
-                self.geo = self.add_subsystem("geometry", OM_DVGEOCOMP(file=ffdFile, type="ffd"), promotes=["*"])
+                self.geo = self.add_subsystem(
+                    "geometry", OM_DVGEOCOMP(file=ffdFile, type="ffd", usePartials=usePartials), promotes=["*"]
+                )
 
             def configure(self):
                 # Get the mesh from the STL
@@ -459,6 +475,25 @@ class TestDVConMPhysBox(unittest.TestCase):
         totals = p.check_totals(step=1e-5, out_stream=None)
         commonUtils.assert_check_totals(totals, atol=5e-5, rtol=5e-5)
 
+    def test_deformed_derivs_partials(self):
+        """
+        Test the total derivatives computed from the partials on a random perturbation to the baseline.
+        """
+        if "addProjectedAreaConstraint" in self.conFunc:
+            p = self.get_box_prob(usePartials=True, axis=np.array([0.5, 3, -1]))
+        else:
+            p = self.get_box_prob(usePartials=True)
+        p.setup(mode="rev")
+
+        # Pick some random deformed state
+        p.set_val("twist", self.rand.random() * 10)
+        p.set_val("local", self.rand.random() * 10)
+
+        p.run_model()
+
+        totals = p.check_totals(step=1e-5, out_stream=None)
+        commonUtils.assert_check_totals(totals, atol=5e-5, rtol=5e-5)
+
 
 # parameters for ESP-based DVGeo tests
 fullESPDV = {"name": "cubex0", "lower": np.array([-10.0]), "upper": np.array([10.0]), "scale": 0.1, "dh": 0.0001}
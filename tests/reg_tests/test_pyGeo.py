@@ -5,6 +5,7 @@ import unittest
 # External modules
 from baseclasses import BaseRegTest
 import numpy as np
+from pyspline import Surface
 
 # First party modules
 from pygeo import pyGeo
@@ -69,3 +70,38 @@ class TestPyGeo(unittest.TestCase):
             wing.surfs[isurf].computeData()
         surf = wing.surfs[isurf].data
         handler.root_add_val("sum of surface data", sum(surf.flatten()), tol=1e-10)
+
+    def test_projectPoints(self):
+        # A small plate, a large plate above it and a bumped plate
+        x, y = np.meshgrid(np.linspace(0.0, 1.0, 3), np.linspace(0.0, 1.0, 3), indexing="ij")
+        small = Surface(X=np.dstack([x, y, np.zeros_like(x)]), ku=2, kv=2)
+        x, y = np.meshgrid(np.linspace(-10.0, 10.0, 3), np.linspace(-10.0, 10.0, 3), indexing="ij")
+        large = Surface(X=np.dstack([x, y, np.ones_like(x)]), ku=2, kv=2)
+        x, y = np.meshgrid(np.linspace(3.0, 6.0, 5), np.linspace(-2.0, 2.0, 5), indexing="ij")
+        bumped = Surface(X=np.dstack([x, y, -0.5 + 0.3 * np.sin(x) * np.cos(y)]), ku=3, kv=3)
+
+        geo = pyGeo("create")
+        geo.surfs = [small, large, bumped]
+        geo.nSurf = len(geo.surfs)
+
+        # The sample closest to the first point is the corner of the small
+        # plate, but the closest surface is the large plate just above it
+        rng = np.random.default_rng(0)
+        points = np.vstack([[2.5, 2.5, 0.9], rng.uniform([-3.0, -3.0, -1.5], [7.0, 3.0, 2.0], (50, 3))])
+
+        u, v, patchID = geo.projectPoints(points)
+
+        # Project every point onto every surface
+        U = np.zeros((len(points), geo.nSurf))
+        V = np.zeros((len(points), geo.nSurf))
+        dist = np.zeros((len(points), geo.nSurf))
+        for isurf in range(geo.nSurf):
+            U[:, isurf], V[:, isurf], D = geo.surfs[isurf].projectPoint(points)
+            dist[:, isurf] = np.linalg.norm(D, axis=1)
+        iMin = np.argmin(dist, axis=1)
+        ind = np.arange(len(points))
+
+        self.assertEqual(patchID[0], 1)
+        np.testing.assert_array_equal(patchID, iMin)
+        np.testing.assert_allclose(u, U[ind, iMin], atol=1e-12)
+        np.testing.assert_allclose(v, V[ind, iMin], atol=1e-12)
@@ -0,0 +1,74 @@
+# Standard Python modules
+import unittest
+
+# External modules
+import numpy as np
+from pyspline import Curve
+from pyspline.utils import line
+
+# First party modules
+from pygeo import pyNetwork
+
+
+class TestPyNetwork(unittest.TestCase):
+    N_PROCS = 1
+
+    def setUp(self):
+        # A straight curve along x and a parabola above it
+        x = np.linspace(0.0, 10.0, 11)
+        straight = Curve(X=np.column_stack([x, np.zeros_like(x), np.zeros_like(x)]), k=2)
+        parabola = Curve(X=np.column_stack([x, 3.0 + 0.05 * (x - 5.0) ** 2, np.zeros_like(x)]), k=3)
+        self.network = pyNetwork([straight, parabola])
+
+    def projectRaysBaseline(self, points, axis, raySize=1.5):
+        """Project the rays one at a time and one curve at a time"""
+        curveID0, s0 = self.network.projectPoints(points)
+        axis = np.broadcast_to(axis, points.shape)
+
+        curveID = np.zeros(len(points), "intc")
+        s = np.zeros(len(points))
+        for j in range(len(points)):
+            halfLength = raySize * np.linalg.norm(self.network.curves[curveID0[j]](s0[j]) - points[j])
+            ray = line(points[j] - axis[j] * halfLength, points[j] + axis[j] * halfLength)
+            d0 = np.inf
+            for icurve in range(self.network.nCurve):
+                sj, _, D = self.network.curves[icurve].projectCurve(ray, nIter=2000)
+                if np.linalg.norm(D) < d0:
+                    d0 = np.linalg.norm(D)
+                    s[j] = sj
+                    curveID[j] = icurve
+
+        return curveID, s
+
+    def test_projectRays(self):
+        points = np.array([[2.0, 1.0, 0.0], [4.0, 2.0, 0.0], [7.0, -1.0, 0.5]])
+
+        # The first ray is shorter than the axis direction, so it stops before
+        # reaching the straight curve and the result clamps to the end of the ray
+        axes = np.array(
+            [
+                0.5 * np.array([1.0, -1.0, 0.0]) / np.sqrt(2.0),
+                [0.0, 3.0, 0.0],
+                [0.0, 2.0, -2.0],
+            ]
+        )
+        curveID, s = self.network.projectRays(points, axes)
+        curveIDRef, sRef = self.projectRaysBaseline(points, axes)
+        np.testing.assert_array_equal(curveID, curveIDRef)
+        np.testing.assert_allclose(s, sRef, atol=1e-6)
+
+        # The line through the first point crosses the straight curve at x = 3,
+        # but the clamped ray ends before x = 2.6
+        self.assertEqual(curveID[0], 0)
+        self.assertLess(s[0], 0.26)
+
+        # A single axis shared by all the points
+        axis = np.array([0.0, -0.5, 0.0])
+        curveID, s = self.network.projectRays(points, axis)
+        curveIDRef, sRef = self.projectRaysBaseline(points, axis)
+        np.testing.assert_array_equal(curveID, curveIDRef)
+        np.testing.assert_allclose(s, sRef, atol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
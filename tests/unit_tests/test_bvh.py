@@ -0,0 +1,99 @@
+# Standard Python modules
+import unittest
+
+# External modules
+import numpy as np
+
+# First party modules
+from pygeo.geo_utils import TriangleBVH
+
+
+def getSphere(nTheta, center=(0.0, 0.0, 0.0), radius=1.0):
+    """Triangulate a sphere with a structured grid of nTheta x 2 nTheta nodes"""
+    theta, phi = np.meshgrid(np.linspace(0, np.pi, nTheta), np.linspace(0, 2 * np.pi, 2 * nTheta), indexing="ij")
+    X = np.stack([np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)], axis=-1)
+    X = radius * X + center
+    a = X[:-1, :-1].reshape((-1, 3))
+    b = X[1:, :-1].reshape((-1, 3))
+    c = X[1:, 1:].reshape((-1, 3))
+    d = X[:-1, 1:].reshape((-1, 3))
+    return np.vstack([a, a]), np.vstack([b, c]), np.vstack([c, d])
+
+
+class TestTriangleBVH(unittest.TestCase):
+    N_PROCS = 1
+
+    def setUp(self):
+        # Two overlapping spheres so that some rays have more than two intersections
+        s1 = getSphere(15)
+        s2 = getSphere(10, center=(0.6, 0.0, 0.0), radius=0.5)
+        self.p0, self.p1, self.p2 = (np.vstack((x1, x2)) for x1, x2 in zip(s1, s2))
+        self.bvh = TriangleBVH(self.p0, self.p1, self.p2, leafSize=4)
+
+        rng = np.random.default_rng(0)
+        self.pts = rng.uniform(-1.5, 1.5, (200, 3))
+        self.vecs = rng.normal(size=(200, 3))
+
+    def bruteForceIntersections(self, pt, vec):
+        """Intersect a line with all the triangles"""
+        v1 = self.p1 - self.p0
+        v2 = self.p2 - self.p0
+        A = np.stack([np.broadcast_to(-vec, v1.shape), v1, v2], axis=-1)
+
+        # skip the degenerate triangles at the poles
+        valid = np.abs(np.linalg.det(A)) > 1e-14
+        x = np.linalg.solve(A[valid], (pt - self.p0[valid])[:, :, None])[:, :, 0]
+        hit = (x[:, 1] >= 0) & (x[:, 2] >= 0) & (x[:, 1] + x[:, 2] <= 1)
+        return np.sort(x[hit, 0])
+
+    def test_intersect_rays(self):
+        ray, tri, sol = self.bvh.intersectRays(self.pts, self.vecs)
+
+        for i in range(len(self.pts)):
+            np.testing.assert_allclose(sol[ray == i, 0], self.bruteForceIntersections(self.pts[i], self.vecs[i]))
+
+        # the triangle indices refer to the original triangles
+        points = self.p0[tri] + sol[:, 1:2] * (self.p1 - self.p0)[tri] + sol[:, 2:3] * (self.p2 - self.p0)[tri]
+        np.testing.assert_allclose(points, sol[:, 3:], atol=1e-12)
+
+    def test_project_rays(self):
+        up, down, fail = self.bvh.projectRays(self.pts, self.vecs)
+        proj, failPos = self.bvh.projectRaysPosOnly(self.pts, self.vecs)
+        self.assertEqual(set(fail), {-1, 0, 2})
+
+        for i in range(len(self.pts)):
+            s = self.bruteForceIntersections(self.pts[i], self.vecs[i])
+            if len(s) == 0:
+                self.assertEqual(fail[i], 2)
+            elif len(s) == 2:
+                self.assertEqual(fail[i], 0)
+                np.testing.assert_allclose(up[i], self.pts[i] + s[1] * self.vecs[i])
+                np.testing.assert_allclose(down[i], self.pts[i] + s[0] * self.vecs[i])
+            else:
+                self.assertEqual(fail[i], -1)
+                s = s[np.argsort(np.abs(s))]
+                np.testing.assert_allclose(up[i], self.pts[i] + s[0] * self.vecs[i])
+                np.testing.assert_allclose(down[i], self.pts[i] + s[1] * self.vecs[i])
+
+            if np.any(s >= 0):
+                self.assertEqual(failPos[i], 0)
+                np.testing.assert_allclose(proj[i], self.pts[i] + np.min(s[s >= 0]) * self.vecs[i])
+            else:
+                self.assertEqual(failPos[i], 1)
+
+    def test_closest_points(self):
+        closest, tri, dist = self.bvh.closestPoints(self.pts)
+        np.testing.assert_allclose(np.linalg.norm(closest - self.pts, axis=1), dist)
+
+        # the closest point is on the given triangle and no vertex is closer
+        v1 = (self.p1 - self.p0)[tri]
+        v2 = (self.p2 - self.p0)[tri]
+        normal = np.cross(v1, v2)
+        np.testing.assert_allclose(np.einsum("ij,ij->i", closest - self.p0[tri], normal), 0.0, atol=1e-12)
+        for p in (self.p0, self.p1, self.p2):
+            vertexDist = np.min(np.linalg.norm(self.pts[:, None, :] - p[None, :, :], axis=2), axis=1)
+            self.assertTrue(np.all(dist <= vertexDist + 1e-12))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+# Standard Python modules
+import unittest
+
+# External modules
+import numpy as np
+
+# First party modules
+from pygeo.parameterization.designVars import (
+    geoDV,
+    geoDVGlobal,
+    geoDVLinear,
+    geoDVLocal,
+    geoDVSectionLocal,
+    geoDVShapeFunc,
+    geoDVSpanwiseLocal,
+)
+
+
+def rotation(angle):
+    """Rotation matrix about the z axis"""
+    c, s = np.cos(angle), np.sin(angle)
+    return np.array([[c, -s, 0.0], [s, c, 0.0], [0.0, 0.0, 1.0]])
+
+
+class TestDVToCoef(unittest.TestCase):
+    """
+    Check the sparse DV to coefficient operators of the local design
+    variables against a direct application of each design variable
+    """
+
+    N_PROCS = 1
+
+    def setUp(self):
+        self.nCoef = 12
+        self.mask = np.zeros(self.nCoef, bool)
+        self.mask[5] = True
+        self.rng = np.random.default_rng(0)
+
+    def checkOperator(self, dv, reference, *args):
+        """Compare the operator, the real and the complex application with the reference coefficient changes"""
+        dv.value = self.rng.random(dv.nVal) + 1j * self.rng.random(dv.nVal)
+        dvToCoef = dv.getDVToCoef(self.nCoef, *args).toarray()
+        self.assertEqual(dvToCoef.shape, (3 * self.nCoef, dv.nVal))
+
+        for j in range(dv.nVal):
+            np.testing.assert_allclose(dvToCoef[:, j], reference(j).flatten(), atol=1e-15)
+
+        coef = np.zeros((self.nCoef, 3))
+        dv(coef, *args, None)
+        np.testing.assert_allclose(coef.flatten(), dvToCoef @ dv.value.real, atol=1e-15)
+
+        coef = np.zeros((self.nCoef, 3), "D")
+        dv.updateComplex(coef, *args, None)
+        np.testing.assert_allclose(coef.imag.flatten(), dvToCoef @ dv.value.imag, atol=1e-15)
+
+        # inactive configs leave the coefficients untouched
+        dv.config = ["cruise"]
+        coef = np.zeros((self.nCoef, 3))
+        dv(coef, *args, "takeoff")
+        np.testing.assert_equal(coef, 0.0)
+
+    def test_local(self):
+        dv = geoDVLocal("local", None, None, 1.0, "y", np.array([1, 3, 5, 7]), self.mask, None)
+        self.assertEqual(dv.nVal, 3)
+
+        def reference(j):
+            delta = np.zeros((self.nCoef, 3))
+            delta[dv.coefList[j, 0], 1] = 1.0
+            return delta
+
+        self.checkOperator(dv, reference)
+
+    def test_spanwiseLocal(self):
+        # The second design variable lists coefficient 4 twice and the masked coefficient 5
+        volDVToCoefs = [[[0, 1], [2, 4, 4, 5]], [[6, 7, 8]]]
+        dv = geoDVSpanwiseLocal("spanwise", None, None, 1.0, "z", volDVToCoefs, self.mask, None)
+        self.assertEqual(dv.nVal, 3)
+
+        def reference(j):
+            delta = np.zeros((self.nCoef, 3))
+            delta[np.unique(dv.dv_to_coefs[j]), 2] = 1.0
+            return delta
+
+        self.checkOperator(dv, reference)
+
+    def test_sectionLocal(self):
+        sectionTransform = [rotation(0.3), rotation(-1.1)]
+        sectionLink = np.array([0] * 6 + [1] * 6)
+        dv = geoDVSectionLocal(
+            "section", None, None, 1.0, 1, [0, 4, 5, 9, 11], self.mask, None, sectionTransform, sectionLink
+        )
+        self.assertEqual(dv.nVal, 4)
+        coefRotM = [rotation(0.1 * i) for i in range(self.nCoef)]
+
+        def reference(j):
+            coef = dv.coefList[j]
+            inFrame = np.zeros(3)
+            inFrame[dv.axis] = 1.0
+            delta = np.zeros((self.nCoef, 3))
+            delta[coef] = coefRotM[coef].dot(sectionTransform[sectionLink[coef]].dot(inFrame))
+            return delta
+
+        self.checkOperator(dv, reference, coefRotM)
+
+    def test_shapeFunc(self):
+        shapes = [{0: np.array([0.0, 1.0, 0.5]), 3: np.array([1.0, 0.0, 0.0])}, {3: np.array([0.0, 0.0, -2.0])}]
+        dv = geoDVShapeFunc("shapeFunc", shapes, None, None, 1.0, None)
+
+        def reference(j):
+            delta = np.zeros((self.nCoef, 3))
+            for idx, vec in shapes[j].items():
+                delta[idx] += vec
+            return delta
+
+        self.checkOperator(dv, reference)
+
+    def test_linearOperatorClasses(self):
+        # Only the design variables with a fixed operator provide one
+        for cls in [geoDVLocal, geoDVSpanwiseLocal, geoDVShapeFunc]:
+            self.assertTrue(issubclass(cls, geoDVLinear))
+        for cls in [geoDVGlobal, geoDVSectionLocal]:
+            self.assertFalse(issubclass(cls, geoDVLinear))
+
+        # A design variable with a fixed operator must give its entries
+        class geoDVIncomplete(geoDVLinear, geoDV):
+            pass
+
+        with self.assertRaises(TypeError):
+            geoDVIncomplete("incomplete", np.zeros(1), 1, None, None, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
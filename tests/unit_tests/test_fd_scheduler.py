@@ -0,0 +1,112 @@
+# Standard Python modules
+import unittest
+
+# External modules
+from mpi4py import MPI
+import numpy as np
+from parameterized import parameterized
+
+# First party modules
+from pygeo.parameterization.fdScheduler import ParallelFDScheduler
+
+
+class MockModel:
+    """A cheap stand-in for a CAD model whose points depend quadratically on the DVs.
+    Like the faces of a CAD model, each group of points only depends on some of the DVs."""
+
+    def __init__(self, nDV, nPts):
+        rng = np.random.default_rng(0)
+        group = np.repeat(np.arange(nPts) % 3, 3)
+        mask = (group[:, None] == np.arange(nDV) % 3) | (np.arange(nDV) == 0)
+        self.A = rng.random((nPts * 3, nDV)) * mask
+        self.B = rng.random((nPts * 3, nDV)) * mask
+        self.x = rng.random(nDV)
+        self.dh = 1e-7
+        self.nBuild = 0
+
+    def evaluate(self):
+        self.nBuild += 1
+        return (self.A @ self.x + self.B @ self.x**2).reshape(-1, 3)
+
+    def computeColumn(self, iDV):
+        pts0 = self.evaluate()
+        self.x[iDV] += self.dh
+        ptsNew = self.evaluate()
+        self.x[iDV] -= self.dh
+        return (ptsNew - pts0) / self.dh
+
+    def getJacobian(self):
+        return self.A + 2 * self.B * self.x
+
+
+test_params = [
+    {"dynamic": True, "distributed": True, "nWorker": None},
+    {"dynamic": False, "distributed": True, "nWorker": None},
+    {"dynamic": True, "distributed": False, "nWorker": None},
+    {"dynamic": True, "distributed": False, "nWorker": 2},
+]
+
+
+class TestFDScheduler(unittest.TestCase):
+    N_PROCS = 3
+
+    def setUp(self):
+        self.comm = MPI.COMM_WORLD
+        self.nDV = 7
+        self.sizes = np.array([4 + i for i in range(self.comm.size)])
+
+    def getLocalRange(self, distributed):
+        """Get the slice of the jacobian rows of this proc"""
+        if not distributed:
+            return slice(None)
+        start = 3 * np.sum(self.sizes[: self.comm.rank])
+        return slice(start, start + 3 * self.sizes[self.comm.rank])
+
+    @parameterized.expand(test_params)
+    def test_jacobian(self, dynamic, distributed, nWorker):
+        nPts = np.sum(self.sizes) if distributed else 5
+        sizes = self.sizes if distributed else np.full(self.comm.size, nPts)
+        model = MockModel(self.nDV, nPts)
+        scheduler = ParallelFDScheduler(self.comm, dynamic=dynamic, chunkSize=2)
+
+        jac = scheduler.computeJacobian(self.nDV, model.computeColumn, sizes, distributed, nWorker)
+
+        exact = model.getJacobian()[self.getLocalRange(distributed)]
+        np.testing.assert_allclose(jac.toarray(), exact, rtol=1e-5)
+
+        # only the points that move are stored
+        self.assertEqual(jac.nnz, np.count_nonzero(exact))
+
+        # every column is computed exactly once
+        nBuild = self.comm.allreduce(model.nBuild)
+        self.assertEqual(nBuild, 2 * self.nDV)
+        if nWorker is not None and self.comm.rank >= nWorker:
+            self.assertEqual(model.nBuild, 0)
+
+    def test_reuse_columns(self):
+        nPts = np.sum(self.sizes)
+        model = MockModel(self.nDV, nPts)
+        scheduler = ParallelFDScheduler(self.comm, reuseColumns=True)
+
+        def getValues():
+            return np.column_stack((model.x, np.full(self.nDV, model.dh)))
+
+        scheduler.computeJacobian(self.nDV, model.computeColumn, self.sizes, dvValues=getValues(), key=b"pts")
+
+        # only the columns of the DVs that changed are recomputed
+        model.nBuild = 0
+        model.x[[1, 4]] += 0.1
+        jac = scheduler.computeJacobian(self.nDV, model.computeColumn, self.sizes, dvValues=getValues(), key=b"pts")
+        self.assertEqual(self.comm.allreduce(model.nBuild), 4)
+        exact = model.getJacobian()[self.getLocalRange(True)]
+        np.testing.assert_allclose(jac[:, [1, 4]].toarray(), exact[:, [1, 4]], rtol=1e-5)
+
+        # a different key recomputes everything
+        model.nBuild = 0
+        jac = scheduler.computeJacobian(self.nDV, model.computeColumn, self.sizes, dvValues=getValues(), key=b"new")
+        self.assertEqual(self.comm.allreduce(model.nBuild), 2 * self.nDV)
+        np.testing.assert_allclose(jac.toarray(), exact, rtol=1e-5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -43,6 +43,11 @@ class TestImportGuards(unittest.TestCase):
 
         dummy_module = DummyOpenVSPModule()
         with patch.dict(sys.modules, {"openvsp": dummy_module}):
+            # pygeo may have been imported with another openvsp by an earlier test
+            for module in list(sys.modules):
+                if module.startswith("pygeo"):
+                    del sys.modules[module]
+
             with self.assertRaises(AttributeError) as context:
                 # First party modules
                 from pygeo import DVGeometryVSP
@@ -88,6 +93,28 @@ class TestImportGuards(unittest.TestCase):
 
             self.assertEqual(str(context.exception), "OCSM and pyOCSM must be installed to use DVGeometryESP.")
 
+    @ignore_warnings
+    def test_lazy_imports(self):
+        with patch.dict(sys.modules):
+            for module in list(sys.modules):
+                if module.startswith("pygeo"):
+                    del sys.modules[module]
+
+            # First party modules
+            import pygeo
+
+            # the optional geometry engines are only imported on first access
+            for module in ["DVGeoVSP", "DVGeoESP", "DVGeoMulti", "DVGeoCST"]:
+                self.assertNotIn(f"pygeo.parameterization.{module}", sys.modules)
+            self.assertNotIn("pygeo.constraints", sys.modules)
+
+            self.assertIs(pygeo.DVGeometryCST, sys.modules["pygeo.parameterization.DVGeoCST"].DVGeometryCST)
+            self.assertIn("DVGeometryESP", dir(pygeo))
+            self.assertNotIn("pygeo.parameterization.DVGeoESP", sys.modules)
+
+            with self.assertRaises(AttributeError):
+                pygeo.DVGeometryFoo
+
 
 if __name__ == "__main__":
     unittest.main()
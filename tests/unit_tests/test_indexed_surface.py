@@ -0,0 +1,70 @@
+# Standard Python modules
+import unittest
+
+# External modules
+import numpy as np
+
+# First party modules
+from pygeo.geo_utils import (
+    getTriangleVertices,
+    isClosedTriangulatedMesh,
+    pointReduceBruteForce,
+    pointReduceKDTree,
+    scatterTriangleSens,
+    volumeTriangulatedMesh,
+)
+
+
+class TestIndexedSurface(unittest.TestCase):
+    N_PROCS = 1
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.pts = rng.random((50, 3))
+        self.conn = np.array([rng.choice(50, 3, replace=False) for _ in range(80)])
+
+        # triangle soup with the shared vertices perturbed by round-off
+        self.soup = [self.pts[self.conn[:, i]] for i in range(3)]
+        self.soup[1] = self.soup[0] + (self.soup[1] - self.soup[0])
+
+    def test_point_reduce(self):
+        allPts = np.vstack(self.soup)
+        uniquePts, link = pointReduceKDTree(allPts, nodeTol=1e-10)
+        uniquePtsRef, linkRef = pointReduceBruteForce(allPts, nodeTol=1e-10)
+
+        np.testing.assert_array_equal(link, linkRef)
+        np.testing.assert_allclose(uniquePts, uniquePtsRef)
+        np.testing.assert_allclose(uniquePts[link], allPts, atol=1e-14)
+
+    def test_gather_scatter(self):
+        uniquePts, link = pointReduceKDTree(np.vstack(self.soup), nodeTol=1e-10)
+        conn = link.reshape((3, -1)).T
+
+        for p, pRef in zip(getTriangleVertices(uniquePts, conn), self.soup):
+            np.testing.assert_allclose(p, pRef, atol=1e-14)
+
+        # the scatter is the transpose of the gather
+        rng = np.random.default_rng(1)
+        seeds = [rng.random((2, len(conn), 3)) for _ in range(3)]
+        x = rng.random(uniquePts.shape)
+        dpts = scatterTriangleSens(*seeds, conn, len(uniquePts))
+        ref = sum(np.einsum("fij,ij->f", s, p) for s, p in zip(seeds, getTriangleVertices(x, conn)))
+        np.testing.assert_allclose(np.einsum("fij,ij->f", dpts, x), ref)
+
+    def test_closed_mesh(self):
+        # octahedron with outward normals
+        pts = np.array([[1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1]], dtype=float)
+        conn = np.array([[0, 2, 4], [2, 1, 4], [1, 3, 4], [3, 0, 4], [2, 0, 5], [1, 2, 5], [3, 1, 5], [0, 3, 5]])
+        self.assertTrue(isClosedTriangulatedMesh(conn))
+        self.assertFalse(isClosedTriangulatedMesh(conn[:-1]))
+        self.assertFalse(isClosedTriangulatedMesh(np.vstack((conn[:1, ::-1], conn[1:]))))
+
+        # the volume of a closed mesh does not depend on the reference point
+        pts = pts * [1.3, 0.7, 2.1] + 1e4
+        center = np.mean(pts, axis=0)
+        volume = volumeTriangulatedMesh(*(p - center for p in getTriangleVertices(pts, conn)))
+        np.testing.assert_allclose(volume, 4.0 / 3.0 * 1.3 * 0.7 * 2.1, rtol=1e-12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+# Standard Python modules
+import unittest
+
+# External modules
+import numpy as np
+
+# First party modules
+from pygeo.constraints.baseConstraint import LinearConstraint
+from pygeo.parameterization.designVars import (
+    geoDVComposite,
+    geoDVGlobal,
+    geoDVLocal,
+    geoDVSectionLocal,
+    geoDVSpanwiseLocal,
+)
+
+
+class LocalDVGeo:
+    """
+    The design variables of a DVGeometry, on a small FFD with 12 control points,
+    as needed by the linear constraints
+    """
+
+    def __init__(self, useComposite=False):
+        mask = np.zeros(12, bool)
+        mask[5] = True
+        self.DV_listGlobal = {"twist": geoDVGlobal("twist", [0.0, 0.0], None, None, 1.0, None, None)}
+        self.DV_listLocal = {"local": geoDVLocal("local", None, None, 1.0, "y", np.arange(6), mask, None)}
+        self.DV_listSectionLocal = {
+            "section": geoDVSectionLocal("section", None, None, 1.0, 1, np.arange(6), mask, None, [np.eye(3)], [0] * 12)
+        }
+        # The first spanwise DV lists coefficient 7 twice
+        self.DV_listSpanwiseLocal = {
+            "spanwise": geoDVSpanwiseLocal("spanwise", None, None, 1.0, "z", [[[6, 7, 7], [9, 10, 11]]], mask, None)
+        }
+
+        self.useComposite = useComposite
+        if useComposite:
+            nDV = sum(dv.nVal for DVList in self.DVLists for dv in DVList.values())
+            u = np.random.default_rng(1).random((nDV, 4))
+            self.DVComposite = geoDVComposite("composite", np.zeros(4), 4, u)
+
+    @property
+    def DVLists(self):
+        return [self.DV_listGlobal, self.DV_listLocal, self.DV_listSectionLocal, self.DV_listSpanwiseLocal]
+
+    def convertDictToSensitivity(self, dIdxDict):
+        return np.concatenate([dIdxDict[key] for DVList in self.DVLists for key in DVList])
+
+
+def denseJacobians(DVGeo, indSetA, indSetB, factorA, factorB):
+    """The dense jacobians of the linear constraints, built one constraint at a time"""
+    coefsOfDV = {
+        "local": [[coef] for coef in DVGeo.DV_listLocal["local"].coefList[:, 0]],
+        "section": [[coef] for coef in DVGeo.DV_listSectionLocal["section"].coefList],
+        "spanwise": DVGeo.DV_listSpanwiseLocal["spanwise"].dv_to_coefs,
+    }
+
+    jac = {}
+    for key, coefs in coefsOfDV.items():
+        # The last design variable that moves a coefficient is used
+        cons = []
+        for j in range(len(indSetA)):
+            up = down = None
+            for iDV in range(len(coefs)):
+                for coef in coefs[iDV]:
+                    if coef == indSetA[j]:
+                        up = iDV
+                    if coef == indSetB[j]:
+                        down = iDV
+            if up is not None and down is not None:
+                cons.append([up, down])
+
+        if len(cons) > 0:
+            jacobian = np.zeros((len(cons), len(coefs)))
+            for i in range(len(cons)):
+                jacobian[i, cons[i][0]] = factorA[i]
+                jacobian[i, cons[i][1]] = factorB[i]
+            jac[key] = jacobian
+
+    return jac
+
+
+class TestLinearConstraint(unittest.TestCase):
+    """
+    Compare the sparse jacobians of the linear constraints with the dense
+    jacobians built one constraint at a time
+    """
+
+    N_PROCS = 1
+
+    def setUp(self):
+        # Coefficient 2 is linked twice, coefficient 5 is masked, 6 and 7 are moved by the same spanwise DV and 12 is
+        # not in the FFD
+        self.indSetA = [0, 1, 2, 2, 6, 9, 3, 4, 5, 0]
+        self.indSetB = [3, 4, 4, 4, 7, 11, 0, 12, 1, 3]
+        rng = np.random.default_rng(0)
+        self.factorA = rng.random(len(self.indSetA))
+        self.factorB = rng.random(len(self.indSetA))
+
+    def getConstraint(self, DVGeo):
+        return LinearConstraint("linCon", self.indSetA, self.indSetB, self.factorA, self.factorB, 0.0, 0.0, DVGeo, None)
+
+    def test_jacobian(self):
+        DVGeo = LocalDVGeo()
+        con = self.getConstraint(DVGeo)
+        jac = denseJacobians(DVGeo, self.indSetA, self.indSetB, self.factorA, self.factorB)
+
+        self.assertEqual(con.wrt, list(jac.keys()))
+        self.assertEqual(con.ncon, sum(len(val) for val in jac.values()))
+        for key in jac:
+            np.testing.assert_allclose(con.jac[key].toarray(), jac[key], atol=1e-15)
+
+        funcsSens = {}
+        con.evalFunctionsSens(funcsSens)
+        for key in jac:
+            np.testing.assert_allclose(funcsSens["linCon"][key], jac[key], atol=1e-15)
+
+        # The constraint values are the products of the jacobians with the design variables
+        rng = np.random.default_rng(2)
+        values = {}
+        for DVList in DVGeo.DVLists[1:]:
+            for key, dv in DVList.items():
+                dv.value = rng.random(dv.nVal).astype("D")
+                values[key] = dv.value.real
+        funcs = {}
+        con.evalFunctions(funcs)
+        np.testing.assert_allclose(funcs["linCon"], np.concatenate([jac[key] @ values[key] for key in jac]))
+
+    def test_compositeJacobian(self):
+        DVGeo = LocalDVGeo(useComposite=True)
+        con = self.getConstraint(DVGeo)
+        jac = denseJacobians(DVGeo, self.indSetA, self.indSetB, self.factorA, self.factorB)
+
+        # Pad the jacobian of each constraint with zeros for the other design variables and map it to the composite DVs
+        newJac = []
+        for key in jac:
+            for row in jac[key]:
+                tempDict = {name: np.zeros(dv.nVal) for DVList in DVGeo.DVLists for name, dv in DVList.items()}
+                tempDict[key] = row
+                newJac.append(DVGeo.convertDictToSensitivity(tempDict))
+        newJac = np.array(newJac) @ DVGeo.DVComposite.u
+
+        self.assertEqual(con.wrt, ["composite"])
+        np.testing.assert_allclose(con.jac["composite"].toarray(), newJac, atol=1e-14)
+
+        funcsSens = {}
+        con.evalFunctionsSens(funcsSens)
+        np.testing.assert_allclose(funcsSens["linCon"]["composite"], newJac, atol=1e-14)
+
+
+if __name__ == "__main__":
+    unittest.main()
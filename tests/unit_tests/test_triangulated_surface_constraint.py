@@ -0,0 +1,164 @@
+# Standard Python modules
+import unittest
+from unittest.mock import MagicMock, patch
+
+# External modules
+from mpi4py import MPI
+import numpy as np
+
+# First party modules
+from pygeo.constraints import areaConstraint
+from pygeo.constraints.areaConstraint import MAX_KS_EXPONENT_CHANGE, TriangulatedSurfaceConstraint
+
+
+def getPlane(n, length):
+    """Triangulate a square of side length in the z = 0 plane with n x n quads"""
+    x, y = np.meshgrid(np.linspace(0, length, n + 1), np.linspace(0, length, n + 1), indexing="ij")
+    X = np.stack([x, y, np.zeros_like(x)], axis=-1)
+    a = X[:-1, :-1].reshape((-1, 3))
+    b = X[1:, :-1].reshape((-1, 3))
+    c = X[1:, 1:].reshape((-1, 3))
+    d = X[:-1, 1:].reshape((-1, 3))
+    return [np.vstack([a, a]), np.vstack([b, c]), np.vstack([c, d])]
+
+
+def getSphere(nTheta, center, radius):
+    """Triangulate a sphere with a structured grid of nTheta x 2 nTheta nodes"""
+    theta, phi = np.meshgrid(np.linspace(0, np.pi, nTheta), np.linspace(0, 2 * np.pi, 2 * nTheta), indexing="ij")
+    X = np.stack([np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)], axis=-1)
+    X = radius * X + center
+    a = X[:-1, :-1].reshape((-1, 3))
+    b = X[1:, :-1].reshape((-1, 3))
+    c = X[1:, 1:].reshape((-1, 3))
+    d = X[:-1, 1:].reshape((-1, 3))
+    return [np.vstack([a, a]), np.vstack([b, c]), np.vstack([c, d])]
+
+
+class TestTriangulatedSurfaceConstraint(unittest.TestCase):
+    """
+    Test the broad phase, the warm start and the derivative scattering of
+    the triangulated surface constraint with a mocked geograd
+    """
+
+    N_PROCS = 1
+
+    def setUp(self):
+        # A large plane and a small sphere above one of its corners, so most of the plane is beyond maxdim
+        self.surf1 = getPlane(20, 10.0)
+        self.surf2 = getSphere(8, np.array([1.0, 1.0, 0.7]), 0.5)
+
+        self.geograd = MagicMock()
+        patcher = patch.object(areaConstraint, "geograd_parallel", self.geograd)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.rho = 10.0
+        self.con = TriangulatedSurfaceConstraint(
+            MPI.COMM_SELF,
+            "triSurfCon",
+            self.surf1,
+            "surf1",
+            None,
+            MagicMock(),
+            self.surf2,
+            "surf2",
+            None,
+            None,
+            1.0,
+            False,
+            self.rho,
+            1.0,
+            1.0,
+            None,
+        )
+
+    def setMindist(self, *mindist):
+        """Make geograd return the given minimum distances on successive calls"""
+        self.geograd.compute.reset_mock()
+        self.geograd.compute.side_effect = [(1.0, 0.0, d, 0.0, 0.0) for d in mindist]
+
+    def test_nearTriangles(self):
+        self.setMindist(0.5, 0.5)
+        self.con.evalTriangulatedSurfConstraint()
+        nearTri1, nearTri2 = self.con.near_tri1, self.con.near_tri2
+        maxdim = self.con.maxdim
+
+        # The whole sphere is near the plane, but only a corner of the plane is near the sphere
+        np.testing.assert_equal(nearTri2, np.arange(len(self.surf2[0])))
+        self.assertGreater(len(nearTri1), 0)
+        self.assertLess(len(nearTri1), len(self.surf1[0]) // 4)
+
+        # The removed triangles are all farther than maxdim from the sphere
+        pts2 = np.vstack(self.surf2)
+        farTri = np.setdiff1d(np.arange(len(self.surf1[0])), nearTri1)
+        for p in self.surf1:
+            dist = np.min(np.linalg.norm(p[farTri, None, :] - pts2[None, :, :], axis=-1), axis=1)
+            self.assertTrue(np.all(dist > maxdim))
+
+        # geograd gets the vertices of the near triangles only
+        for args in self.geograd.compute.call_args_list:
+            for i in range(3):
+                np.testing.assert_equal(args[0][i], self.surf1[i][nearTri1].T)
+                np.testing.assert_equal(args[0][3 + i], self.surf2[i][nearTri2].T)
+                self.assertTrue(args[0][i].flags.f_contiguous)
+            self.assertEqual(args[0][7], self.rho)
+            self.assertEqual(args[0][8], maxdim)
+
+    def test_warmStart(self):
+        # The first evaluation needs a run to get the minimum distance
+        self.setMindist(0.5, 0.49)
+        self.con.evalTriangulatedSurfConstraint()
+        self.assertEqual(self.geograd.compute.call_count, 2)
+        self.assertEqual([args[0][6] for args in self.geograd.compute.call_args_list], [0.0, 0.5])
+        self.assertEqual(self.con.minimum_distance, 0.49)
+
+        # A small change of the minimum distance is warm started from the previous design
+        self.setMindist(0.48)
+        self.con.evalTriangulatedSurfConstraint()
+        self.assertEqual(self.geograd.compute.call_count, 1)
+        self.assertEqual(self.geograd.compute.call_args[0][6], 0.49)
+        self.assertEqual(self.con.minimum_distance, 0.48)
+
+        # A change beyond the limit of the KS exponent is refreshed with the new minimum distance
+        newMindist = 0.48 - 2 * MAX_KS_EXPONENT_CHANGE / self.rho
+        self.setMindist(newMindist, newMindist)
+        KS, _, _ = self.con.evalTriangulatedSurfConstraint()
+        self.assertEqual(self.geograd.compute.call_count, 2)
+        self.assertEqual([args[0][6] for args in self.geograd.compute.call_args_list], [0.48, newMindist])
+        self.assertEqual(self.con.minimum_distance, newMindist)
+
+        # A change within the limit is not refreshed, even if it is larger than maxdim
+        change = 0.5 * MAX_KS_EXPONENT_CHANGE / self.rho
+        self.assertGreater(change, self.con.maxdim)
+        self.setMindist(newMindist + change)
+        self.con.evalTriangulatedSurfConstraint()
+        self.assertEqual(self.geograd.compute.call_count, 1)
+
+    def test_scatterDerivatives(self):
+        self.setMindist(0.5, 0.5)
+        self.con.evalTriangulatedSurfConstraint()
+        nearTri1, nearTri2 = self.con.near_tri1, self.con.near_tri2
+
+        # geograd returns the derivatives wrt the vertices of the near triangles
+        rng = np.random.default_rng(0)
+        nNear = {1: len(nearTri1), 2: len(nearTri2)}
+        surfOf = {5: 1, 6: 1, 7: 1, 8: 2, 9: 2, 10: 2, 11: 1, 12: 1, 13: 1, 14: 2, 15: 2, 16: 2}
+        derivs = [1.0, 0.0, 0.5, 0.0, 0.0] + [rng.random((3, nNear[surfOf[j]])) for j in range(5, 17)]
+        self.geograd.compute_derivs.return_value = tuple(derivs)
+
+        output = self.con.evalTriangulatedSurfConstraintSens()
+        self.assertEqual(self.geograd.compute_derivs.call_args[0][6], self.con.minimum_distance)
+        self.assertEqual(output[:5], derivs[:5])
+
+        for j in range(5, 17):
+            if surfOf[j] == 1:
+                size, nearTri = len(self.surf1[0]), nearTri1
+            else:
+                size, nearTri = len(self.surf2[0]), nearTri2
+            self.assertEqual(output[j].shape, (3, size))
+            np.testing.assert_equal(output[j][:, nearTri], derivs[j])
+            np.testing.assert_equal(np.delete(output[j], nearTri, axis=1), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+# Standard Python modules
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+# External modules
+import numpy as np
+
+# First party modules
+from pygeo.geo_utils import getStructuredConnectivity, writeVTK
+
+
+def readAppendedArrays(fileName):
+    """Read back the header and the raw appended arrays of a VTK file"""
+    with open(fileName, "rb") as f:
+        content = f.read()
+    header, data = content.split(b'<AppendedData encoding="raw">\n_')
+    root = ET.fromstring(header + b"</VTKFile>")
+
+    dtypes = {"Float64": "<f8", "Int64": "<i8", "Int32": "<i4", "UInt8": "u1"}
+    arrays = {}
+    for array in root.iter("DataArray"):
+        offset = int(array.get("offset"))
+        dtype = np.dtype(dtypes[array.get("type")])
+        nBytes = int(np.frombuffer(data, "<u8", count=1, offset=offset)[0])
+        arrays[array.get("Name")] = np.frombuffer(data, dtype, count=nBytes // dtype.itemsize, offset=offset + 8)
+    return root, arrays
+
+
+class TestVTKIO(unittest.TestCase):
+    N_PROCS = 1
+
+    def test_structured_connectivity(self):
+        np.testing.assert_array_equal(getStructuredConnectivity((3,)), [[0, 1], [1, 2]])
+        np.testing.assert_array_equal(getStructuredConnectivity((2, 1, 2)), [[0, 2, 3, 1]])
+        np.testing.assert_array_equal(getStructuredConnectivity((2, 2, 2)), [[0, 4, 6, 2, 1, 5, 7, 3]])
+
+    def test_write_zones(self):
+        vol = np.random.rand(3, 2, 2, 3)
+        pts = np.random.rand(4, 3)
+        with tempfile.TemporaryDirectory() as tmpDir:
+            fileName = os.path.join(tmpDir, "zones.vtu")
+            writeVTK(fileName, [vol, (pts, np.arange(4).reshape((-1, 1)))])
+            root, arrays = readAppendedArrays(fileName)
+
+        piece = root.find("UnstructuredGrid/Piece")
+        self.assertEqual(int(piece.get("NumberOfPoints")), 16)
+        self.assertEqual(int(piece.get("NumberOfCells")), 6)
+        np.testing.assert_allclose(arrays["Points"].reshape((-1, 3)), np.vstack([vol.reshape((-1, 3)), pts]))
+        np.testing.assert_array_equal(arrays["types"], [12, 12, 1, 1, 1, 1])
+        np.testing.assert_array_equal(arrays["offsets"], [8, 16, 17, 18, 19, 20])
+        np.testing.assert_array_equal(arrays["connectivity"][16:], [12, 13, 14, 15])
+        np.testing.assert_array_equal(arrays["zone"], [0, 0, 1, 1, 1, 1])
+
+    def test_time_series(self):
+        coords = np.random.rand(5, 3)
+        with tempfile.TemporaryDirectory() as tmpDir:
+            fileName = os.path.join(tmpDir, "history.vtu")
+            names = [writeVTK(fileName, [coords], solutionTime=t) for t in [0, 1, 1, 2]]
+            collection = ET.parse(os.path.join(tmpDir, "history.pvd")).getroot()
+            _, arrays = readAppendedArrays(names[-1])
+
+        self.assertEqual(names[1], names[2])
+        self.assertEqual(len(set(names)), 3)
+        dataSets = collection.findall("Collection/DataSet")
+        self.assertEqual([float(d.get("timestep")) for d in dataSets], [0.0, 1.0, 2.0])
+        self.assertEqual(arrays["TimeValue"][0], 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()